@@ -0,0 +1,69 @@
+"""
+数组按值传递时写时复制与立即复制的耗时对比
+
+把大数组按值传给只读取它的函数，写时复制不会复制缓冲区；
+作为对比，另用每次都复制缓冲区的copy()运行同一脚本。
+
+用法: python benchmarks/bench_array_copy.py [元素个数] [调用次数]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import vbs
+
+SETUP = '''Dim a(%d)
+For i = 0 To UBound(a) : a(i) = i : Next'''
+
+# 调用返回后形参已释放，随后写入a时不必复制
+SCRIPT = '''Function Ends(ByVal arr)
+  Ends = arr(0) + arr(UBound(arr))
+End Function
+total = 0
+For k = 1 To %d
+  total = total + Ends(a)
+  a(0) = k
+Next'''
+
+
+def eager_copy(self):
+    """立即复制缓冲区的copy()（对比用）"""
+    other = vbs.VBSArray.__new__(vbs.VBSArray)
+    other.bounds = self.bounds
+    other.stride = self.stride
+    other.data = None if self.data is None else self.data[:]
+    other.mask = None if self.mask is None else bytearray(self.mask)
+    other.kind = self.kind
+    other.shared = None
+    return other
+
+
+def measure(size, calls, transpile):
+    """返回执行调用循环的耗时（秒），不包括创建数组"""
+    interpreter = vbs.SimpleVBSInterpreter()
+    interpreter.execute(SETUP % (size - 1), transpile)
+    start = time.perf_counter()
+    interpreter.execute(SCRIPT % calls, transpile)
+    return time.perf_counter() - start
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    calls = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    print(f"{size} 个元素的数组，按值传递 {calls} 次")
+    print(f"{'模式':<10}{'写时复制(s)':>14}{'立即复制(s)':>14}")
+    cow_copy = vbs.VBSArray.copy
+    for transpile in (False, True):
+        cow = measure(size, calls, transpile)
+        vbs.VBSArray.copy = eager_copy
+        try:
+            eager = measure(size, calls, transpile)
+        finally:
+            vbs.VBSArray.copy = cow_copy
+        print(f"{'转译' if transpile else '字节码':<10}{cow:>14.3f}{eager:>14.3f}")
+
+
+if __name__ == '__main__':
+    main()
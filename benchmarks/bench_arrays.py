@@ -0,0 +1,80 @@
+"""
+VBSArray与原先的列表表示的内存占用对比，以及逐个追加元素时ReDim Preserve的耗时
+
+原先Dim a(n)创建元素为None的Python列表，这里用同样的列表存放相同的值作为对比。
+
+用法: python benchmarks/bench_arrays.py [元素个数]
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import vbs
+
+
+def allocated(build):
+    """返回build()创建的对象占用的内存（字节）"""
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = build()
+        size = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+    del result
+    return size
+
+
+def fill_list(size, value):
+    items = [None] * size
+    for i in range(size):
+        items[i] = value(i)
+    return items
+
+
+def fill_array(size, value):
+    array = vbs.VBSArray((size - 1,))
+    for i in range(size):
+        array.set([i], value(i))
+    return array
+
+
+def grow(count, transpile):
+    """用ReDim Preserve每次追加一个元素，返回耗时（秒）"""
+    code = f'''Dim a()
+ReDim a(-1)
+For i = 0 To {count - 1}
+  ReDim Preserve a(i)
+  a(i) = i
+Next'''
+    interpreter = vbs.SimpleVBSInterpreter()
+    start = time.perf_counter()
+    interpreter.execute(code, transpile)
+    return time.perf_counter() - start
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    kinds = [
+        ('整数', lambda i: i * 7),
+        ('浮点数', lambda i: i * 0.5),
+        ('字符串', lambda i: str(i)),
+    ]
+    print(f"{size} 个元素的一维数组")
+    print(f"{'元素':<8}{'列表(MB)':>12}{'VBSArray(MB)':>14}")
+    for name, value in kinds:
+        as_list = allocated(lambda: fill_list(size, value)) / 2 ** 20
+        as_array = allocated(lambda: fill_array(size, value)) / 2 ** 20
+        print(f"{name:<8}{as_list:>12.1f}{as_array:>14.1f}")
+    
+    print("ReDim Preserve逐个追加元素")
+    print(f"{'元素个数':>10}{'字节码(s)':>12}{'转译(s)':>12}")
+    for count in (size // 8, size // 4, size // 2):
+        print(f"{count:>10}{grow(count, False):>12.3f}{grow(count, True):>12.3f}")
+
+
+if __name__ == '__main__':
+    main()
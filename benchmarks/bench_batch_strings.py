@@ -0,0 +1,52 @@
+"""
+批量字符串函数与逐个调用标量函数的耗时对比
+
+用法: python benchmarks/bench_batch_strings.py [元素个数]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import vbs
+
+
+def measure(func, repeat=3):
+    """返回多次运行中最短的耗时（秒）"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    column = [f"  item{i:07d}  " for i in range(size)]
+    cases = [
+        ('Len', lambda: [vbs.Len(s) for s in column], lambda: vbs.batch_len(column)),
+        ('Left', lambda: [vbs.Left(s, 5) for s in column], lambda: vbs.batch_left(column, 5)),
+        ('Right', lambda: [vbs.Right(s, 5) for s in column], lambda: vbs.batch_right(column, 5)),
+        ('Mid', lambda: [vbs.Mid(s, 3, 4) for s in column], lambda: vbs.batch_mid(column, 3, 4)),
+        ('UCase', lambda: [vbs.UCase(s) for s in column], lambda: vbs.batch_ucase(column)),
+        ('Trim', lambda: [vbs.Trim(s) for s in column], lambda: vbs.batch_trim(column)),
+        ('Replace', lambda: [vbs.Replace(s, "item", "x") for s in column],
+         lambda: vbs.batch_replace(column, "item", "x")),
+    ]
+    print(f"{size} 个字符串")
+    print(f"{'函数':<10}{'逐个调用(s)':>14}{'批量(s)':>12}{'加速':>8}")
+    for name, scalar, batch in cases:
+        assert scalar() == batch(), name
+        t_scalar = measure(scalar)
+        t_batch = measure(batch)
+        print(f"{name:<10}{t_scalar:>14.3f}{t_batch:>12.3f}{t_scalar / t_batch:>7.1f}x")
+    if vbs.numpy is not None:
+        array = vbs.numpy.array(column)
+        t_batch = measure(lambda: vbs.batch_trim(array))
+        print(f"{'Trim(NumPy)':<10}{'':>14}{t_batch:>12.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""
+脚本过程的调用开销
+
+分别测量空循环、调用Sub、调用Function和递归调用（模拟递归遍历目录的脚本），
+以每次调用的平均耗时（微秒）表示调用开销。
+
+用法: python benchmarks/bench_calls.py [调用次数]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import vbs
+
+PROCEDURES = '''Sub Touch(ByRef n)
+  n = n + 1
+End Sub
+Function Twice(ByVal n)
+  Twice = n * 2
+End Function
+Function Walk(depth, width)
+  Dim i, count
+  count = 1
+  If depth > 0 Then
+    For i = 1 To width
+      count = count + Walk(depth - 1, width)
+    Next
+  End If
+  Walk = count
+End Function
+'''
+
+CASES = [
+    ('空循环', 'For i = 1 To %d : x = x + 1 : Next'),
+    ('Sub ByRef', 'For i = 1 To %d : Touch x : Next'),
+    ('Function ByVal', 'For i = 1 To %d : x = x + Twice(i) : Next'),
+]
+
+
+def measure(code, transpile):
+    """返回第二次执行的耗时（秒），第一次执行时完成编译和转译"""
+    vbs.SimpleVBSInterpreter().execute(code, transpile)
+    start = time.perf_counter()
+    vbs.SimpleVBSInterpreter().execute(code, transpile)
+    return time.perf_counter() - start
+
+
+def main():
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 300000
+    # 宽度为8、深度为6的树共有 (8^7 - 1) / 7 个节点，每个节点调用一次Walk
+    depth, width = 6, 8
+    nodes = (width ** (depth + 1) - 1) // (width - 1)
+    cases = [(name, PROCEDURES + body % calls, calls) for name, body in CASES]
+    cases.append(('递归Walk', PROCEDURES + f'x = Walk({depth}, {width})', nodes))
+    print(f"{'用例':<16}{'调用次数':>10}{'字节码(us)':>12}{'转译(us)':>12}")
+    for name, code, count in cases:
+        vm = measure(code, False) / count * 1e6
+        py = measure(code, True) / count * 1e6
+        print(f"{name:<16}{count:>10}{vm:>12.3f}{py:>12.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+"""
+For循环的执行速度
+
+在For循环中执行不同的循环体，分别用字节码和转译为Python两种方式执行，
+以整个循环的耗时（秒）比较两种执行方式。
+
+用法: python benchmarks/bench_loop.py [循环次数]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import vbs
+
+CASES = [
+    ('空循环', 'For i = 1 To %d : Next'),
+    ('x = i', 'For i = 1 To %d : x = i : Next'),
+    ('累加', 'total = 0\nFor i = 1 To %d : total = total + i : Next'),
+]
+
+
+def measure(code, transpile):
+    """返回第二次执行的耗时（秒），第一次执行时完成编译和转译"""
+    vbs.SimpleVBSInterpreter().execute(code, transpile)
+    start = time.perf_counter()
+    vbs.SimpleVBSInterpreter().execute(code, transpile)
+    return time.perf_counter() - start
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    print(f"{'用例':<12}{'循环次数':>10}{'字节码(s)':>12}{'转译(s)':>12}")
+    for name, body in CASES:
+        code = body % count
+        print(f"{name:<12}{count:>10}{measure(code, False):>12.3f}{measure(code, True):>12.3f}")
+
+
+if __name__ == '__main__':
+    main()
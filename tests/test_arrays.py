@@ -0,0 +1,103 @@
+import pytest
+
+import vbs
+
+
+def run(code, capsys, transpile):
+    vbs.SimpleVBSInterpreter().execute(code, transpile=transpile)
+    return capsys.readouterr().out.splitlines()
+
+
+@pytest.mark.parametrize('transpile', [False, True])
+@pytest.mark.parametrize('fill, first, second', [
+    ('i', '0', '1'),
+    ('i * 0.5', '0.0', '0.5'),
+    ('"s" & i', 's0', 's1'),
+])
+def test_assignment_copies_array(capsys, transpile, fill, first, second):
+    code = f'''Dim a(3)
+For i = 0 To 3 : a(i) = {fill} : Next
+b = a
+b(0) = "changed"
+WScript.Echo a(0) & " " & b(0)
+a(1) = "again"
+WScript.Echo a(1) & " " & b(1)'''
+    assert run(code, capsys, transpile) == [f'{first} changed', f'again {second}']
+
+
+@pytest.mark.parametrize('transpile', [False, True])
+def test_byval_argument_is_a_copy(capsys, transpile):
+    code = '''Sub Change(ByVal arr)
+  arr(0) = 99
+  WScript.Echo "in " & arr(0)
+End Sub
+Function Total(ByVal arr)
+  Total = arr(0) + arr(1)
+End Function
+Dim a(1)
+a(0) = 1 : a(1) = 2
+Change a
+WScript.Echo "out " & a(0)
+WScript.Echo Total(a)
+a(0) = 5
+WScript.Echo Total(a)'''
+    assert run(code, capsys, transpile) == ['in 99', 'out 1', '3', '7']
+
+
+@pytest.mark.parametrize('transpile', [False, True])
+def test_redim_preserve_does_not_affect_copy(capsys, transpile):
+    code = '''Dim a(1)
+a(0) = 1 : a(1) = 2
+b = a
+ReDim Preserve a(5)
+a(5) = 6
+a(0) = 10
+WScript.Echo UBound(a) & " " & UBound(b) & " " & a(0) & " " & b(0)
+ReDim Preserve b(0)
+WScript.Echo UBound(a) & " " & UBound(b) & " " & a(1)'''
+    assert run(code, capsys, transpile) == ['5 1 10 1', '5 0 2']
+
+
+@pytest.mark.parametrize('transpile', [False, True])
+def test_writes_through_chain_of_copies(capsys, transpile):
+    code = '''Dim a(2)
+a(0) = 1 : a(1) = 2 : a(2) = 3
+b = a
+c = b
+c(1) = 20
+b(2) = 30
+WScript.Echo a(0) + a(1) + a(2)
+WScript.Echo b(0) + b(1) + b(2)
+WScript.Echo c(0) + c(1) + c(2)
+a(0) = 100
+WScript.Echo a(0) & " " & b(0) & " " & c(0)'''
+    assert run(code, capsys, transpile) == ['6', '33', '24', '100 1 1']
+
+
+def test_copy_is_shared_until_written():
+    a = vbs.VBSArray((2,))
+    for i in range(3):
+        a.set([i], i)
+    b = a.copy()
+    assert b.data is a.data
+    b.set([0], 7)
+    assert b.data is not a.data
+    assert (a.get([0]), b.get([0])) == (0, 7)
+    # 共用的数组都已释放时，写入不再复制
+    c = a.copy()
+    data = a.data
+    del c
+    a.set([1], 5)
+    assert a.data is data
+
+
+@pytest.mark.parametrize('transpile', [False, True])
+@pytest.mark.parametrize('statement', [
+    'WScript.Echo a(-1)',
+    'a(-1) = 5',
+    'WScript.Echo a(3)',
+    'WScript.Echo a(0, 0)',
+])
+def test_list_array_index_out_of_range(capsys, transpile, statement):
+    code = 'a = Array(1, 2, 3)\n' + statement + '\nWScript.Echo Join(a, ",")'
+    assert run(code, capsys, transpile) == ['第2行错误: 下标越界']
@@ -0,0 +1,70 @@
+import pytest
+
+import vbs
+
+WORDS = ['abc', '', 'aXbXc', 'ABCabc', 'x']
+
+
+@pytest.mark.parametrize('find, replacewith, count, compare', [
+    ('', 'x', -1, 0),
+    ('', 'x', -1, 1),
+    ('a', 'z', 0, 0),
+    ('a', 'z', -1, 0),
+    ('a', 'z', 1, 0),
+    ('a', 'z', -1, 1),
+    ('X', '', -1, 0),
+])
+def test_batch_replace_matches_replace(find, replacewith, count, compare):
+    expected = [vbs.Replace(s, find, replacewith, 1, count, compare) for s in WORDS]
+    assert vbs.batch_replace(WORDS, find, replacewith, 1, count, compare) == expected
+
+
+def test_batch_replace_empty_find():
+    assert vbs.batch_replace(['abc'], '', 'x') == ['abc']
+
+
+@pytest.mark.parametrize('func, args, scalar', [
+    (vbs.batch_len, (), vbs.Len),
+    (vbs.batch_left, (2,), vbs.Left),
+    (vbs.batch_left, (0,), vbs.Left),
+    (vbs.batch_right, (0,), vbs.Right),
+    (vbs.batch_mid, (2, 0), vbs.Mid),
+    (vbs.batch_mid, (2,), vbs.Mid),
+    (vbs.batch_ucase, (), vbs.UCase),
+    (vbs.batch_replace, ('a', 'z'), vbs.Replace),
+])
+def test_batch_functions_accept_generators(func, args, scalar):
+    expected = [scalar(s, *args) for s in WORDS]
+    assert func((s for s in WORDS), *args) == expected
+
+
+@pytest.mark.parametrize('func, args, scalar', [
+    (vbs.batch_len, (), vbs.Len),
+    (vbs.batch_left, (2,), vbs.Left),
+    (vbs.batch_right, (0,), vbs.Right),
+    (vbs.batch_mid, (2, 2), vbs.Mid),
+    (vbs.batch_trim, (), vbs.Trim),
+    (vbs.batch_replace, ('b', 'y'), vbs.Replace),
+])
+def test_batch_functions_keep_numpy_shape(func, args, scalar):
+    numpy = pytest.importorskip('numpy')
+    values = numpy.array([['abc', ' de '], ['fgh', 'ijkl'], ['', 'b']])
+    result = func(values, *args)
+    assert result.shape == values.shape
+    assert result.tolist() == [[scalar(s, *args) for s in row] for row in values.tolist()]
+
+
+def test_batch_datediff_needs_a_column():
+    assert vbs.batch_datediff('d', ['2024-01-01'], '2024-02-01') == [31]
+    assert vbs.batch_datediff('d', '2024-01-01', ('2024-02-01', '2024-03-01')) == [31, 60]
+    with pytest.raises(TypeError):
+        vbs.batch_datediff('d', '2024-01-01', '2024-02-01')
+
+
+@pytest.mark.parametrize('func, args', [
+    (vbs.batch_len, ()),
+    (vbs.batch_datepart, ('d',)),
+])
+def test_batch_functions_reject_single_string(func, args):
+    with pytest.raises(TypeError):
+        func(*args, '2024-01-01')
@@ -0,0 +1,41 @@
+import pytest
+
+import vbs
+
+
+def run(code, capsys, transpile):
+    vbs.SimpleVBSInterpreter().execute(code, transpile=transpile)
+    return capsys.readouterr().out.splitlines()
+
+
+@pytest.mark.parametrize('transpile', [False, True])
+def test_procedure_const_does_not_leak_to_global_scope(capsys, transpile):
+    code = '''Const A = 5
+Sub S
+  Const A = 100
+  WScript.Echo "in " & A
+End Sub
+S
+WScript.Echo "top " & A'''
+    assert run(code, capsys, transpile) == ['in 100', 'top 5']
+
+
+@pytest.mark.parametrize('transpile', [False, True])
+def test_parameter_shadows_global_const(capsys, transpile):
+    code = '''Const Limit = 5
+Sub S(Limit)
+  WScript.Echo "param " & Limit
+End Sub
+S 7'''
+    assert run(code, capsys, transpile) == ['param 7']
+
+
+@pytest.mark.parametrize('transpile', [False, True])
+def test_dim_local_shadows_global_const(capsys, transpile):
+    code = '''Const Limit = 5
+Function F()
+  Dim Limit : Limit = 9
+  F = Limit
+End Function
+WScript.Echo F() & " " & Limit'''
+    assert run(code, capsys, transpile) == ['9 5']
@@ -0,0 +1,19 @@
+import os
+import stat
+import sys
+
+import pytest
+
+import vbs
+
+
+@pytest.mark.skipif(sys.platform == 'win32', reason='POSIX权限位')
+@pytest.mark.parametrize('source_mode, cache_mode', [(0o644, 0o644), (0o444, 0o644), (0o664, 0o664)])
+def test_vbsc_copies_source_permissions(tmp_path, source_mode, cache_mode):
+    script = tmp_path / 'perm.vbs'
+    script.write_bytes(b'x = 1\n')
+    os.chmod(script, source_mode)
+    vbs.clear_program_cache()
+    vbs.load_vbs_file(str(script))
+    cache_path = vbs.get_cache_path(str(script))
+    assert stat.S_IMODE(os.stat(cache_path).st_mode) == cache_mode
@@ -0,0 +1,28 @@
+import pytest
+
+import vbs
+
+
+def run(interpreter, code, capsys, transpile):
+    interpreter.execute(code, transpile=transpile)
+    return capsys.readouterr().out.splitlines()
+
+
+@pytest.mark.parametrize('transpile', [False, True])
+def test_builtin_errors_reach_on_error(capsys, transpile):
+    interpreter = vbs.SimpleVBSInterpreter()
+    code = 'On Error Resume Next\nx = Sqr(-1)\nWScript.Echo "[" & x & "]"'
+    assert run(interpreter, code, capsys, transpile) == ['[]']
+    code = 'x = Sqr(-1)\nWScript.Echo "not reached"'
+    assert run(interpreter, code, capsys, transpile) == ['第1行错误: 负数不能开平方根']
+
+
+@pytest.mark.parametrize('transpile', [False, True])
+def test_undefined_function_warns_once_per_run(capsys, transpile):
+    interpreter = vbs.SimpleVBSInterpreter()
+    code = 'For k = 1 To 3\n  y = Nope(k)\nNext\nz = Nope(0)\nWScript.Echo "[" & y & "]"'
+    expected = ["警告: 未定义的函数 'NOPE'", '[]']
+    assert run(interpreter, code, capsys, transpile) == expected
+    assert run(interpreter, code, capsys, transpile) == expected
+    interpreter.define_function('Nope', lambda k: k * 2)
+    assert run(interpreter, 'WScript.Echo Nope(4)', capsys, transpile) == ['8']
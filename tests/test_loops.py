@@ -0,0 +1,27 @@
+import pytest
+
+import vbs
+
+
+def run(code, capsys, transpile):
+    vbs.SimpleVBSInterpreter().execute(code, transpile=transpile)
+    return capsys.readouterr().out.splitlines()
+
+
+@pytest.mark.parametrize('transpile', [False, True])
+@pytest.mark.parametrize('header, expected', [
+    ('n = "2" : For i = n To 4', ['2', '3', '4']),
+    ('For i = 1 To "3"', ['1', '2', '3']),
+    ('For i = 1 To 5 Step "2"', ['1', '3', '5']),
+    ('For i = " 3 " To 1 Step -1', ['3', '2', '1']),
+    ('For i = True To 0', ['-1', '0']),
+])
+def test_for_bounds_are_converted_to_numbers(capsys, transpile, header, expected):
+    code = header + '\n  WScript.Echo i\nNext'
+    assert run(code, capsys, transpile) == expected
+
+
+@pytest.mark.parametrize('transpile', [False, True])
+def test_for_bound_that_is_not_a_number(capsys, transpile):
+    out = run('For i = 1 To "abc"\n  WScript.Echo i\nNext', capsys, transpile)
+    assert len(out) == 1 and '类型不匹配' in out[0]
@@ -0,0 +1,96 @@
+import pytest
+
+import vbs
+
+
+def run(interpreter, code, capsys, transpile):
+    interpreter.execute(code, transpile=transpile)
+    return capsys.readouterr().out.splitlines()
+
+
+@pytest.mark.parametrize('transpile', [False, True])
+def test_overridden_builtin_is_not_folded(capsys, transpile):
+    code = 'WScript.Echo Len("abc")\nFor k = 1 To 2\n  WScript.Echo Len("abcd") + k\nNext'
+    assert run(vbs.SimpleVBSInterpreter(), code, capsys, transpile) == ['3', '5', '6']
+    interpreter = vbs.SimpleVBSInterpreter()
+    interpreter.define_function('Len', lambda s: 42)
+    assert run(interpreter, code, capsys, transpile) == ['42', '43', '44']
+
+
+def test_program_optimized_for_overridden_builtin_is_rejected(capsys):
+    program = vbs.compile_vbs('WScript.Echo Len("abc")')
+    assert 'LEN' in program.builtins
+    interpreter = vbs.SimpleVBSInterpreter()
+    interpreter.define_function('Len', lambda s: 42)
+    interpreter.execute(program)
+    assert 'LEN' in capsys.readouterr().out
+    interpreter.execute(vbs.compile_vbs('WScript.Echo Len("abc")', overridden={'LEN'}))
+    assert capsys.readouterr().out.splitlines() == ['42']
+
+
+@pytest.mark.parametrize('transpile', [False, True])
+@pytest.mark.parametrize('loop', [
+    'For i = 1 To 0\n  x = Sqr(y)\nNext',
+    'For Each v In Array()\n  x = Sqr(y)\nNext',
+    'While 1 = 0\n  x = Sqr(y)\nWend',
+    'Do While 1 = 0\n  x = Sqr(y)\nLoop',
+    'For i = 1 To 3\n  If y >= 0 Then x = Sqr(y)\nNext',
+    'For i = 1 To 3\n  Exit For\n  x = Sqr(y)\nNext',
+])
+def test_hoisting_does_not_evaluate_skipped_calls(capsys, transpile, loop):
+    code = 'y = -1\n' + loop + '\nWScript.Echo "done"'
+    assert run(vbs.SimpleVBSInterpreter(), code, capsys, transpile) == ['done']
+
+
+@pytest.mark.parametrize('transpile', [False, True])
+def test_hoisted_calls_keep_results(capsys, transpile):
+    code = '''y = 4 : t = 0
+For i = 1 To 3
+  t = t + Sqr(y)
+Next
+Do
+  t = t + Sqr(y)
+Loop Until t > 10
+WScript.Echo t'''
+    program = vbs.compile_vbs(code)
+    assert len(program.optimizations) == 2
+    assert run(vbs.SimpleVBSInterpreter(), code, capsys, transpile) == ['12.0']
+
+
+@pytest.mark.parametrize('transpile', [False, True])
+def test_hoisted_values_are_not_script_variables(capsys, transpile):
+    interpreter = vbs.SimpleVBSInterpreter()
+    code = 'y = 9 : t = 0\nFor i = 1 To 2\n  t = t + Sqr(y)\nNext\nWScript.Echo t'
+    assert run(interpreter, code, capsys, transpile) == ['6.0']
+    assert sorted(key for key in interpreter.variables if key != 'WSCRIPT') == ['I', 'T', 'Y']
+
+
+def test_literal_folding_is_reported_and_can_be_disabled():
+    code = 'x = 1 + 2\ny = "a" & "b" & x'
+    program = vbs.compile_vbs(code)
+    assert [line for line, _ in program.optimizations] == [1, 2]
+    assert isinstance(program.body[0].expr, vbs.LiteralExpr)
+    program = vbs.compile_vbs(code, optimize=False)
+    assert program.optimizations is None
+    assert isinstance(program.body[0].expr, vbs.BinaryExpr)
+    assert len(program.body[1].expr.parts) == 3
+
+
+@pytest.mark.parametrize('optimize', [False, True])
+def test_constants_and_case_labels_without_optimization(capsys, optimize):
+    code = '''Const N = 2 * 3
+Select Case -N + 5
+  Case -1 : WScript.Echo "minus one"
+  Case Else : WScript.Echo "other"
+End Select'''
+    vbs.SimpleVBSInterpreter().execute(vbs.compile_vbs(code, optimize=optimize))
+    assert capsys.readouterr().out.splitlines() == ['minus one']
+
+
+@pytest.mark.parametrize('transpile', [False, True])
+def test_functions_named_in_loops_are_not_hoisted(capsys, transpile):
+    interpreter = vbs.SimpleVBSInterpreter()
+    calls = []
+    interpreter.define_function('Tick', lambda: calls.append(1) or len(calls))
+    code = 'For i = 1 To 3\n  t = Tick\nNext\nWScript.Echo t'
+    assert run(interpreter, code, capsys, transpile) == ['3']
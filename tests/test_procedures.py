@@ -0,0 +1,116 @@
+import sys
+
+import pytest
+
+import vbs
+
+
+def run(code, capsys, transpile):
+    vbs.SimpleVBSInterpreter().execute(code, transpile=transpile)
+    return capsys.readouterr().out.splitlines()
+
+
+INC = '''Sub Inc(n)
+  n = n + 1
+End Sub
+x = 1
+'''
+
+
+@pytest.mark.parametrize('transpile', [False, True])
+@pytest.mark.parametrize('statement, expected', [
+    ('Inc x', '2'),
+    ('Inc (x)', '1'),
+    ('Inc(x)', '1'),
+    ('Call Inc(x)', '2'),
+    ('Call Inc((x))', '1'),
+])
+def test_parenthesized_argument_is_passed_by_value(capsys, transpile, statement, expected):
+    code = INC + statement + '\nWScript.Echo x'
+    assert run(code, capsys, transpile) == [expected]
+
+
+@pytest.mark.parametrize('transpile', [False, True])
+def test_parenthesized_argument_in_function_call(capsys, transpile):
+    code = '''Function G(a, b)
+  a = a + 10
+  G = a + b
+End Function
+x = 1
+y = G((x), 0)
+z = G(x, 0)
+WScript.Echo x & " " & y & " " & z'''
+    assert run(code, capsys, transpile) == ['11 11 11']
+
+
+@pytest.mark.parametrize('transpile', [False, True])
+def test_deep_recursion(capsys, transpile):
+    code = '''Function Depth(n)
+  If n = 0 Then
+    Depth = 0
+  Else
+    Depth = Depth(n - 1) + 1
+  End If
+End Function
+WScript.Echo Depth(%d)''' % (vbs.MAX_CALL_DEPTH - 10)
+    limit = sys.getrecursionlimit()
+    assert run(code, capsys, transpile) == [str(vbs.MAX_CALL_DEPTH - 10)]
+    assert sys.getrecursionlimit() == limit
+
+
+@pytest.mark.parametrize('transpile', [False, True])
+def test_unbounded_recursion_reports_stack_overflow(capsys, transpile):
+    code = '''Sub F(n)
+  F n + 1
+End Sub
+F 0'''
+    out = run(code, capsys, transpile)
+    assert len(out) == 1 and out[0].endswith('堆栈溢出')
+
+
+@pytest.mark.parametrize('transpile', [False, True])
+def test_call_depth_limit_is_the_same_in_both_modes(capsys, transpile):
+    code = '''Function Depth(n)
+  If n = 0 Then
+    Depth = 0
+  Else
+    Depth = Depth(n - 1) + 1
+  End If
+End Function
+WScript.Echo Depth(%d)''' % (vbs.MAX_CALL_DEPTH + 10)
+    out = run(code, capsys, transpile)
+    assert len(out) == 1 and out[0].endswith('堆栈溢出')
+
+
+@pytest.mark.parametrize('transpile', [False, True])
+@pytest.mark.parametrize('statement, expected', [
+    ('Touch a(1)', '|x!|'),
+    ('Touch (a(1))', '|x|'),
+    ('Call Touch(a(i))', '|x!|'),
+    ('Keep a(1)', '|x|'),
+])
+def test_array_element_argument_is_passed_by_reference(capsys, transpile, statement, expected):
+    code = '''Sub Touch(v)
+  v = v & "!"
+  i = 2
+End Sub
+Sub Keep(ByVal v)
+  v = 0
+End Sub
+Dim a(2)
+a(1) = "x" : i = 1
+''' + statement + '\nWScript.Echo a(0) & "|" & a(1) & "|" & a(2)'
+    assert run(code, capsys, transpile) == [expected]
+
+
+@pytest.mark.parametrize('transpile', [False, True])
+def test_procedure_locals_do_not_depend_on_definition_order(capsys, transpile):
+    code = '''Sub A
+  WScript.Echo "[" & x & "]"
+End Sub
+Sub B
+  x = 5
+End Sub
+B
+A'''
+    assert run(code, capsys, transpile) == ['[]']
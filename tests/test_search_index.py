@@ -0,0 +1,63 @@
+import pytest
+
+import vbs
+
+
+@pytest.fixture
+def small_budget():
+    vbs.set_search_index_size(8, 200000)
+    vbs._search_indexes.clear()
+    yield
+    vbs.set_search_index_size(vbs._SEARCH_INDEX_SIZE, vbs._SEARCH_INDEX_MAX_BYTES)
+    vbs._search_indexes.clear()
+
+
+def cached_bytes():
+    return sum(index.nbytes() for index in vbs._search_indexes.values())
+
+
+def test_cached_strings_stay_within_byte_budget(small_budget):
+    for i in range(8):
+        text = ('%d-' % i) * 20000 + 'needle'
+        assert vbs.InStr(1, text, 'needle') == len(text) - 5
+        assert vbs.InStr(1, text, 'NEEDLE', vbs.vbTextCompare) == len(text) - 5
+        assert cached_bytes() <= 200000
+    assert len(vbs._search_indexes) < 8
+
+
+def test_string_over_budget_is_not_cached(small_budget):
+    text = 'x' * 300000 + 'needle'
+    assert vbs.InStr(1, text, 'needle') == 300001
+    assert vbs.InStrRev(text, 'x') == 300000
+    assert len(vbs._search_indexes) == 0
+
+
+def test_shrinking_budget_evicts_indexes(small_budget):
+    for i in range(3):
+        vbs.InStr(1, ('%d,' % i) * 10000, ';')
+    assert len(vbs._search_indexes) == 3
+    vbs.set_search_index_size(8, 30000)
+    assert len(vbs._search_indexes) == 1
+    assert cached_bytes() <= 30000
+
+
+def test_growing_index_is_charged_to_budget(small_budget):
+    texts = [('%d' % i) * 5000 + 'ab' * 9000 for i in range(2)]
+    for text in texts:
+        vbs.InStr(1, text, ';')
+    assert len(vbs._search_indexes) == 2
+    # 从头反复查找后记录全部出现位置，位置表占用9000 * 8字节，另有小写副本
+    for text in texts:
+        for _ in range(6):
+            assert vbs.InStr(1, text, 'AB', vbs.vbTextCompare) == 5001
+        assert cached_bytes() <= 200000
+    assert len(vbs._search_indexes) == 1
+    assert list(vbs._search_indexes.values())[0].text is texts[-1]
+
+
+def test_text_compare_on_short_strings_reuses_lowercase_copy():
+    text = 'Hello World, ' * 40
+    assert vbs.InStr(1, text, 'WORLD', vbs.vbTextCompare) == 7
+    assert vbs.InStr(8, text, 'world', vbs.vbTextCompare) == 20
+    assert vbs.InStrRev(text, 'HELLO', -1, vbs.vbTextCompare) == len(text) - 12
+    assert vbs._lowered_cache.get(text) == text.lower()
@@ -0,0 +1,53 @@
+import pytest
+
+import vbs
+
+
+def test_transpiled_program_sees_later_globals_and_functions(capsys):
+    program = vbs.compile_vbs('WScript.Echo "cnt=" & cnt & " f=" & Greet')
+    interpreter = vbs.SimpleVBSInterpreter()
+    interpreter.execute(program, transpile=True)
+    interpreter.execute('cnt = 5', transpile=True)
+    interpreter.define_function('Greet', lambda: 'hi')
+    interpreter.execute(program, transpile=True)
+    assert capsys.readouterr().out.splitlines() == ['cnt= f=', 'cnt=5 f=hi']
+
+
+def test_transpiled_program_matches_vm_when_run_twice(capsys):
+    program = vbs.compile_vbs('total = total + 1\nWScript.Echo "total=" & total')
+    outputs = []
+    for transpile in (False, True):
+        interpreter = vbs.SimpleVBSInterpreter()
+        interpreter.execute(program, transpile=transpile)
+        interpreter.execute(program, transpile=transpile)
+        outputs.append(capsys.readouterr().out)
+    assert outputs[0] == outputs[1] == 'total=1\ntotal=2\n'
+
+
+def test_transpiled_code_is_reused_for_unchanged_names():
+    program = vbs.compile_vbs('x = x + Len("ab")')
+    interpreter = vbs.SimpleVBSInterpreter()
+    interpreter.execute(program, transpile=True)
+    first = program.py_code
+    interpreter.execute(program, transpile=True)
+    assert program.py_code is first
+    assert interpreter.variables['X'] == 4
+
+
+@pytest.mark.parametrize('transpile', [False, True])
+def test_bracketed_and_non_ascii_names(capsys, transpile):
+    code = '''[my var] = 3
+Sub [do it](ByRef [a b])
+  [a b] = [a b] * 2
+End Sub
+[do it] [my var]
+名字 = "x" & [my var]
+WScript.Echo [my var] & 名字'''
+    vbs.SimpleVBSInterpreter().execute(code, transpile=transpile)
+    assert capsys.readouterr().out.splitlines() == ['6x6']
+
+
+@pytest.mark.parametrize('transpile', [False, True])
+def test_non_finite_constants(capsys, transpile):
+    vbs.SimpleVBSInterpreter().execute('x = 1E308 * 10\nWScript.Echo x & " " & -x', transpile=transpile)
+    assert capsys.readouterr().out.splitlines() == ['inf -inf']
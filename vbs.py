@@ -8,6 +8,7 @@ import sys
 import os
 import re
 import math
+import calendar
 import random
 import time
 import subprocess
@@ -15,8 +16,22 @@ import tkinter as tk
 from tkinter import messagebox, simpledialog
 import shutil
 import json
+import array
+import hashlib
+import pickle
+import tempfile
+from bisect import bisect_left, bisect_right
+from collections import ChainMap, OrderedDict
+from functools import partial
+from types import MappingProxyType
 from datetime import datetime, date, timedelta
-from typing import Any, Dict, List, Optional, Union, Tuple, Callable
+from typing import Any, Dict, List, Optional, Union, Tuple, Callable, Iterator, Sequence
+try:
+    import numpy
+except ImportError:  # NumPy是可选依赖，只在批量数组模式下使用
+    numpy = None
+
+__version__ = "2.0"
 
 # ================================================
 # 第一部分：VBScript 常量定义
@@ -89,6 +104,60 @@ vbDecimal = 14
 vbByte = 17
 vbArray = 8192
 
+# 字符串常量
+vbCr = "\r"
+vbLf = "\n"
+vbCrLf = "\r\n"
+vbNewLine = "\r\n"
+vbTab = "\t"
+vbBack = "\b"
+vbFormFeed = "\f"
+vbVerticalTab = "\v"
+vbNullChar = "\0"
+vbNullString = ""
+
+# 三态常量
+vbUseDefault = -2
+vbTrue = -1
+vbFalse = 0
+TristateUseDefault = -2
+TristateTrue = -1
+TristateFalse = 0
+
+# 消息框默认按钮与模式常量
+vbDefaultButton1 = 0
+vbDefaultButton2 = 256
+vbDefaultButton3 = 512
+vbDefaultButton4 = 768
+vbApplicationModal = 0
+vbSystemModal = 4096
+
+# 一年第一周常量
+vbUseSystem = 0
+vbUseSystemDayOfWeek = 0
+vbFirstJan1 = 1
+vbFirstFourDays = 2
+vbFirstFullWeek = 3
+
+# 颜色常量
+vbBlack = 0x000000
+vbRed = 0x0000FF
+vbGreen = 0x00FF00
+vbYellow = 0x00FFFF
+vbBlue = 0xFF0000
+vbMagenta = 0xFF00FF
+vbCyan = 0xFFFF00
+vbWhite = 0xFFFFFF
+
+# 错误常量
+vbObjectError = -2147221504
+
+# 常量表（大写名称 -> 值，只读），编译时据此把常量解析为字面量
+VBS_CONSTANTS = MappingProxyType({
+    name.upper(): value for name, value in list(globals().items())
+    if name.startswith(('vb', 'For', 'Tristate'))
+})
+
 # ================================================
 # 第二部分：ANSI编码支持函数
 # ================================================
@@ -158,6 +227,73 @@ def detect_file_encoding(filename: str) -> str:
 # 第三部分：VBScript内置函数实现
 # ================================================
 
+class _LRUCache:
+    """
+    最近最少使用（LRU）缓存
+    
+    属性:
+        maxsize: 最大条目数，超出时淘汰最久未使用的条目（0表示不缓存）
+        hits: 命中次数
+        misses: 未命中次数
+    """
+    __slots__ = ('maxsize', 'hits', 'misses', '_data')
+    
+    def __init__(self, maxsize: int = 128):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+    
+    def __len__(self) -> int:
+        return len(self._data)
+    
+    def get(self, key: Any, default: Any = None) -> Any:
+        """读取条目并标记为最近使用"""
+        data = self._data
+        try:
+            value = data[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        data.move_to_end(key)
+        self.hits += 1
+        return value
+    
+    def put(self, key: Any, value: Any):
+        """加入条目，超出容量时淘汰最久未使用的条目"""
+        if self.maxsize <= 0:
+            return
+        data = self._data
+        data[key] = value
+        data.move_to_end(key)
+        while len(data) > self.maxsize:
+            data.popitem(last=False)
+    
+    def values(self) -> list:
+        """全部条目的值，从最久未使用的开始"""
+        return list(self._data.values())
+    
+    def evict(self):
+        """淘汰最久未使用的条目"""
+        self._data.popitem(last=False)
+    
+    def resize(self, maxsize: int):
+        """修改容量，立即淘汰多出的条目"""
+        self.maxsize = maxsize
+        while len(self._data) > max(maxsize, 0):
+            self._data.popitem(last=False)
+    
+    def clear(self):
+        """清空条目并重置统计"""
+        self._data.clear()
+        self.hits = 0
+        self.misses = 0
+    
+    def info(self) -> Dict[str, int]:
+        """返回命中/未命中次数、当前条目数和容量"""
+        return {'hits': self.hits, 'misses': self.misses,
+                'size': len(self._data), 'maxsize': self.maxsize}
+
 def MsgBox(prompt: Any, buttons: int = 0, title: str = "", 
            helpfile: str = "", context: int = 0) -> int:
     """VBScript MsgBox函数"""
@@ -307,6 +443,173 @@ def LTrim(string: Any) -> str:
 def RTrim(string: Any) -> str:
     return str(string).rstrip()
 
+# 文本比较（vbTextCompare）用的忽略大小写的正则表达式，键为(查找内容, 比较方式)
+_TEXT_PATTERN_CACHE_SIZE = 256
+_text_pattern_cache = _LRUCache(_TEXT_PATTERN_CACHE_SIZE)
+
+def _text_pattern(find: str, compare: int) -> re.Pattern:
+    """查找find的正则表达式，文本比较时忽略大小写"""
+    key = (find, compare)
+    pattern = _text_pattern_cache.get(key)
+    if pattern is None:
+        pattern = re.compile(re.escape(find), re.IGNORECASE if compare == vbTextCompare else 0)
+        _text_pattern_cache.put(key, pattern)
+    return pattern
+
+# 长字符串的查找索引：最多缓存的字符串个数、每个字符串记录的查找内容个数、使用索引的最小长度，
+# 以及全部索引（字符串、小写副本和位置表）合计最多占用的字节数
+_SEARCH_INDEX_SIZE = 8
+_SEARCH_INDEX_NEEDLES = 32
+_SEARCH_INDEX_MIN_LENGTH = 4096
+_SEARCH_INDEX_MAX_BYTES = 64 * 1024 * 1024
+
+class _SearchIndex:
+    """
+    在同一个长字符串中反复查找（InStr/InStrRev）时使用的索引
+    
+    文本比较用的小写副本在第一次需要时生成。每个查找内容累计已经扫描过的字符数，
+    超过字符串长度（相当于完整扫描过一遍）后一次记录它的全部出现位置，
+    之后的查找在位置表中二分查找。沿字符串逐段查找的循环最多多扫描一遍，
+    从头反复查找同一内容时不再每次扫描整个字符串。
+    
+    生成小写副本或位置表后重新检查全部索引的内存限额，必要时淘汰最久未使用的索引。
+    
+    属性:
+        text: 被查找的字符串
+    """
+    __slots__ = ('text', '_lowered', '_needles')
+    
+    def __init__(self, text: str):
+        self.text = text
+        self._lowered = None
+        # (查找内容, 是否文本比较) -> 已扫描的字符数，或全部出现位置
+        self._needles = _LRUCache(_SEARCH_INDEX_NEEDLES)
+    
+    def nbytes(self) -> int:
+        """索引占用的字节数（字符串、小写副本和位置表）"""
+        total = sys.getsizeof(self.text)
+        if self._lowered is not None:
+            total += sys.getsizeof(self._lowered)
+        for entry in self._needles.values():
+            if type(entry) is not int:
+                total += entry.itemsize * len(entry)
+        return total
+    
+    def haystack(self, text_compare: bool) -> str:
+        """查找用的字符串，文本比较时为小写副本"""
+        if not text_compare:
+            return self.text
+        if self._lowered is None:
+            self._lowered = self.text.lower()
+            _trim_search_indexes(0)
+        return self._lowered
+    
+    def _scanned(self, key: tuple, scanned: int, text: str):
+        """记录累计扫描的字符数，超过字符串长度时改为记录全部出现位置"""
+        if scanned < len(text):
+            self._needles.put(key, scanned)
+            return
+        needle = key[0]
+        positions = array.array('q')
+        pos = text.find(needle)
+        while pos >= 0:
+            positions.append(pos)
+            pos = text.find(needle, pos + 1)
+        self._needles.put(key, positions)
+        _trim_search_indexes(0)
+    
+    def find(self, needle: str, start: int, text_compare: bool) -> int:
+        """从start（从0开始）向后查找needle，返回位置，找不到返回-1"""
+        text = self.haystack(text_compare)
+        # 附近就能找到时直接返回，不计入扫描量
+        pos = text.find(needle, start, start + _SEARCH_INDEX_MIN_LENGTH + len(needle))
+        if pos >= 0:
+            return pos
+        key = (needle, text_compare)
+        entry = self._needles.get(key, 0)
+        if type(entry) is int:
+            pos = text.find(needle, start)
+            end = len(text) if pos < 0 else pos
+            self._scanned(key, entry + max(end - start, 0), text)
+            return pos
+        i = bisect_left(entry, start)
+        return entry[i] if i < len(entry) else -1
+    
+    def rfind(self, needle: str, end: int, text_compare: bool) -> int:
+        """在前end个字符中从后向前查找needle，返回位置，找不到返回-1"""
+        text = self.haystack(text_compare)
+        pos = text.rfind(needle, max(end - _SEARCH_INDEX_MIN_LENGTH - len(needle), 0), end)
+        if pos >= 0:
+            return pos
+        key = (needle, text_compare)
+        entry = self._needles.get(key, 0)
+        if type(entry) is int:
+            pos = text.rfind(needle, 0, end)
+            self._scanned(key, entry + end - max(pos, 0), text)
+            return pos
+        # 找到的内容要完整地落在前end个字符之内
+        i = bisect_right(entry, end - len(needle))
+        return entry[i - 1] if i else -1
+
+# 键为字符串本身（字符串缓存了哈希值，同一对象再次查找时不再逐字比较）。
+# 缓存会让字符串在脚本不再使用后继续占用内存，因此加入新字符串时另按字节数限制总量
+_search_indexes = _LRUCache(_SEARCH_INDEX_SIZE)
+_search_index_max_bytes = _SEARCH_INDEX_MAX_BYTES
+
+def _trim_search_indexes(size: int):
+    """淘汰最久未使用的索引，直到再占用size字节后不超过限额"""
+    indexes = _search_indexes.values()
+    total = size + sum(index.nbytes() for index in indexes)
+    for index in indexes:
+        if total <= _search_index_max_bytes:
+            break
+        total -= index.nbytes()
+        _search_indexes.evict()
+
+def _search_index(text: str) -> Optional[_SearchIndex]:
+    """长字符串的查找索引，短字符串或超出内存限额的字符串直接查找，返回None"""
+    if len(text) < _SEARCH_INDEX_MIN_LENGTH or _search_indexes.maxsize <= 0:
+        return None
+    index = _search_indexes.get(text)
+    if index is None:
+        size = sys.getsizeof(text)
+        if size > _search_index_max_bytes:
+            return None
+        _trim_search_indexes(size)
+        index = _SearchIndex(text)
+        _search_indexes.put(text, index)
+    return index
+
+# 不建索引的字符串在文本比较时的小写副本。循环中常在同一个中等长度的字符串里反复查找，
+# 缓存后不再每次转换；更短的字符串直接转换比查缓存更快
+_LOWERED_CACHE_SIZE = 16
+_LOWERED_MIN_LENGTH = 256
+_lowered_cache = _LRUCache(_LOWERED_CACHE_SIZE)
+
+def _lowered(text: str) -> str:
+    """文本比较用的小写字符串"""
+    if len(text) < _LOWERED_MIN_LENGTH:
+        return text.lower()
+    lowered = _lowered_cache.get(text)
+    if lowered is None:
+        lowered = text.lower()
+        _lowered_cache.put(text, lowered)
+    return lowered
+
+def set_search_index_size(size: int, max_bytes: Optional[int] = None):
+    """
+    设置查找索引缓存的容量
+    
+    参数:
+        size: 缓存查找索引的长字符串个数（0表示不使用索引）
+        max_bytes: 全部索引合计最多占用的字节数，为None时不修改
+    """
+    global _search_index_max_bytes
+    _search_indexes.resize(size)
+    if max_bytes is not None:
+        _search_index_max_bytes = max_bytes
+        _trim_search_indexes(0)
+
 def InStr(start: Optional[int] = None, string1: Any = "", string2: Any = "", compare: int = 0) -> int:
     """修复：支持InStr(start, string1, string2)和InStr(string1, string2)两种形式"""
     if start is None:
@@ -324,10 +627,34 @@ def InStr(start: Optional[int] = None, string1: Any = "", string2: Any = "", com
         start = 1
     s1 = str(string1)
     s2 = str(string2)
-    if compare == vbTextCompare:
-        s1 = s1.lower()
+    text_compare = compare == vbTextCompare
+    if text_compare:
         s2 = s2.lower()
-    pos = s1.find(s2, start-1)
+    index = _search_index(s1) if s2 else None
+    if index is None:
+        pos = (_lowered(s1) if text_compare else s1).find(s2, start-1)
+    else:
+        pos = index.find(s2, start-1, text_compare)
+    return pos + 1 if pos != -1 else 0
+
+def InStrRev(string1: Any, string2: Any, start: int = -1, compare: int = 0) -> int:
+    """从字符串末尾（或start位置）向前查找，返回最后一次出现的位置"""
+    s1 = str(string1)
+    s2 = str(string2)
+    if start == -1:
+        start = len(s1)
+    if start < 1 or start > len(s1):
+        return 0
+    if not s2:
+        return start
+    text_compare = compare == vbTextCompare
+    if text_compare:
+        s2 = s2.lower()
+    index = _search_index(s1)
+    if index is None:
+        pos = (_lowered(s1) if text_compare else s1).rfind(s2, 0, start)
+    else:
+        pos = index.rfind(s2, start, text_compare)
     return pos + 1 if pos != -1 else 0
 
 def Replace(expression: Any, find: Any, replacewith: Any, 
@@ -335,50 +662,109 @@ def Replace(expression: Any, find: Any, replacewith: Any,
     expr = str(expression)
     find_str = str(find)
     replace_str = str(replacewith)
+    # 查找内容为空或count为0时不替换；count为负数时全部替换
+    if not find_str or count == 0:
+        return expr
     
     if compare == vbTextCompare:
-        expr_lower = expr.lower()
-        find_lower = find_str.lower()
-        result = []
-        i = 0
-        replaced = 0
-        while i < len(expr):
-            if (count == -1 or replaced < count) and expr_lower[i:i+len(find_lower)] == find_lower:
-                result.append(replace_str)
-                i += len(find_lower)
-                replaced += 1
-            else:
-                result.append(expr[i])
-                i += 1
-        return ''.join(result)
+        # 替换内容按原样插入，只需转义反斜杠
+        return _text_pattern(find_str, compare).sub(replace_str.replace('\\', '\\\\'), expr,
+                                                    max(count, 0))
+    return expr.replace(find_str, replace_str, count)
+
+# 长字符串的Split()返回按需切分的VBSSplitArray
+_LAZY_SPLIT_MIN_LENGTH = 65536
+_SPLIT_CHUNK = 65536
+_SPLIT_WORDS = re.compile(r'\S+')
+
+def _split_fields(text: str, delimiter: str, limit: int, compare: int) -> Iterator[str]:
+    """按Split的规则逐个产生元素，limit大于0时第limit个元素包含剩余的全部内容"""
+    count = 1
+    if delimiter == " ":
+        # 与str.split()相同：以连续的空白分隔，忽略首尾空白
+        for match in _SPLIT_WORDS.finditer(text):
+            if count == limit:
+                yield text[match.start():]
+                return
+            yield match.group()
+            count += 1
+        return
+    if not delimiter or limit == 1:
+        yield text
+        return
+    pos = 0
+    if compare == vbTextCompare:
+        for match in _text_pattern(delimiter, compare).finditer(text):
+            if count == limit:
+                break
+            yield text[pos:match.start()]
+            pos = match.end()
+            count += 1
+    elif limit <= 0 and not any(delimiter[:k] == delimiter[-k:] for k in range(1, len(delimiter))):
+        # 不限个数时按块用str.split()切分。分隔符的首尾没有相同的部分时，
+        # 各处出现的分隔符互不重叠，可以在任一处分块
+        find = text.find
+        size = len(delimiter)
+        while True:
+            end = find(delimiter, pos + _SPLIT_CHUNK)
+            if end < 0:
+                break
+            yield from text[pos:end].split(delimiter)
+            pos = end + size
+        yield from text[pos:].split(delimiter)
+        return
     else:
-        if count == -1:
-            return expr.replace(find_str, replace_str)
-        else:
-            parts = expr.split(find_str)
-            if len(parts) == 1:
-                return expr
-            result = parts[0]
-            for i in range(1, min(count + 1, len(parts))):
-                result += replace_str + parts[i]
-            if len(parts) > count + 1:
-                result += find_str + find_str.join(parts[count+1:])
-            return result
+        find = text.find
+        size = len(delimiter)
+        while count != limit:
+            end = find(delimiter, pos)
+            if end < 0:
+                break
+            yield text[pos:end]
+            pos = end + size
+            count += 1
+    yield text[pos:]
+
+def _split_count(text: str, delimiter: str, limit: int, compare: int) -> int:
+    """Split结果的元素个数，不生成各个元素"""
+    if delimiter == " ":
+        count = sum(1 for _ in _SPLIT_WORDS.finditer(text))
+    elif not delimiter:
+        count = 1
+    elif compare == vbTextCompare:
+        count = sum(1 for _ in _text_pattern(delimiter, compare).finditer(text)) + 1
+    else:
+        count = text.count(delimiter) + 1
+    return min(count, limit) if limit > 0 else count
 
 def Split(expression: Any, delimiter: str = " ", limit: int = -1, 
-          compare: int = 0) -> List[str]:
+          compare: int = 0) -> Union[List[str], 'VBSSplitArray']:
     expr = str(expression)
     delim = str(delimiter)
+    limit = int(limit)
+    if len(expr) >= _LAZY_SPLIT_MIN_LENGTH:
+        return VBSSplitArray(expr, delim, limit, compare)
+    maxsplit = limit - 1 if limit > 0 else -1
     if delim == " ":
-        parts = expr.split()
-    else:
-        parts = expr.split(delim)
-    if limit > 0 and limit < len(parts):
-        parts = parts[:limit]
-    return parts
+        return expr.split(None, maxsplit)
+    if not delim or maxsplit == 0:
+        return [expr]
+    if compare == vbTextCompare:
+        return _text_pattern(delim, compare).split(expr, max(maxsplit, 0))
+    return expr.split(delim, maxsplit)
 
 def Join(list_array: Any, delimiter: str = " ") -> str:
-    if not isinstance(list_array, (list, tuple)):
+    if list_array.__class__ is VBSSplitArray:
+        joined = list_array.join(str(delimiter))
+        if joined is not None:
+            return joined
+    if isinstance(list_array, VBSArray):
+        dense = list_array.dense()
+        if dense is not None:
+            # 整数/浮点数组一次转换为Python数值列表
+            return str(delimiter).join(map(str, dense.tolist()))
+        list_array = ["" if item is None else item for item in list_array.values()]
+    elif not isinstance(list_array, (list, tuple)):
         return str(list_array)
     delim = str(delimiter)
     return delim.join(str(item) for item in list_array)
@@ -400,17 +786,109 @@ def String(number: int, character: Any) -> str:
 def StrReverse(string: Any) -> str:
     return str(string)[::-1]
 
+# 字符串函数的批量版本：Python代码处理整列数据时使用，结果与逐个调用对应的函数相同。
+# values为列表（或其他可迭代对象）时返回列表，为NumPy数组时返回形状相同的NumPy数组。
+def _batch_items(values: Any) -> list:
+    """批量函数的输入元素，NumPy数组先展平并一次转换为Python对象，生成器等转换为列表"""
+    if numpy is not None and isinstance(values, numpy.ndarray):
+        return values.ravel().tolist()
+    if isinstance(values, (list, tuple)):
+        return values
+    if isinstance(values, str):
+        # 单个字符串不按字符逐个处理
+        raise TypeError("批量函数需要一列值，不能是单个字符串")
+    return list(values)
+
+def _batch_result(values: Any, result: list, dtype: type = str) -> Any:
+    """按输入的类型返回批量函数的结果"""
+    if numpy is not None and isinstance(values, numpy.ndarray):
+        return numpy.array(result, dtype=dtype).reshape(values.shape)
+    return result
+
+def batch_len(values: Any) -> Any:
+    """批量Len"""
+    return _batch_result(values, list(map(len, map(str, _batch_items(values)))), int)
+
+def batch_left(values: Any, length: int) -> Any:
+    """批量Left"""
+    items = _batch_items(values)
+    if length > 0:
+        return _batch_result(values, [s[:length] for s in map(str, items)])
+    return _batch_result(values, [""] * len(items))
+
+def batch_right(values: Any, length: int) -> Any:
+    """批量Right"""
+    items = _batch_items(values)
+    if length > 0:
+        return _batch_result(values, [s[-length:] for s in map(str, items)])
+    return _batch_result(values, [""] * len(items))
+
+def batch_mid(values: Any, start: int, length: Optional[int] = None) -> Any:
+    """批量Mid"""
+    items = _batch_items(values)
+    if start < 1:
+        start = 1
+    if length is not None and length <= 0:
+        return _batch_result(values, [""] * len(items))
+    # 起始位置超出字符串长度时切片本身就是空串
+    end = None if length is None else start - 1 + length
+    return _batch_result(values, [s[start - 1:end] for s in map(str, items)])
+
+def batch_ucase(values: Any) -> Any:
+    """批量UCase"""
+    return _batch_result(values, list(map(str.upper, map(str, _batch_items(values)))))
+
+def batch_lcase(values: Any) -> Any:
+    """批量LCase"""
+    return _batch_result(values, list(map(str.lower, map(str, _batch_items(values)))))
+
+def batch_trim(values: Any) -> Any:
+    """批量Trim"""
+    return _batch_result(values, list(map(str.strip, map(str, _batch_items(values)))))
+
+def batch_ltrim(values: Any) -> Any:
+    """批量LTrim"""
+    return _batch_result(values, list(map(str.lstrip, map(str, _batch_items(values)))))
+
+def batch_rtrim(values: Any) -> Any:
+    """批量RTrim"""
+    return _batch_result(values, list(map(str.rstrip, map(str, _batch_items(values)))))
+
+def batch_replace(values: Any, find: Any, replacewith: Any,
+                  start: int = 1, count: int = -1, compare: int = 0) -> Any:
+    """批量Replace"""
+    items = _batch_items(values)
+    find_str = str(find)
+    if not find_str or count == 0:
+        # 与Replace相同：查找内容为空或count为0时不替换
+        result = list(map(str, items))
+    elif compare != vbTextCompare and count == -1:
+        replace_str = str(replacewith)
+        result = [s.replace(find_str, replace_str) for s in map(str, items)]
+    else:
+        result = [Replace(s, find, replacewith, start, count, compare) for s in items]
+    return _batch_result(values, result)
+
 # 数学函数
 def Abs(number: Any) -> float:
+    if number.__class__ is VBSArray:
+        return _map_array(number, Abs, lambda data: numpy.abs(data, dtype=numpy.float64))
     return abs(float(number))
 
 def Sqr(number: Any) -> float:
+    if number.__class__ is VBSArray:
+        # 有负数时逐个计算，在第一个负数处报错
+        return _map_array(number, Sqr, lambda data: None if (data < 0).any()
+                          else numpy.sqrt(data, dtype=numpy.float64))
     n = float(number)
     if n < 0:
         raise ValueError("负数不能开平方根")
     return math.sqrt(n)
 
 def Sgn(number: Any) -> int:
+    if number.__class__ is VBSArray:
+        return _map_array(number, Sgn, lambda data: None if numpy.isnan(data).any()
+                          else numpy.sign(data).astype(numpy.int64))
     n = float(number)
     if n > 0:
         return 1
@@ -420,14 +898,23 @@ def Sgn(number: Any) -> int:
         return 0
 
 def Int(number: Any) -> int:
+    if number.__class__ is VBSArray:
+        return _map_array(number, Int, lambda data: _numpy_integral(data, numpy.floor))
     n = float(number)
     return math.floor(n)
 
 def Fix(number: Any) -> int:
+    if number.__class__ is VBSArray:
+        return _map_array(number, Fix, lambda data: _numpy_integral(data, numpy.trunc))
     n = float(number)
     return math.floor(n) if n >= 0 else math.ceil(n)
 
 def Round(number: Any, decimals: int = 0) -> float:
+    if number.__class__ is VBSArray:
+        # numpy.round与round()同样舍入到偶数，但指定小数位数时结果可能不同
+        return _map_array(number, lambda value: Round(value, decimals),
+                          lambda data: None if decimals else numpy.round(
+                              data.astype(numpy.float64)))
     return round(float(number), decimals)
 
 # 随机数函数
@@ -493,6 +980,58 @@ def CBool(expression: Any) -> bool:
             return False
     return bool(expression)
 
+# CDate识别的日期格式（按顺序尝试），和其中只有日期的格式
+_DATE_FORMATS = (
+    "%Y-%m-%d %H:%M:%S", "%Y/%m/%d %H:%M:%S",
+    "%Y-%m-%d", "%Y/%m/%d",
+    "%m/%d/%Y", "%d/%m/%Y", "%d-%b-%Y",
+    "%m/%d/%y", "%d/%m/%y",
+)
+_DATE_ONLY_FORMATS = frozenset(_DATE_FORMATS[2:])
+
+# 常见格式的快速解析：年-月-日[ 时:分:秒]（-或/分隔）和 月/日/年（月份无效时为 日/月/年）。
+# 结果与按_DATE_FORMATS顺序用strptime解析相同，数值无效时仍交给strptime。
+# 两个正则表达式匹配的字符串互不重叠，不匹配时在前几个字符就失败，因此不记录上次成功的格式：
+# 先试上次的格式在测量中没有可见的差别，而strptime的格式之间有先后（月/日与日/月），
+# 改变尝试顺序会改变结果
+_DATE_ISO = re.compile(r'([0-9]{4})([-/])([0-9]{1,2})\2([0-9]{1,2})'
+                       r'(?: ([0-9]{1,2}):([0-9]{1,2}):([0-9]{1,2}))?')
+_DATE_SLASH = re.compile(r'([0-9]{1,2})/([0-9]{1,2})/([0-9]{4}|[0-9]{2})')
+_TIME_PREFIX = re.compile(r'(\d{1,2}):(\d{1,2})(?::(\d{1,2}))?')
+
+# 字符串 -> CDate结果的缓存（只缓存不依赖当前日期的结果）
+_DATE_CACHE_SIZE = 1024
+_date_cache = _LRUCache(_DATE_CACHE_SIZE)
+
+def _parse_date(text: str) -> Union[datetime, date, None]:
+    """快速解析常见格式的日期，不是这些格式或数值无效时返回None"""
+    match = _DATE_ISO.fullmatch(text)
+    if match is not None:
+        year, _, month, day, hour, minute, second = match.groups()
+        try:
+            if hour is None:
+                return date(int(year), int(month), int(day))
+            return datetime(int(year), int(month), int(day), int(hour), int(minute), int(second))
+        except ValueError:
+            return None
+    match = _DATE_SLASH.fullmatch(text)
+    if match is not None:
+        first, second, year_text = match.groups()
+        year = int(year_text)
+        if len(year_text) == 2:
+            # 与strptime的%y相同：69-99为19xx，00-68为20xx
+            year += 2000 if year <= 68 else 1900
+        for month, day in ((first, second), (second, first)):
+            try:
+                return date(year, int(month), int(day))
+            except ValueError:
+                pass
+    return None
+
+def set_date_cache_size(size: int):
+    """设置CDate解析结果缓存的容量（0表示不缓存）"""
+    _date_cache.resize(size)
+
 def CDate(expression: Any) -> Union[datetime, date]:
     """修复：正确返回日期时间或日期类型"""
     if isinstance(expression, (datetime, date)):
@@ -505,6 +1044,10 @@ def CDate(expression: Any) -> Union[datetime, date]:
     if not str_expr:
         return datetime.now()
     
+    result = _date_cache.get(str_expr)
+    if result is not None:
+        return result
+    
     # 处理特殊字符串
     lower_expr = str_expr.lower()
     if lower_expr in ["now"]:
@@ -517,31 +1060,23 @@ def CDate(expression: Any) -> Union[datetime, date]:
         return date.today() - timedelta(days=1)
     
     # 尝试解析日期时间格式
-    date_formats = [
-        "%Y-%m-%d %H:%M:%S", "%Y/%m/%d %H:%M:%S",
-        "%Y-%m-%d", "%Y/%m/%d", "%H:%M:%S",
-        "%m/%d/%Y", "%d/%m/%Y", "%d-%b-%Y",
-        "%m/%d/%y", "%d/%m/%y",
-    ]
-    
-    for fmt in date_formats:
-        try:
-            # 检查是否是纯时间格式
-            if fmt == "%H:%M:%S" and ":" in str_expr and "-" not in str_expr and "/" not in str_expr:
-                today = date.today()
-                time_part = datetime.strptime(str_expr, fmt).time()
-                return datetime.combine(today, time_part)
-            
-            result = datetime.strptime(str_expr, fmt)
+    result = _parse_date(str_expr)
+    if result is None:
+        for fmt in _DATE_FORMATS:
+            try:
+                result = datetime.strptime(str_expr, fmt)
+            except ValueError:
+                continue
             # 如果是纯日期格式，返回date类型
-            if fmt in ["%Y-%m-%d", "%Y/%m/%d", "%m/%d/%Y", "%d/%m/%Y", "%d-%b-%Y", "%m/%d/%y", "%d/%m/%y"]:
-                return result.date()
-            return result
-        except ValueError:
-            continue
-    
-    # 尝试解析时间格式（无日期）
-    time_match = re.match(r'(\d{1,2}):(\d{1,2})(?::(\d{1,2}))?', str_expr)
+            if fmt in _DATE_ONLY_FORMATS:
+                result = result.date()
+            break
+    if result is not None:
+        _date_cache.put(str_expr, result)
+        return result
+    
+    # 尝试解析时间格式（无日期），日期为今天
+    time_match = _TIME_PREFIX.match(str_expr)
     if time_match:
         hour = int(time_match.group(1))
         minute = int(time_match.group(2))
@@ -609,35 +1144,34 @@ def Timer() -> float:
     midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
     return (now - midnight).total_seconds()
 
-def DateAdd(interval: str, number: int, date_value: Any) -> Union[datetime, date]:
-    """修复：正确处理日期运算"""
-    d = CDate(date_value)
-    n = int(number)
-    interval = interval.lower()
-    
-    # 如果是date类型，转换为datetime以便运算
-    if isinstance(d, date) and not isinstance(d, datetime):
+def _to_datetime(value: Any) -> datetime:
+    """CDate的结果，日期统一为当天0点的datetime以便运算"""
+    if value.__class__ is datetime:
+        return value
+    d = CDate(value)
+    if not isinstance(d, datetime):
         d = datetime.combine(d, datetime.min.time())
-    
+    return d
+
+def _add_months(d: datetime, months: int) -> datetime:
+    """加减月份，日超出目标月份的天数时取该月最后一天"""
+    year, month = divmod(d.month - 1 + months, 12)
+    year += d.year
+    month += 1
+    day = d.day
+    if day > 28:
+        day = min(day, calendar.monthrange(year, month)[1])
+    return d.replace(year=year, month=month, day=day)
+
+def _date_add(interval: str, n: int, d: datetime) -> datetime:
+    """DateAdd的计算部分，interval为小写"""
     if interval == "yyyy":
-        try:
-            return d.replace(year=d.year + n)
-        except ValueError:
-            # 处理2月29日等特殊情况
-            return d + timedelta(days=365*n + (n//4))  # 近似处理闰年
+        # 2月29日加减整年后为2月28日
+        return _add_months(d, n * 12)
     elif interval == "q":
-        months = n * 3
-        return DateAdd("m", months, d)
+        return _add_months(d, n * 3)
     elif interval == "m":
-        # 正确处理月份加减
-        year = d.year + (d.month + n - 1) // 12
-        month = (d.month + n - 1) % 12 + 1
-        try:
-            return d.replace(year=year, month=month)
-        except ValueError:
-            # 处理无效日期（如2月30日）
-            day = min(d.day, 28)  # 使用28日避免日期溢出
-            return d.replace(year=year, month=month, day=day)
+        return _add_months(d, n)
     elif interval == "d":
         return d + timedelta(days=n)
     elif interval == "w":
@@ -651,21 +1185,8 @@ def DateAdd(interval: str, number: int, date_value: Any) -> Union[datetime, date
     else:
         return d
 
-def DateDiff(interval: str, date1: Any, date2: Any, 
-             firstdayofweek: int = 1, firstweekofyear: int = 1) -> int:
-    """修复：正确计算日期差"""
-    d1 = CDate(date1)
-    d2 = CDate(date2)
-    
-    # 统一为datetime类型
-    if isinstance(d1, date) and not isinstance(d1, datetime):
-        d1 = datetime.combine(d1, datetime.min.time())
-    if isinstance(d2, date) and not isinstance(d2, datetime):
-        d2 = datetime.combine(d2, datetime.min.time())
-    
-    diff = d2 - d1
-    interval = interval.lower()
-    
+def _date_diff(interval: str, d1: datetime, d2: datetime) -> int:
+    """DateDiff的计算部分，interval为小写"""
     if interval == "yyyy":
         return d2.year - d1.year
     elif interval == "q":
@@ -673,7 +1194,8 @@ def DateDiff(interval: str, date1: Any, date2: Any,
         return months // 3
     elif interval == "m":
         return (d2.year - d1.year) * 12 + (d2.month - d1.month)
-    elif interval == "d":
+    diff = d2 - d1
+    if interval == "d":
         return diff.days
     elif interval == "w":
         return diff.days // 7
@@ -686,11 +1208,678 @@ def DateDiff(interval: str, date1: Any, date2: Any,
     else:
         return 0
 
+def _date_part(interval: str, d: datetime, firstdayofweek: int) -> int:
+    """DatePart的计算部分，interval为小写"""
+    if interval == "yyyy":
+        return d.year
+    elif interval == "q":
+        return (d.month - 1) // 3 + 1
+    elif interval == "m":
+        return d.month
+    elif interval == "y":
+        return d.timetuple().tm_yday
+    elif interval == "d":
+        return d.day
+    elif interval == "w":
+        # isoweekday() % 7 + 1 为以星期日为1的星期
+        return (d.isoweekday() % 7 + 1 - firstdayofweek) % 7 + 1
+    elif interval == "ww":
+        jan1 = date(d.year, 1, 1)
+        offset = (jan1.isoweekday() % 7 + 1 - firstdayofweek) % 7
+        return (d.timetuple().tm_yday - 1 + offset) // 7 + 1
+    elif interval == "h":
+        return d.hour
+    elif interval == "n":  # 分钟
+        return d.minute
+    elif interval == "s":
+        return d.second
+    else:
+        return 0
+
+def DateAdd(interval: str, number: int, date_value: Any) -> Union[datetime, date]:
+    """修复：正确处理日期运算"""
+    return _date_add(interval.lower(), int(number), _to_datetime(date_value))
+
+def DateDiff(interval: str, date1: Any, date2: Any, 
+             firstdayofweek: int = 1, firstweekofyear: int = 1) -> int:
+    """修复：正确计算日期差"""
+    return _date_diff(interval.lower(), _to_datetime(date1), _to_datetime(date2))
+
+def DatePart(interval: str, date_value: Any,
+             firstdayofweek: int = 1, firstweekofyear: int = 1) -> int:
+    """返回日期的指定部分（年、季、月、日、星期、周、时、分、秒），周只支持vbFirstJan1"""
+    return _date_part(interval.lower(), _to_datetime(date_value), int(firstdayofweek) or vbSunday)
+
+# 日期函数的批量版本：处理整列日期时使用，结果与逐个调用对应的函数相同。
+# 日期为NumPy datetime64数组时用NumPy整列计算，DateAdd返回datetime64[us]数组，
+# DateDiff和DatePart返回整数数组；其他输入的处理方式与字符串函数的批量版本相同。
+_MICROSECONDS = {'d': 86400 * 10**6, 'h': 3600 * 10**6, 'n': 60 * 10**6, 's': 10**6}
+
+def _is_datetime64(values: Any) -> bool:
+    """values是否为NumPy datetime64数组"""
+    return numpy is not None and isinstance(values, numpy.ndarray) and values.dtype.kind == 'M'
+
+def _datetime64(values: Any) -> Any:
+    """NumPy整列计算用的datetime64[us]值（标量先经过CDate）"""
+    if not isinstance(values, numpy.ndarray):
+        values = numpy.datetime64(_to_datetime(values))
+    return values.astype('datetime64[us]')
+
+def _is_column(values: Any) -> bool:
+    """values是否为一列值（列表、元组或NumPy数组）"""
+    return isinstance(values, (list, tuple)) or (numpy is not None and isinstance(values, numpy.ndarray))
+
+def _batch_values(values: Any, size: int) -> list:
+    """与日期列逐个对应的参数，标量重复size次"""
+    if _is_column(values):
+        return _batch_items(values)
+    return [values] * size
+
+def _numpy_add_months(dates: Any, months: Any) -> Any:
+    """datetime64[us]整列加减月份，日超出目标月份的天数时取该月最后一天"""
+    days = dates.astype('datetime64[D]')
+    month_start = dates.astype('datetime64[M]')
+    target = month_start + months.astype('timedelta64[M]')
+    target_days = target.astype('datetime64[D]')
+    last_day = (target + 1).astype('datetime64[D]') - target_days - 1
+    day = numpy.minimum(days - month_start.astype('datetime64[D]'), last_day)
+    return target_days + day + (dates - days)
+
+def batch_dateadd(interval: str, number: Any, values: Any) -> Any:
+    """批量DateAdd，number可以是标量或与values等长的序列"""
+    interval = interval.lower()
+    if _is_datetime64(values):
+        dates = _datetime64(values)
+        n = numpy.asarray(number).astype(numpy.int64)
+        if interval in ("yyyy", "q", "m"):
+            return _numpy_add_months(dates, n * {"yyyy": 12, "q": 3, "m": 1}[interval])
+        if interval == "w":
+            return dates + n * numpy.timedelta64(7, 'D')
+        if interval in _MICROSECONDS:
+            return dates + n * numpy.timedelta64(_MICROSECONDS[interval], 'us')
+        return dates
+    items = _batch_items(values)
+    numbers = _batch_values(number, len(items))
+    result = [_date_add(interval, int(n), _to_datetime(value)) for n, value in zip(numbers, items)]
+    return _batch_result(values, result, 'datetime64[us]')
+
+def batch_datediff(interval: str, dates1: Any, dates2: Any,
+                   firstdayofweek: int = 1, firstweekofyear: int = 1) -> Any:
+    """批量DateDiff，dates1和dates2中可以有一个是单个日期"""
+    interval = interval.lower()
+    if _is_datetime64(dates1) or _is_datetime64(dates2):
+        d1 = _datetime64(dates1)
+        d2 = _datetime64(dates2)
+        if interval in ("yyyy", "q", "m"):
+            unit = 'datetime64[Y]' if interval == "yyyy" else 'datetime64[M]'
+            diff = (d2.astype(unit) - d1.astype(unit)).astype(numpy.int64)
+            return diff // 3 if interval == "q" else diff
+        us = (d2 - d1).astype(numpy.int64)
+        if interval == "w":
+            return us // _MICROSECONDS['d'] // 7
+        if interval == "s":
+            # 与int(total_seconds())相同，向零取整
+            return numpy.sign(us) * (numpy.abs(us) // _MICROSECONDS['s'])
+        if interval in _MICROSECONDS:
+            return us // _MICROSECONDS[interval]
+        return numpy.zeros_like(us)
+    if not _is_column(dates1) and not _is_column(dates2):
+        raise TypeError("batch_datediff的dates1和dates2至少有一个应为一列日期，两个日期请用DateDiff")
+    values = dates1 if _is_column(dates1) else dates2
+    size = len(_batch_items(values))
+    result = [_date_diff(interval, _to_datetime(d1), _to_datetime(d2))
+              for d1, d2 in zip(_batch_values(dates1, size), _batch_values(dates2, size))]
+    return _batch_result(values, result, int)
+
+def batch_datepart(interval: str, values: Any,
+                   firstdayofweek: int = 1, firstweekofyear: int = 1) -> Any:
+    """批量DatePart"""
+    interval = interval.lower()
+    firstdayofweek = int(firstdayofweek) or vbSunday
+    if _is_datetime64(values):
+        dates = _datetime64(values)
+        days = dates.astype('datetime64[D]')
+        year_start = dates.astype('datetime64[Y]').astype('datetime64[D]')
+        months = dates.astype('datetime64[M]').astype(numpy.int64)
+        if interval == "yyyy":
+            return dates.astype('datetime64[Y]').astype(numpy.int64) + 1970
+        if interval == "q":
+            return months % 12 // 3 + 1
+        if interval == "m":
+            return months % 12 + 1
+        if interval == "y":
+            return (days - year_start).astype(numpy.int64) + 1
+        if interval == "d":
+            return (days - dates.astype('datetime64[M]').astype('datetime64[D]')).astype(numpy.int64) + 1
+        if interval in ("w", "ww"):
+            # 1970-01-01是星期四（以星期日为1时为5）
+            weekday = (days.astype(numpy.int64) + 4) % 7 + 1
+            if interval == "w":
+                return (weekday - firstdayofweek) % 7 + 1
+            jan1 = (year_start.astype(numpy.int64) + 4) % 7 + 1
+            offset = (jan1 - firstdayofweek) % 7
+            return ((days - year_start).astype(numpy.int64) + offset) // 7 + 1
+        us = (dates - days).astype(numpy.int64)
+        if interval == "h":
+            return us // _MICROSECONDS['h']
+        if interval == "n":
+            return us // _MICROSECONDS['n'] % 60
+        if interval == "s":
+            return us // _MICROSECONDS['s'] % 60
+        return numpy.zeros_like(months)
+    items = _batch_items(values)
+    result = [_date_part(interval, _to_datetime(value), firstdayofweek) for value in items]
+    return _batch_result(values, result, int)
+
 # 数组函数
+class VBSArray:
+    """
+    VBScript数组（Dim a(n, m) 或 ReDim 创建）
+    
+    多维数组按行优先存放在一维缓冲区中，最后一维按容量stride存放。
+    ReDim Preserve只改变最后一维，容量不足时按1.5倍扩大，逐个追加元素时总体为线性时间。
+    缓冲区在第一次赋值时分配：元素全部是整数或全部是浮点数时使用类型化缓冲区
+    （array.array，NumPy批量模式下为numpy.ndarray，见set_numpy_arrays()），
+    另用bytearray记录已赋值的元素（未赋值的元素为Empty）；写入其他类型的值时改为列表。
+    
+    属性:
+        bounds: 各维的上界（下界总是0）
+        stride: 最后一维的容量
+        data: 元素缓冲区：None（尚未赋值）、list或类型化缓冲区
+        mask: data为类型化缓冲区时各元素是否已赋值
+        kind: data为类型化缓冲区时元素的类型（int或float）
+        shared: 缓冲区与copy()得到的其他数组共用时为共用计数[共用的数组个数]，否则为None；
+            写入前仍有其他数组共用时先复制（写时复制），数组释放时计数减一
+    """
+    __slots__ = ('bounds', 'stride', 'data', 'mask', 'kind', 'shared')
+    
+    def __init__(self, bounds: Tuple[int, ...]):
+        self.bounds = _array_bounds(bounds)
+        self.stride = self.bounds[-1] + 1
+        self.data = None
+        self.mask = None
+        self.kind = None
+        self.shared = None
+    
+    def __del__(self):
+        share = self.shared
+        if share is not None:
+            share[0] -= 1
+    
+    @classmethod
+    def from_list(cls, values: list) -> 'VBSArray':
+        """由一维列表（如Array()、Split()的结果）创建数组"""
+        array = cls((len(values) - 1,))
+        array.data = list(values)
+        return array
+    
+    def __len__(self) -> int:
+        return self._rows() * (self.bounds[-1] + 1)
+    
+    def __iter__(self):
+        return iter(self.values())
+    
+    def __repr__(self) -> str:
+        return f"<VBSArray({', '.join(str(bound) for bound in self.bounds)})>"
+    
+    def _rows(self, bounds: Optional[tuple] = None) -> int:
+        """除最后一维外各维大小的乘积"""
+        rows = 1
+        for bound in (bounds or self.bounds)[:-1]:
+            rows *= bound + 1
+        return rows
+    
+    def _offset(self, indexes: list) -> int:
+        """下标在缓冲区中的位置"""
+        bounds = self.bounds
+        if len(indexes) != len(bounds):
+            raise IndexError("下标越界")
+        if len(bounds) == 1:
+            index = int(indexes[0])
+            if not 0 <= index <= bounds[0]:
+                raise IndexError("下标越界")
+            return index
+        offset = 0
+        last = len(bounds) - 1
+        for dim, index in enumerate(indexes):
+            index = int(index)
+            if not 0 <= index <= bounds[dim]:
+                raise IndexError("下标越界")
+            offset = offset * (self.stride if dim == last else bounds[dim] + 1) + index
+        return offset
+    
+    def get(self, indexes: list) -> Any:
+        """读取元素，未赋值的元素为None（Empty）"""
+        bounds = self.bounds
+        if len(indexes) == 1 and len(bounds) == 1:
+            offset = int(indexes[0])
+            if not 0 <= offset <= bounds[0]:
+                raise IndexError("下标越界")
+        else:
+            offset = self._offset(indexes)
+        data = self.data
+        if data.__class__ is list:
+            return data[offset]
+        if data is None or not self.mask[offset]:
+            return None
+        return data[offset] if data.__class__ is array.array else data.item(offset)
+    
+    def set(self, indexes: list, value: Any):
+        """给元素赋值"""
+        bounds = self.bounds
+        if len(indexes) == 1 and len(bounds) == 1:
+            offset = int(indexes[0])
+            if not 0 <= offset <= bounds[0]:
+                raise IndexError("下标越界")
+        else:
+            offset = self._offset(indexes)
+        if self.shared is not None:
+            self._own()
+        data = self.data
+        if data.__class__ is list:
+            data[offset] = value
+        elif value.__class__ is self.kind:
+            try:
+                data[offset] = value
+            except OverflowError:
+                self._to_list()[offset] = value
+                return
+            self.mask[offset] = 1
+        else:
+            self._allocate(value)
+            self.set(indexes, value)
+    
+    def _allocate(self, value: Any):
+        """第一次赋值时按值的类型分配缓冲区，类型不符时改为列表"""
+        if self.data is not None:
+            self._to_list()
+            return
+        size = self._rows() * self.stride
+        typecode = _TYPED_ARRAY_CODES.get(value.__class__)
+        if typecode is None:
+            self.data = [None] * size
+        else:
+            self.data = _typed_buffer(typecode, size)
+            self.mask = bytearray(size)
+            self.kind = value.__class__
+    
+    def _to_list(self) -> list:
+        """把类型化缓冲区转换为列表"""
+        data = self.data
+        if data.__class__ is not list:
+            self.data = [value if flag else None
+                         for value, flag in zip(data.tolist(), self.mask)]
+            self.mask = None
+            self.kind = None
+        return self.data
+    
+    def values(self) -> list:
+        """按行优先顺序返回全部元素"""
+        data = self.data
+        if data is None:
+            return [None] * len(self)
+        if self.mask is not None:
+            data = data.tolist()
+            if 0 in self.mask:
+                data = [value if flag else None for value, flag in zip(data, self.mask)]
+        extent = self.bounds[-1] + 1
+        if self.stride == extent:
+            return list(data[:len(self)])
+        stride = self.stride
+        return [value for start in range(0, self._rows() * stride, stride)
+                for value in data[start:start + extent]]
+    
+    def dense(self) -> Any:
+        """
+        全部元素已赋值的整数/浮点数组按顺序返回类型化缓冲区（或其切片），否则返回None
+        
+        Join用它一次转换全部元素，不再逐个检查是否已赋值。
+        """
+        mask = self.mask
+        if mask is None:
+            return None
+        extent = self.bounds[-1] + 1
+        if len(self.bounds) == 1:
+            return None if mask.find(0, 0, extent) >= 0 else self.data[:extent]
+        if self.stride != extent or 0 in mask:
+            return None
+        return self.data
+    
+    def copy(self) -> 'VBSArray':
+        """复制数组（赋值和按值传递时使用），两个数组共用缓冲区直到其中一个被修改"""
+        other = VBSArray.__new__(VBSArray)
+        other.bounds = self.bounds
+        other.stride = self.stride
+        other.data = self.data
+        other.mask = self.mask
+        other.kind = self.kind
+        other.shared = None
+        if self.data is not None:
+            share = self.shared
+            if share is None:
+                share = self.shared = [1]
+            share[0] += 1
+            other.shared = share
+        return other
+    
+    def _release(self):
+        """不再使用共用的缓冲区"""
+        share = self.shared
+        self.shared = None
+        share[0] -= 1
+        return share[0]
+    
+    def _own(self):
+        """写入前复制仍与其他数组共用的缓冲区"""
+        # 共用的其他数组都已释放或已复制时无需复制
+        if self._release():
+            data = self.data
+            # NumPy数组的切片是视图，需用copy()复制
+            self.data = data[:] if data.__class__ is array.array else data.copy()
+            if self.mask is not None:
+                self.mask = bytearray(self.mask)
+    
+    def ubound(self, dimension: int = 1) -> int:
+        dimension = int(dimension)
+        if not 1 <= dimension <= len(self.bounds):
+            raise IndexError("下标越界")
+        return self.bounds[dimension - 1]
+    
+    def redim(self, bounds: Tuple[int, ...], preserve: bool = False):
+        """
+        重新定义数组大小
+        
+        参数:
+            bounds: 新的各维上界
+            preserve: 为True时保留原有元素（只能改变最后一维）
+        """
+        bounds = _array_bounds(bounds)
+        if preserve and (len(bounds) != len(self.bounds) or bounds[:-1] != self.bounds[:-1]):
+            raise IndexError("ReDim Preserve只能改变最后一维的大小")
+        if not preserve or self.data is None:
+            self.bounds = bounds
+            self.stride = bounds[-1] + 1
+            self.data = None
+            self.mask = None
+            self.kind = None
+            if self.shared is not None:
+                self._release()
+            return
+        if self.shared is not None:
+            self._own()
+        extent = bounds[-1] + 1
+        old_extent = self.bounds[-1] + 1
+        stride = self.stride
+        rows = self._rows()
+        data = self.data
+        mask = self.mask
+        if extent < old_extent:
+            # 清空删去的元素，以后再扩大时读到的是Empty
+            for start in range(0, rows * stride, stride):
+                if mask is None:
+                    data[start + extent:start + old_extent] = [None] * (old_extent - extent)
+                else:
+                    mask[start + extent:start + old_extent] = bytes(old_extent - extent)
+        elif extent > stride:
+            new_stride = max(extent, stride + stride // 2 + 1)
+            pad = new_stride - stride
+            self.data = self._pad_rows(data, rows, stride, pad)
+            if mask is not None:
+                self.mask = self._pad_rows(mask, rows, stride, pad)
+            self.stride = new_stride
+        self.bounds = bounds
+    
+    @staticmethod
+    def _pad_rows(buffer: Any, rows: int, stride: int, pad: int) -> Any:
+        """在每行末尾补上pad个空位，只有一行时原地扩展"""
+        if buffer.__class__ is list:
+            filler = [None] * pad
+        elif buffer.__class__ is bytearray:
+            filler = bytearray(pad)
+        elif buffer.__class__ is array.array:
+            filler = array.array(buffer.typecode, bytes(pad * buffer.itemsize))
+        else:
+            result = numpy.zeros((rows, stride + pad), buffer.dtype)
+            result[:, :stride] = buffer.reshape(rows, stride)
+            return result.reshape(-1)
+        if rows == 1:
+            buffer += filler
+            return buffer
+        result = buffer[:0]
+        for start in range(0, rows * stride, stride):
+            result += buffer[start:start + stride]
+            result += filler
+        return result
+
+class VBSSplitArray(VBSArray):
+    """
+    Split()对长字符串返回的数组，按需切分
+    
+    下标访问时只切分到所需的元素为止，For Each每次从头逐个产生元素，UBound只统计分隔符，
+    都不生成全部元素的列表；Join在原字符串上一次替换分隔符。
+    给元素赋值或ReDim时才切分出全部元素，之后与VBSArray相同。
+    
+    属性:
+        text: 被切分的字符串，全部切分后为None
+        delimiter: 分隔符
+        limit: 最多返回的元素个数（-1表示不限），最后一个元素包含剩余的全部内容
+        compare: 比较方式
+    """
+    __slots__ = ('text', 'delimiter', 'limit', 'compare', '_items', '_fields')
+    
+    def __init__(self, text: str, delimiter: str = " ", limit: int = -1, compare: int = 0):
+        # 元素个数在第一次需要时统计，之前bounds为None
+        self.bounds = None
+        self.stride = 0
+        self.data = None
+        self.mask = None
+        self.kind = None
+        self.shared = None
+        self.text = text
+        self.delimiter = delimiter
+        self.limit = limit
+        self.compare = compare
+        self._items = []
+        self._fields = _split_fields(text, delimiter, limit, compare)
+    
+    def __len__(self) -> int:
+        if self.text is None:
+            return super().__len__()
+        return self.ubound() + 1
+    
+    def __iter__(self):
+        if self.text is None:
+            return super().__iter__()
+        if self._fields is None:
+            return iter(self._items)
+        return _split_fields(self.text, self.delimiter, self.limit, self.compare)
+    
+    def __repr__(self) -> str:
+        return f"<VBSSplitArray({self.ubound()})>"
+    
+    def _materialize(self):
+        """切分出全部元素，转为普通数组的存放方式"""
+        if self.text is None:
+            return
+        items = self._items
+        if self._fields is not None:
+            items.extend(self._fields)
+        self.bounds = (len(items) - 1,)
+        self.stride = len(items)
+        self.data = items
+        self.text = None
+        self._items = None
+        self._fields = None
+    
+    def get(self, indexes: list) -> Any:
+        if self.text is None:
+            return super().get(indexes)
+        if len(indexes) != 1:
+            raise IndexError("下标越界")
+        index = int(indexes[0])
+        items = self._items
+        if index >= len(items) and self._fields is not None:
+            for field in self._fields:
+                items.append(field)
+                if len(items) > index:
+                    break
+            else:
+                self._fields = None
+        if not 0 <= index < len(items):
+            raise IndexError("下标越界")
+        return items[index]
+    
+    def set(self, indexes: list, value: Any):
+        self._materialize()
+        super().set(indexes, value)
+    
+    def values(self) -> list:
+        if self.text is None:
+            return super().values()
+        return list(self)
+    
+    def dense(self) -> Any:
+        if self.text is None:
+            return super().dense()
+        return None
+    
+    def copy(self) -> VBSArray:
+        if self.text is None:
+            return super().copy()
+        # 尚未改动时元素由原字符串决定，新数组重新按需切分
+        return VBSSplitArray(self.text, self.delimiter, self.limit, self.compare)
+    
+    def ubound(self, dimension: int = 1) -> int:
+        if self.text is None:
+            return super().ubound(dimension)
+        if int(dimension) != 1:
+            raise IndexError("下标越界")
+        if self._fields is None:
+            return len(self._items) - 1
+        if self.bounds is None:
+            self.bounds = (_split_count(self.text, self.delimiter, self.limit, self.compare) - 1,)
+        return self.bounds[0]
+    
+    def redim(self, bounds: Tuple[int, ...], preserve: bool = False):
+        self._materialize()
+        super().redim(bounds, preserve)
+    
+    def join(self, delimiter: str) -> Optional[str]:
+        """Join()的结果：尚未改动时直接在原字符串上替换分隔符，已改动时返回None"""
+        text = self.text
+        if text is None:
+            return None
+        sep = self.delimiter
+        limit = self.limit
+        if sep == " ":
+            return delimiter.join(self)
+        if not sep or limit == 1:
+            return text
+        if self.compare == vbTextCompare:
+            return _text_pattern(sep, self.compare).sub(delimiter.replace('\\', '\\\\'), text,
+                                                        max(limit - 1, 0))
+        return text.replace(sep, delimiter, limit - 1 if limit > 0 else -1)
+
+# 类型化缓冲区存放的元素类型
+_TYPED_ARRAY_CODES = {int: 'q', float: 'd'}
+
+# NumPy批量数组模式，见set_numpy_arrays()
+_numpy_arrays = False
+
+def set_numpy_arrays(enabled: bool) -> bool:
+    """
+    打开或关闭NumPy批量数组模式
+    
+    打开后新分配的整数/浮点数组缓冲区为numpy.ndarray，Abs、Sqr、Sgn、Int、Fix、Round
+    对整个数组一次计算。未安装NumPy时保持关闭，数组仍使用array.array（这些函数逐个元素计算）。
+    
+    返回:
+        批量模式是否已打开
+    """
+    global _numpy_arrays
+    _numpy_arrays = bool(enabled) and numpy is not None
+    return _numpy_arrays
+
+def _typed_buffer(typecode: str, size: int) -> Any:
+    """分配元素全为0的类型化缓冲区"""
+    if _numpy_arrays:
+        return numpy.zeros(size, numpy.dtype(typecode))
+    return array.array(typecode, bytes(size * 8))
+
+def _map_array(values: 'VBSArray', func: Callable, numpy_func: Optional[Callable] = None) -> 'VBSArray':
+    """
+    对数组的每个元素计算func，返回大小相同的新数组（未赋值的元素仍为Empty）
+    
+    参数:
+        values: 数组
+        func: 计算单个元素的函数
+        numpy_func: 缓冲区为numpy.ndarray时整体计算的函数，返回None时逐个计算
+    """
+    data = values.data
+    if numpy_func is not None and numpy is not None and data.__class__ is numpy.ndarray:
+        buffer = numpy_func(data)
+        if buffer is not None:
+            result = VBSArray.__new__(VBSArray)
+            result.bounds = values.bounds
+            result.stride = values.stride
+            result.data = buffer
+            result.mask = bytearray(values.mask)
+            result.kind = int if buffer.dtype.kind == 'i' else float
+            result.shared = None
+            return result
+    result = VBSArray(values.bounds)
+    if data is None:
+        return result
+    items = [None if value is None else func(value) for value in values.values()]
+    kinds = set(map(type, items))
+    typecode = _TYPED_ARRAY_CODES.get(kinds.pop()) if len(kinds) == 1 else None
+    if typecode is None:
+        result.data = items
+    else:
+        result.data = (numpy.array(items, numpy.dtype(typecode)) if _numpy_arrays
+                       else array.array(typecode, items))
+        result.mask = bytearray(b'\x01') * len(items)
+        result.kind = type(items[0])
+    return result
+
+def _numpy_integral(data: Any, func: Callable) -> Any:
+    """numpy.floor/trunc后转为整数数组，结果超出64位整数范围时返回None"""
+    result = func(data.astype(numpy.float64))
+    if not numpy.isfinite(result).all() or numpy.abs(result).max(initial=0) >= 2.0 ** 63:
+        return None
+    return result.astype(numpy.int64)
+
+def _array_bounds(bounds) -> Tuple[int, ...]:
+    """检查并转换数组各维的上界（-1表示空数组）"""
+    bounds = tuple(int(bound) for bound in bounds)
+    if not bounds or min(bounds) < -1:
+        raise IndexError("下标越界")
+    return bounds
+
+def _copy_array(value: Any) -> Any:
+    """赋值和按值传递时复制数组（VBSArray写时复制，列表立即复制），其他值原样返回"""
+    if isinstance(value, list):
+        return list(value)
+    if value.__class__ is VBSArray or value.__class__ is VBSSplitArray:
+        return value.copy()
+    return value
+
+def _redim(value: Any, bounds: list, preserve: bool) -> VBSArray:
+    """ReDim [Preserve] 的结果：保留元素时在原数组上调整大小"""
+    if preserve:
+        if isinstance(value, list):
+            value = VBSArray.from_list(value)
+        if isinstance(value, VBSArray):
+            value.redim(bounds, True)
+            return value
+    return VBSArray(bounds)
+
 def Array(*args) -> list:
     return list(args)
 
 def UBound(array_var: Any, dimension: int = 1) -> int:
+    if isinstance(array_var, VBSArray):
+        return array_var.ubound(dimension)
     if isinstance(array_var, list):
         if dimension == 1:
             return len(array_var) - 1
@@ -700,12 +1889,17 @@ def UBound(array_var: Any, dimension: int = 1) -> int:
     return -1
 
 def LBound(array_var: Any, dimension: int = 1) -> int:
+    if isinstance(array_var, VBSArray):
+        array_var.ubound(dimension)
+        return 0
     if isinstance(array_var, list):
         return 0
     return 0
 
 def Filter(input_array: Any, value: Any, include: bool = True, 
            compare: int = 0) -> list:
+    if isinstance(input_array, VBSArray):
+        input_array = input_array.values()
     if not isinstance(input_array, list):
         return []
     result = []
@@ -742,7 +1936,7 @@ def IsNull(expression: Any) -> bool:
     return expression is None
 
 def IsArray(expression: Any) -> bool:
-    return isinstance(expression, list)
+    return isinstance(expression, (list, VBSArray))
 
 def IsObject(expression: Any) -> bool:
     return hasattr(expression, '__class__') and not isinstance(expression, type)
@@ -765,7 +1959,7 @@ def TypeName(expression: Any) -> str:
         return "String"
     elif isinstance(expression, (datetime, date)):
         return "Date"
-    elif isinstance(expression, list):
+    elif isinstance(expression, (list, VBSArray)):
         return "Variant()"
     elif hasattr(expression, '__class__'):
         return type(expression).__name__
@@ -790,7 +1984,7 @@ def VarType(expression: Any) -> int:
         return vbString
     elif isinstance(expression, (datetime, date)):
         return vbDate
-    elif isinstance(expression, list):
+    elif isinstance(expression, (list, VBSArray)):
         return vbArray
     elif hasattr(expression, '__class__'):
         return vbObject
@@ -1434,472 +2628,3407 @@ WScript = WScriptClass()
 # 第六部分：VBScript解释器（完整版）
 # ================================================
 
-class SimpleVBSInterpreter:
-    """完整的VBScript解释器"""
+# ------------------------------------------------
+# 6.1 词法分析
+# ------------------------------------------------
+
+class VBSSyntaxError(Exception):
+    """VBScript语法错误"""
     
-    def __init__(self):
-        self.variables = {}
-        self.functions = {}
-        self.constants = {}
-        self.line_number = 0
-        self.error_handler = None
-        self.on_error_resume_next = False
-        self._register_all()
+    def __init__(self, message: str, line: int = 0):
+        self.line = line
+        super().__init__(f"第{line}行语法错误: {message}" if line else message)
+
+# 词法单元类型
+TK_NUMBER = 'NUMBER'
+TK_STRING = 'STRING'
+TK_DATE = 'DATE'
+TK_IDENT = 'IDENT'
+TK_OP = 'OP'
+TK_NEWLINE = 'NEWLINE'
+TK_EOF = 'EOF'
+
+class VBSToken:
+    """
+    词法单元
     
-    def _register_all(self):
-        """注册所有函数和常量"""
-        # 注册内置函数
-        import inspect
-        module = sys.modules[__name__]
-        
-        for name in dir(module):
-            if name[0].isupper() and not name.startswith('_'):
-                func = getattr(module, name)
-                if callable(func):
-                    self.functions[name.upper()] = func
-                    self.functions[name] = func
-        
-        # 注册常量
-        constants_list = [
-            'vbOKOnly', 'vbOKCancel', 'vbAbortRetryIgnore', 'vbYesNoCancel',
-            'vbYesNo', 'vbRetryCancel', 'vbCritical', 'vbQuestion',
-            'vbExclamation', 'vbInformation', 'vbOK', 'vbCancel', 'vbAbort',
-            'vbRetry', 'vbIgnore', 'vbYes', 'vbNo', 'vbBinaryCompare',
-            'vbTextCompare', 'ForReading', 'ForWriting', 'ForAppending',
-            'vbGeneralDate', 'vbLongDate', 'vbShortDate', 'vbLongTime',
-            'vbShortTime', 'vbSunday', 'vbMonday', 'vbTuesday', 'vbWednesday',
-            'vbThursday', 'vbFriday', 'vbSaturday', 'vbEmpty', 'vbNull',
-            'vbInteger', 'vbLong', 'vbSingle', 'vbDouble', 'vbCurrency',
-            'vbDate', 'vbString', 'vbObject', 'vbBoolean', 'vbArray'
-        ]
-        
-        for const_name in constants_list:
-            if hasattr(module, const_name):
-                const_value = getattr(module, const_name)
-                self.constants[const_name.upper()] = const_value
-                self.constants[const_name] = const_value
-        
-        # 添加WScript对象
-        self.variables['WSCRIPT'] = WScript
-        self.variables['WScript'] = WScript
+    属性:
+        type: 单元类型（TK_*）
+        value: 数字/字符串/日期的值，标识符和运算符的原文
+        key: 标识符的大写形式或运算符本身，用于不区分大小写的匹配
+        line: 所在行号
+    """
+    __slots__ = ('type', 'value', 'key', 'line')
     
-    def execute(self, code: str):
-        """执行VBScript代码"""
-        lines = code.split('\n')
-        self.line_number = 0
-        
-        i = 0
-        while i < len(lines):
-            self.line_number = i + 1
-            line = lines[i].strip()
-            
-            # 跳过空行和注释
-            if not line or line.startswith("'"):
-                i += 1
-                continue
-            
-            try:
-                # 处理多行语句
-                if line.lower().startswith('if ') and ' then' in line.lower() and not line.lower().endswith(' end if'):
-                    # 处理多行If语句
-                    if_block = [line]
-                    j = i + 1
-                    while j < len(lines) and not lines[j].strip().lower().startswith('end if'):
-                        if_block.append(lines[j])
-                        j += 1
-                    if j < len(lines) and lines[j].strip().lower().startswith('end if'):
-                        if_block.append(lines[j])
-                    
-                    self._execute_if_block('\n'.join(if_block))
-                    i = j + 1
-                    continue
-                
-                # 执行单行
-                self._execute_line(line)
-                i += 1
-                
-            except Exception as e:
-                if not self.on_error_resume_next:
-                    print(f"第{self.line_number}行错误: {e}")
-                    break
-                else:
-                    i += 1
+    def __init__(self, type: str, value: Any, key: str, line: int):
+        self.type = type
+        self.value = value
+        self.key = key
+        self.line = line
     
-    def _execute_line(self, line: str):
-        """执行单行代码"""
-        # 处理常量替换
-        line = self._replace_constants(line)
-        
-        # 转换为大写进行匹配（VBScript不区分大小写）
-        line_upper = line.upper()
+    def __repr__(self) -> str:
+        return f"VBSToken({self.type}, {self.value!r}, line={self.line})"
+
+
+_TOKEN_RE = re.compile(r'''
+    (?P<ws>[ \t\f]+)
+  | (?P<cont>_[ \t]*(?:\r\n|\r|\n))
+  | (?P<newline>\r\n|\r|\n)
+  | (?P<comment>'[^\r\n]*)
+  | (?P<string>"(?:[^"\r\n]|"")*")
+  | (?P<date>\#[^#\r\n]+\#)
+  | (?P<hex>&[hH][0-9A-Fa-f]+&?)
+  | (?P<oct>&[oO][0-7]+&?)
+  | (?P<number>(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)
+  | (?P<ident>[^\W\d]\w*|\[[^\]\r\n]*\])
+  | (?P<op><>|<=|>=|[-+*/\\^&=<>(),.:])
+''', re.VERBOSE)
+
+def tokenize_vbs(code: str) -> List[VBSToken]:
+    """
+    将VBScript源码一次性切分为词法单元
+    
+    处理字符串、日期/数字字面量、注释（'和Rem）、行连接符（_）
+    以及语句分隔符（换行和冒号，均产生TK_NEWLINE）。
+    
+    参数:
+        code: VBScript源码
+    
+    返回:
+        List[VBSToken]: 以TK_EOF结尾的词法单元列表
+    """
+    tokens = []
+    append = tokens.append
+    match = _TOKEN_RE.match
+    line = 1
+    pos = 0
+    end = len(code)
+    at_statement_start = True
+    
+    while pos < end:
+        m = match(code, pos)
+        if m is None:
+            if code[pos] == '"':
+                raise VBSSyntaxError("字符串缺少结束引号", line)
+            raise VBSSyntaxError(f"无法识别的字符 {code[pos]!r}", line)
+        kind = m.lastgroup
+        text = m.group()
+        pos = m.end()
         
-        # 移除行号（如: 10: x = 5）
-        if ':' in line and line.split(':')[0].strip().isdigit():
-            line = ':'.join(line.split(':')[1:]).strip()
-            line_upper = line.upper()
+        if kind == 'ws' or kind == 'comment':
+            continue
+        if kind == 'cont':
+            line += 1
+            continue
+        if kind == 'newline':
+            if tokens and tokens[-1].type is not TK_NEWLINE:
+                append(VBSToken(TK_NEWLINE, '\n', '\n', line))
+            line += 1
+            at_statement_start = True
+            continue
         
-        # 各种语句处理
-        if line_upper.startswith('DIM '):
-            self._execute_dim(line)
-        elif line_upper.startswith('SET '):
-            self._execute_set(line)
-        elif line_upper.startswith('IF '):
-            self._execute_if(line)
-        elif line_upper.startswith('FOR '):
-            self._execute_for(line)
-        elif line_upper.startswith('WHILE '):
-            self._execute_while(line)
-        elif line_upper.startswith('DO '):
-            self._execute_do(line)
-        elif line_upper.startswith('FUNCTION '):
-            self._execute_function(line)
-        elif line_upper.startswith('SUB '):
-            self._execute_sub(line)
-        elif line_upper.startswith('ON ERROR RESUME NEXT'):
-            self.on_error_resume_next = True
-        elif line_upper.startswith('ON ERROR GOTO 0'):
-            self.on_error_resume_next = False
-        elif '=' in line and not line_upper.startswith('IF ') and ' THEN ' not in line_upper:
-            # 赋值语句，但要排除IF语句中的赋值
-            self._execute_assignment(line)
-        elif line_upper.startswith('WSCRIPT.ECHO '):
-            self._execute_wscript_echo(line)
-        elif line_upper.startswith('MSGBOX'):
-            self._execute_msgbox(line)
-        elif line_upper.startswith('INPUTBOX'):
-            self._execute_inputbox(line)
-        elif line_upper.startswith('CREATEOBJECT'):
-            self._execute_createobject(line)
-        elif '(' in line and line.endswith(')'):
-            self._execute_function_call(line)
-        elif line.strip():
-            # 尝试作为表达式执行
-            result = self._evaluate_expression(line)
-            if result is not None and result != "":
-                print(f"{result}")
-    
-    def _replace_constants(self, line: str) -> str:
-        """替换常量名"""
-        for const_name, const_value in self.constants.items():
-            # 使用正则表达式替换完整单词
-            pattern = r'\b' + re.escape(const_name) + r'\b'
-            line = re.sub(pattern, str(const_value), line, flags=re.IGNORECASE)
-        return line
-    
-    def _execute_dim(self, line: str):
-        """执行Dim语句"""
-        parts = line[4:].strip().split(',')
-        for part in parts:
-            part = part.strip()
-            if '(' in part:
-                name = part.split('(')[0].strip()
-                size_str = part.split('(')[1].split(')')[0].strip()
-                size = self._evaluate_expression(size_str)
-                self.variables[name.upper()] = [None] * (int(size) + 1)
-                self.variables[name] = [None] * (int(size) + 1)
+        if kind == 'ident':
+            key = text.upper()
+            if key == 'REM' and at_statement_start:
+                # Rem注释一直延续到行尾
+                while pos < end and code[pos] not in '\r\n':
+                    pos += 1
+                continue
+            if text[0] == '[':
+                text = text[1:-1]
+                key = text.upper()
+            append(VBSToken(TK_IDENT, text, key, line))
+        elif kind == 'string':
+            append(VBSToken(TK_STRING, text[1:-1].replace('""', '"'), '', line))
+        elif kind == 'number':
+            if '.' in text or 'e' in text or 'E' in text:
+                value = float(text)
             else:
-                self.variables[part.upper()] = None
-                self.variables[part] = None
+                value = int(text)
+            append(VBSToken(TK_NUMBER, value, '', line))
+        elif kind == 'hex':
+            append(VBSToken(TK_NUMBER, int(text[2:].rstrip('&'), 16), '', line))
+        elif kind == 'oct':
+            append(VBSToken(TK_NUMBER, int(text[2:].rstrip('&'), 8), '', line))
+        elif kind == 'date':
+            append(VBSToken(TK_DATE, CDate(text[1:-1]), '', line))
+        elif text == ':':
+            if tokens and tokens[-1].type is not TK_NEWLINE:
+                append(VBSToken(TK_NEWLINE, ':', '\n', line))
+            at_statement_start = True
+            continue
+        elif text == '.' and not (at_statement_start is False and
+                                  (code[m.start() - 1].isalnum() or code[m.start() - 1] in '_)]')):
+            # 不紧跟在名称或右括号之后的点（With块中的 .name），原文记为' .'
+            append(VBSToken(TK_OP, ' .', '.', line))
+        else:
+            append(VBSToken(TK_OP, text, text, line))
+        at_statement_start = False
     
-    def _execute_set(self, line: str):
-        """执行Set语句"""
-        match = re.match(r'set\s+(\w+)\s*=\s*(.+)', line, re.IGNORECASE)
-        if match:
-            var_name = match.group(1)
-            expr = match.group(2)
-            result = self._evaluate_expression(expr)
-            self.variables[var_name.upper()] = result
-            self.variables[var_name] = result
-    
-    def _execute_assignment(self, line: str):
-        """执行赋值语句"""
-        parts = line.split('=', 1)
-        if len(parts) == 2:
-            var_name = parts[0].strip()
-            expr = parts[1].strip()
-            result = self._evaluate_expression(expr)
-            self.variables[var_name.upper()] = result
-            self.variables[var_name] = result
-    
-    def _execute_if(self, line: str):
-        """执行If语句（简化版）"""
-        # 解析: If condition Then statement [Else statement]
-        match = re.match(r'if\s+(.+?)\s+then\s+(.+?)(?:\s+else\s+(.+))?$', line, re.IGNORECASE)
-        if match:
-            condition = match.group(1)
-            true_stmt = match.group(2)
-            false_stmt = match.group(3) if match.group(3) else None
-            
-            # 评估条件
-            cond_result = self._evaluate_expression(condition)
-            
-            if cond_result:
-                self._execute_line(true_stmt)
-            elif false_stmt:
-                self._execute_line(false_stmt)
-    
-    def _execute_if_block(self, block: str):
-        """执行多行If语句块"""
-        lines = block.strip().split('\n')
-        if lines:
-            # 执行第一个If行
-            self._execute_line(lines[0].strip())
-    
-    def _execute_for(self, line: str):
-        """执行For循环（简化版）"""
-        # 解析: For i = start To end [Step step]
-        match = re.match(r'for\s+(\w+)\s*=\s*(.+?)\s+to\s+(.+?)(?:\s+step\s+(.+))?$', line, re.IGNORECASE)
-        if match:
-            var_name = match.group(1)
-            start = int(self._evaluate_expression(match.group(2)))
-            end = int(self._evaluate_expression(match.group(3)))
-            step = int(self._evaluate_expression(match.group(4))) if match.group(4) else 1
-            
-            for i in range(start, end + 1, step):
-                self.variables[var_name.upper()] = i
-                self.variables[var_name] = i
-                # 这里应该执行循环体，但简化版本只设置变量
-    
-    def _execute_while(self, line: str):
-        """执行While循环（简化版）"""
-        # 解析: While condition
-        match = re.match(r'while\s+(.+)', line, re.IGNORECASE)
-        if match:
-            condition = match.group(1)
-            # 简化：只评估一次条件
-            self._evaluate_expression(condition)
-    
-    def _execute_do(self, line: str):
-        """执行Do循环（简化版）"""
-        # 解析: Do [While|Until] condition
-        pass  # 简化实现
-    
-    def _execute_function(self, line: str):
-        """执行Function定义（简化版）"""
-        # 解析: Function name(args)
-        pass  # 简化实现
-    
-    def _execute_sub(self, line: str):
-        """执行Sub定义（简化版）"""
-        # 解析: Sub name(args)
-        pass  # 简化实现
-    
-    def _execute_wscript_echo(self, line: str):
-        """执行WScript.Echo"""
-        text = line[13:].strip()
-        result = self._evaluate_expression(text)
-        print(result)
-    
-    def _execute_msgbox(self, line: str):
-        """执行MsgBox"""
-        match = re.match(r'msgbox\s*\((.*)\)', line, re.IGNORECASE)
-        if match:
-            args_str = match.group(1)
-            args = []
-            if args_str.strip():
-                for arg in self._split_args_improved(args_str):
-                    args.append(self._evaluate_expression(arg))
-            return MsgBox(*args)
+    if tokens and tokens[-1].type is not TK_NEWLINE:
+        append(VBSToken(TK_NEWLINE, '\n', '\n', line))
+    append(VBSToken(TK_EOF, '', '', line))
+    return tokens
+
+def split_vbs_statements(tokens: List[VBSToken]) -> List[List[VBSToken]]:
+    """按语句分隔符把词法单元流切分为语句列表（忽略行号标签）"""
+    statements = []
+    current = []
+    for tok in tokens:
+        if tok.type is TK_NEWLINE or tok.type is TK_EOF:
+            # 跳过空语句和形如 "10:" 的行号标签
+            if current and not (len(current) == 1 and current[0].type is TK_NUMBER):
+                statements.append(current)
+            current = []
         else:
-            match = re.match(r'msgbox\s+(.+?)(?:\s*,\s*(.+?))?(?:\s*,\s*(.+?))?$', line, re.IGNORECASE)
-            if match:
-                prompt = match.group(1).strip()
-                buttons = match.group(2).strip() if match.group(2) else "0"
-                title = match.group(3).strip() if match.group(3) else ""
-                prompt_val = self._evaluate_expression(prompt)
-                buttons_val = int(self._evaluate_expression(buttons))
-                title_val = self._evaluate_expression(title)
-                return MsgBox(prompt_val, buttons_val, title_val)
-    
-    def _execute_inputbox(self, line: str):
-        """执行InputBox"""
-        match = re.match(r'inputbox\s*\((.*)\)', line, re.IGNORECASE)
-        if match:
-            args_str = match.group(1)
-            args = []
-            if args_str.strip():
-                for arg in self._split_args_improved(args_str):
-                    args.append(self._evaluate_expression(arg))
-            return InputBox(*args)
+            current.append(tok)
+    return statements
+
+def _tokens_text(tokens: List[VBSToken]) -> str:
+    """把词法单元还原为源码文本（用于提示信息）"""
+    parts = []
+    for tok in tokens:
+        if tok.type is TK_STRING:
+            parts.append('"' + tok.value.replace('"', '""') + '"')
+        elif tok.type is TK_DATE:
+            parts.append(f"#{tok.value}#")
         else:
-            match = re.match(r'inputbox\s+(.+?)(?:\s*,\s*(.+?))?(?:\s*,\s*(.+?))?$', line, re.IGNORECASE)
-            if match:
-                prompt = match.group(1).strip()
-                title = match.group(2).strip() if match.group(2) else ""
-                default = match.group(3).strip() if match.group(3) else ""
-                prompt_val = self._evaluate_expression(prompt)
-                title_val = self._evaluate_expression(title)
-                default_val = self._evaluate_expression(default)
-                return InputBox(prompt_val, title_val, default_val)
-    
-    def _execute_createobject(self, line: str):
-        """执行CreateObject"""
-        match = re.match(r'createobject\s*\((.*)\)', line, re.IGNORECASE)
-        if match:
-            args_str = match.group(1)
-            args = []
-            if args_str.strip():
-                for arg in self._split_args_improved(args_str):
-                    args.append(self._evaluate_expression(arg))
-            return CreateObject(*args)
-    
-    def _execute_function_call(self, line: str):
-        """执行函数调用"""
-        match = re.match(r'(\w+)\(([^)]*)\)', line, re.IGNORECASE)
-        if match:
-            func_name = match.group(1).upper()
-            args_str = match.group(2)
-            args = []
-            if args_str.strip():
-                for arg in self._split_args_improved(args_str):
-                    args.append(self._evaluate_expression(arg))
-            if func_name in self.functions:
-                func = self.functions[func_name]
-                try:
-                    return func(*args)
-                except Exception as e:
-                    print(f"函数调用错误 '{func_name}': {e}")
+            parts.append(str(tok.value))
+    return ' '.join(parts)
+
+def _find_close_paren(tokens: List[VBSToken], start: int) -> int:
+    """返回与tokens[start]处左括号匹配的右括号位置，找不到时返回-1"""
+    depth = 0
+    for i in range(start, len(tokens)):
+        key = tokens[i].key
+        if key == '(':
+            depth += 1
+        elif key == ')':
+            depth -= 1
+            if depth == 0:
+                return i
+    return -1
+
+def _split_tokens(tokens: List[VBSToken], separator: str) -> List[List[VBSToken]]:
+    """在括号深度为0处按分隔符切分词法单元"""
+    parts = []
+    current = []
+    depth = 0
+    for tok in tokens:
+        key = tok.key
+        if key == '(':
+            depth += 1
+        elif key == ')':
+            depth -= 1
+        elif key == separator and depth == 0:
+            parts.append(current)
+            current = []
+            continue
+        current.append(tok)
+    parts.append(current)
+    return parts
+
+def _find_keyword(tokens: List[VBSToken], key: str, start: int = 0) -> int:
+    """查找括号深度为0处的关键字，找不到时返回-1"""
+    depth = 0
+    for i in range(start, len(tokens)):
+        tok = tokens[i]
+        if tok.key == '(':
+            depth += 1
+        elif tok.key == ')':
+            depth -= 1
+        elif depth == 0 and tok.key == key:
+            return i
+    return -1
+
+# ------------------------------------------------
+# 6.2 语法分析
+# ------------------------------------------------
+
+# 运算符
+# VBScript的运算语义：Empty("")按0参与运算，True为-1，
+# And/Or/Not等对布尔值做逻辑运算、对数值做按位运算
+
+def _to_number(value: Any) -> Union[int, float]:
+    """把操作数转换为数值"""
+    t = type(value)
+    if t is int or t is float:
+        return value
+    if t is bool:
+        return -1 if value else 0
+    if value is None or value == "":
+        return 0
+    if t is str:
+        text = value.strip()
+        try:
+            return int(text)
+        except ValueError:
+            pass
+        try:
+            return float(text)
+        except ValueError:
+            raise TypeError(f"类型不匹配: '{value}'") from None
+    if isinstance(value, date):
+        # 日期的数值是自1899-12-30起的天数
+        return _days_between(value, datetime(1899, 12, 30))
+    raise TypeError(f"类型不匹配: '{value}'")
+
+def _days_between(a: date, b: date) -> Union[int, float]:
+    """两个日期相差的天数（含小数部分的时间）"""
+    if type(a) is date:
+        a = datetime(a.year, a.month, a.day)
+    if type(b) is date:
+        b = datetime(b.year, b.month, b.day)
+    delta = a - b
+    return delta.days + delta.seconds / 86400 if delta.seconds else delta.days
+
+def _to_integer(value: Any) -> int:
+    """把操作数转换为整数（按银行家舍入）"""
+    if type(value) is int:
+        return value
+    return int(round(_to_number(value)))
+
+def _op_add(a: Any, b: Any) -> Any:
+    """a + b：两个字符串相加时为连接"""
+    if type(a) is int and type(b) is int:
+        return a + b
+    if isinstance(a, str) and isinstance(b, str):
+        return a + b
+    if isinstance(a, date) and not isinstance(b, date):
+        return a + timedelta(days=_to_number(b))
+    if isinstance(b, date):
+        return b + timedelta(days=_to_number(a))
+    return _to_number(a) + _to_number(b)
+
+def _op_sub(a: Any, b: Any) -> Any:
+    """a - b：日期相减得到天数"""
+    if type(a) is int and type(b) is int:
+        return a - b
+    if isinstance(a, date):
+        if isinstance(b, date):
+            return _days_between(a, b)
+        return a - timedelta(days=_to_number(b))
+    return _to_number(a) - _to_number(b)
+
+def _op_mul(a: Any, b: Any) -> Any:
+    """a * b"""
+    if type(a) is int and type(b) is int:
+        return a * b
+    return _to_number(a) * _to_number(b)
+
+def _op_div(a: Any, b: Any) -> float:
+    """a / b：浮点除法"""
+    return _to_number(a) / _to_number(b)
+
+def _op_intdiv(a: Any, b: Any) -> int:
+    """a \\ b：操作数先舍入为整数，结果向零截断"""
+    a = _to_integer(a)
+    b = _to_integer(b)
+    q = abs(a) // abs(b)
+    return q if (a < 0) == (b < 0) else -q
+
+def _op_mod(a: Any, b: Any) -> int:
+    """a Mod b：操作数先舍入为整数，结果与被除数同号"""
+    a = _to_integer(a)
+    b = _to_integer(b)
+    r = abs(a) % abs(b)
+    return -r if a < 0 else r
+
+def _op_pow(a: Any, b: Any) -> Any:
+    """a ^ b"""
+    return _to_number(a) ** _to_number(b)
+
+def _comparable(a: Any, b: Any) -> Tuple[Any, Any]:
+    """把类型不同的两个操作数转换为可比较的形式"""
+    if isinstance(a, str) and isinstance(b, str):
+        return a, b
+    if isinstance(a, date) and isinstance(b, date):
+        return _days_between(a, b), 0
+    if isinstance(a, str) or isinstance(b, str):
+        # 数字字符串按数值比较，否则按文本比较
+        try:
+            return _to_number(a), _to_number(b)
+        except TypeError:
+            return CStr(a), CStr(b)
+    return _to_number(a), _to_number(b)
+
+def _op_eq(a: Any, b: Any) -> bool:
+    """a = b"""
+    if type(a) is type(b):
+        return a == b
+    a, b = _comparable(a, b)
+    return a == b
+
+def _op_ne(a: Any, b: Any) -> bool:
+    """a <> b"""
+    if type(a) is type(b):
+        return a != b
+    a, b = _comparable(a, b)
+    return a != b
+
+def _op_lt(a: Any, b: Any) -> bool:
+    """a < b"""
+    if type(a) is type(b) and type(a) is not bool:
+        return a < b
+    a, b = _comparable(a, b)
+    return a < b
+
+def _op_gt(a: Any, b: Any) -> bool:
+    """a > b"""
+    if type(a) is type(b) and type(a) is not bool:
+        return a > b
+    a, b = _comparable(a, b)
+    return a > b
+
+def _op_le(a: Any, b: Any) -> bool:
+    """a <= b"""
+    if type(a) is type(b) and type(a) is not bool:
+        return a <= b
+    a, b = _comparable(a, b)
+    return a <= b
+
+def _op_ge(a: Any, b: Any) -> bool:
+    """a >= b"""
+    if type(a) is type(b) and type(a) is not bool:
+        return a >= b
+    a, b = _comparable(a, b)
+    return a >= b
+
+def _op_is(a: Any, b: Any) -> bool:
+    """a Is b：对象引用比较（未赋值的变量视为Nothing）"""
+    if a is None or b is None:
+        return (a is None or a == "") and (b is None or b == "")
+    return a is b
+
+def _op_and(a: Any, b: Any) -> Any:
+    """a And b"""
+    if type(a) is bool and type(b) is bool:
+        return a and b
+    return _to_integer(a) & _to_integer(b)
+
+def _op_or(a: Any, b: Any) -> Any:
+    """a Or b"""
+    if type(a) is bool and type(b) is bool:
+        return a or b
+    return _to_integer(a) | _to_integer(b)
+
+def _op_xor(a: Any, b: Any) -> Any:
+    """a Xor b"""
+    if type(a) is bool and type(b) is bool:
+        return a != b
+    return _to_integer(a) ^ _to_integer(b)
+
+def _op_eqv(a: Any, b: Any) -> Any:
+    """a Eqv b"""
+    if type(a) is bool and type(b) is bool:
+        return a == b
+    return ~(_to_integer(a) ^ _to_integer(b))
+
+def _op_imp(a: Any, b: Any) -> Any:
+    """a Imp b"""
+    if type(a) is bool and type(b) is bool:
+        return (not a) or b
+    return ~_to_integer(a) | _to_integer(b)
+
+def _op_neg(a: Any) -> Any:
+    """-a"""
+    if type(a) is int or type(a) is float:
+        return -a
+    return -_to_number(a)
+
+def _op_not(a: Any) -> Any:
+    """Not a"""
+    if type(a) is bool:
+        return not a
+    return ~_to_integer(a)
+
+# 二元运算符: 名称 -> (优先级, 实现)，优先级越高结合越紧
+# （Not的优先级介于比较和And之间，一元负号介于^和*之间）
+_BINARY_OPERATORS = {
+    'IMP': (1, _op_imp),
+    'EQV': (2, _op_eqv),
+    'XOR': (3, _op_xor),
+    'OR': (4, _op_or),
+    'AND': (5, _op_and),
+    '=': (7, _op_eq), '<>': (7, _op_ne), '<': (7, _op_lt), '>': (7, _op_gt),
+    '<=': (7, _op_le), '>=': (7, _op_ge), 'IS': (7, _op_is),
+    '&': (8, None),
+    '+': (9, _op_add), '-': (9, _op_sub),
+    'MOD': (10, _op_mod),
+    '\\': (11, _op_intdiv),
+    '*': (12, _op_mul), '/': (12, _op_div),
+    '^': (14, _op_pow),
+}
+_NOT_PRECEDENCE = 6
+_NEG_PRECEDENCE = 13
+_UNARY_OPERATORS = {'-': _op_neg, 'NOT': _op_not}
+
+# Select Case
+_CASE_IS_OPERATORS = ('=', '<>', '<', '>', '<=', '>=')
+
+def _case_match(value: Any, label: tuple) -> bool:
+    """按顺序比较时的单个Case标签：(值,) 或 (下界, 上界)"""
+    if len(label) == 1:
+        return _op_eq(value, label[0])
+    return _op_ge(value, label[0]) and _op_le(value, label[1])
+
+def _earliest(a: Optional[int], b: Optional[int]) -> Optional[int]:
+    """两个候选分支中靠前的一个"""
+    if a is None:
+        return b
+    if b is None or a < b:
+        return a
+    return b
+
+def _build_ranges(ranges: list) -> Tuple[list, list, list]:
+    """
+    把 [(下界, 上界, 分支)] 整理为可二分查找的区间表
+    
+    返回:
+        (排序后的端点, 各端点处最靠前的分支, 相邻端点之间最靠前的分支)
+    """
+    keys = sorted({bound for low, high, _ in ranges for bound in (low, high)})
+    points = []
+    gaps = []
+    for i, key in enumerate(keys):
+        points.append(min((arm for low, high, arm in ranges if low <= key <= high), default=None))
+        if i + 1 < len(keys):
+            following = keys[i + 1]
+            gaps.append(min((arm for low, high, arm in ranges if low <= key and following <= high),
+                            default=None))
+    return keys, points, gaps
+
+def _find_range(index: Tuple[list, list, list], value: Any) -> Optional[int]:
+    """在_build_ranges()的结果中查找包含value的最靠前分支"""
+    keys, points, gaps = index
+    if not keys:
+        return None
+    i = bisect_left(keys, value)
+    if i < len(keys) and keys[i] == value:
+        return points[i]
+    if 0 < i < len(keys):
+        return gaps[i - 1]
+    return None
+
+class _CaseTable:
+    """
+    Select Case中连续若干个常量分支的查找表
+    
+    等值标签放入字典，范围标签（a To b）按端点排序后二分查找，
+    查找结果与按顺序用 = 或 >=、<= 逐个比较标签的结果一致。
+    无法建立索引的标签（日期、Null、混合类型的范围）仍按顺序比较。
+    
+    属性:
+        targets: 各分支在字节码中的入口地址（由编译器填写）
+    """
+    __slots__ = ('labels', 'count', 'numbers', 'numeric_texts', 'texts', 'number_texts',
+                 'number_ranges', 'text_ranges', 'slow_number', 'slow_text', 'slow_common',
+                 'targets')
+    
+    def __init__(self, cases: List[List[tuple]]):
+        """cases[i]为第i个分支的标签列表"""
+        self.labels = [(arm, label) for arm, labels in enumerate(cases) for label in labels]
+        self.count = len(cases)
+        self.numbers = {}           # 数值标签（按数值）
+        self.numeric_texts = {}     # 数字字符串标签（按数值，与数值比较时使用）
+        self.texts = {}             # 字符串标签（按文本）
+        self.number_texts = {}      # 数值标签的文本形式（与非数字字符串比较时使用）
+        number_ranges = []
+        text_ranges = []
+        slow_number = []
+        slow_text = []
+        slow_common = []
+        for arm, label in self.labels:
+            if len(label) == 1:
+                value = label[0]
+                if type(value) in (int, float, bool):
+                    self.numbers.setdefault(_to_number(value), arm)
+                    self.number_texts.setdefault(CStr(value), arm)
+                elif type(value) is str:
+                    self.texts.setdefault(value, arm)
+                    try:
+                        self.numeric_texts.setdefault(_to_number(value), arm)
+                    except TypeError:
+                        pass
+                else:
+                    slow_common.append((arm, label))
+                continue
+            low, high = label
+            if all(type(bound) in (int, float, bool) for bound in label):
+                number_ranges.append((_to_number(low), _to_number(high), arm))
+                slow_text.append((arm, label))
+            elif type(low) is str and type(high) is str:
+                text_ranges.append((low, high, arm))
+                slow_number.append((arm, label))
+            else:
+                slow_common.append((arm, label))
+        self.number_ranges = _build_ranges(number_ranges)
+        self.text_ranges = _build_ranges(text_ranges)
+        # 各类选择值需要按顺序比较的标签
+        self.slow_number = sorted(slow_number + slow_common, key=lambda item: item[0])
+        self.slow_text = sorted(slow_text + slow_common, key=lambda item: item[0])
+        self.slow_common = slow_common
+        self.targets = []
+    
+    def __len__(self) -> int:
+        return self.count
+    
+    def __repr__(self) -> str:
+        return f"<case table -> {self.targets}>"
+    
+    def lookup(self, value: Any) -> Optional[int]:
+        """返回第一个匹配的分支序号，没有匹配时返回None"""
+        t = type(value)
+        if t is str:
+            best = self.texts.get(value)
+            try:
+                number = _to_number(value)
+            except TypeError:
+                best = _earliest(best, self.number_texts.get(value))
+                slow = self.slow_text
             else:
-                print(f"警告: 未定义的函数 '{func_name}'")
+                best = _earliest(best, self.numbers.get(number))
+                best = _earliest(best, _find_range(self.number_ranges, number))
+                slow = self.slow_common
+            best = _earliest(best, _find_range(self.text_ranges, value))
+        elif t is int or t is float or t is bool:
+            number = _to_number(value)
+            best = _earliest(self.numbers.get(number), self.numeric_texts.get(number))
+            best = _earliest(best, self.texts.get(CStr(value)))
+            best = _earliest(best, _find_range(self.number_ranges, number))
+            slow = self.slow_number
+        else:
+            best = None
+            slow = self.labels
+        for arm, label in slow:
+            if best is not None and arm >= best:
+                break
+            if _case_match(value, label):
+                return arm
+        return best
+
+class VBSNode:
+    """语法树节点基类"""
+    __slots__ = ('line',)
+
+# 表达式节点
+
+class LiteralExpr(VBSNode):
+    """字面量"""
+    __slots__ = ('value',)
     
-    def _evaluate_expression(self, expr: str) -> Any:
-        """计算表达式值"""
-        expr = expr.strip()
+    def __init__(self, value: Any, line: int = 0):
+        self.value = value
+        self.line = line
+
+class NameExpr(VBSNode):
+    """名称（变量、常量或无参函数）；parenthesized为True时写在括号中，作为实参按值传递"""
+    __slots__ = ('key', 'name', 'parenthesized')
+    
+    def __init__(self, name: str, line: int = 0):
+        self.key = name.upper()
+        self.name = name
+        self.line = line
+        self.parenthesized = False
+
+class CallExpr(VBSNode):
+    """name(args)：函数调用或数组下标；parenthesized为True时写在括号中，作为实参按值传递"""
+    __slots__ = ('key', 'name', 'args', 'parenthesized')
+    
+    def __init__(self, name: str, args: list, line: int = 0):
+        self.key = name.upper()
+        self.name = name
+        self.args = args
+        self.line = line
+        self.parenthesized = False
+
+class MemberExpr(VBSNode):
+    """obj.name 或 obj.name(args)"""
+    __slots__ = ('obj', 'name', 'args')
+    
+    def __init__(self, obj: VBSNode, name: str, args: Optional[list], line: int = 0):
+        self.obj = obj
+        self.name = name
+        self.args = args
+        self.line = line
+
+class ConcatExpr(VBSNode):
+    """a & b & c"""
+    __slots__ = ('parts',)
+    
+    def __init__(self, parts: list, line: int = 0):
+        self.parts = parts
+        self.line = line
+
+class UnaryExpr(VBSNode):
+    """一元运算: -a, Not a"""
+    __slots__ = ('op', 'operand')
+    
+    def __init__(self, op: str, operand: VBSNode, line: int = 0):
+        self.op = op
+        self.operand = operand
+        self.line = line
+
+class BinaryExpr(VBSNode):
+    """二元运算（&除外）: a + b, a And b, a = b ..."""
+    __slots__ = ('op', 'left', 'right')
+    
+    def __init__(self, op: str, left: VBSNode, right: VBSNode, line: int = 0):
+        self.op = op
+        self.left = left
+        self.right = right
+        self.line = line
+
+# 语句节点
+
+class DimStmt(VBSNode):
+    """Dim a, b(10)"""
+    __slots__ = ('names',)
+    
+    def __init__(self, names: list, line: int = 0):
+        self.names = names  # [(name, 上界表达式或None)]
+        self.line = line
+
+class ReDimStmt(VBSNode):
+    """ReDim [Preserve] a(10), b(n, m)"""
+    __slots__ = ('names', 'preserve')
+    
+    def __init__(self, names: list, preserve: bool, line: int = 0):
+        self.names = names  # [(name, 上界表达式列表)]
+        self.preserve = preserve
+        self.line = line
+
+class AssignStmt(VBSNode):
+    """[Set] target = expr"""
+    __slots__ = ('target', 'expr', 'is_set')
+    
+    def __init__(self, target: VBSNode, expr: VBSNode, is_set: bool, line: int = 0):
+        self.target = target
+        self.expr = expr
+        self.is_set = is_set
+        self.line = line
+
+class CallStmt(VBSNode):
+    """过程调用语句"""
+    __slots__ = ('expr',)
+    
+    def __init__(self, expr: VBSNode, line: int = 0):
+        self.expr = expr
+        self.line = line
+
+class ExprStmt(VBSNode):
+    """无法识别为调用的表达式语句（输出其值）"""
+    __slots__ = ('expr',)
+    
+    def __init__(self, expr: VBSNode, line: int = 0):
+        self.expr = expr
+        self.line = line
+
+class IfStmt(VBSNode):
+    """If/ElseIf/Else"""
+    __slots__ = ('branches', 'else_body')
+    
+    def __init__(self, branches: list, else_body: Optional[list], line: int = 0):
+        self.branches = branches  # [(条件, 语句列表)]
+        self.else_body = else_body
+        self.line = line
+
+class ForStmt(VBSNode):
+    """For var = start To end [Step step]"""
+    __slots__ = ('var', 'start', 'end', 'step', 'body')
+    
+    def __init__(self, var: str, start: VBSNode, end: VBSNode, step: Optional[VBSNode],
+                 body: list, line: int = 0):
+        self.var = var
+        self.start = start
+        self.end = end
+        self.step = step
+        self.body = body
+        self.line = line
+
+class ForEachStmt(VBSNode):
+    """For Each var In group"""
+    __slots__ = ('var', 'group', 'body')
+    
+    def __init__(self, var: str, group: VBSNode, body: list, line: int = 0):
+        self.var = var
+        self.group = group
+        self.body = body
+        self.line = line
+
+class WhileStmt(VBSNode):
+    """While cond ... Wend"""
+    __slots__ = ('cond', 'body')
+    
+    def __init__(self, cond: VBSNode, body: list, line: int = 0):
+        self.cond = cond
+        self.body = body
+        self.line = line
+
+class DoStmt(VBSNode):
+    """Do [While|Until cond] ... Loop [While|Until cond]"""
+    __slots__ = ('cond', 'until', 'test_first', 'body')
+    
+    def __init__(self, cond: Optional[VBSNode], until: bool, test_first: bool,
+                 body: list, line: int = 0):
+        self.cond = cond
+        self.until = until
+        self.test_first = test_first
+        self.body = body
+        self.line = line
+
+class ExitStmt(VBSNode):
+    """Exit For / Exit Do / Exit Sub / Exit Function"""
+    __slots__ = ('kind',)
+    
+    def __init__(self, kind: str, line: int = 0):
+        self.kind = kind
+        self.line = line
+
+class OnErrorStmt(VBSNode):
+    """On Error Resume Next / On Error GoTo 0"""
+    __slots__ = ('resume_next',)
+    
+    def __init__(self, resume_next: bool, line: int = 0):
+        self.resume_next = resume_next
+        self.line = line
+
+class WithStmt(VBSNode):
+    """With obj ... End With，obj保存在隐藏变量var中"""
+    __slots__ = ('var', 'obj', 'body')
+    
+    def __init__(self, var: str, obj: VBSNode, body: list, line: int = 0):
+        self.var = var
+        self.obj = obj
+        self.body = body
+        self.line = line
+    
+    def bind(self) -> 'AssignStmt':
+        """进入块时保存With对象的赋值语句"""
+        return AssignStmt(NameExpr(self.var, self.line), self.obj, True, self.line)
+    
+    def release(self) -> 'AssignStmt':
+        """离开块时释放With对象的赋值语句"""
+        return AssignStmt(NameExpr(self.var, self.line), LiteralExpr(None, self.line), True, self.line)
+
+class SelectStmt(VBSNode):
+    """
+    Select Case expr ... End Select
+    
+    属性:
+        var: 保存选择值的隐藏变量名
+        cases: [(常量标签列表或None, 条件表达式, 语句列表)]，
+            标签全为常量的分支给出标签列表（(值,) 或 (下界, 上界)），
+            否则给出以var为操作数的条件表达式
+        else_body: Case Else的语句列表
+    """
+    __slots__ = ('var', 'expr', 'cases', 'else_body')
+    
+    def __init__(self, var: str, expr: VBSNode, cases: list, else_body: Optional[list],
+                 line: int = 0):
+        self.var = var
+        self.expr = expr
+        self.cases = cases
+        self.else_body = else_body
+        self.line = line
+
+class ProcedureStmt(VBSNode):
+    """Sub/Function定义，params为[(参数名, 是否ByRef)]"""
+    __slots__ = ('kind', 'name', 'params', 'body')
+    
+    def __init__(self, kind: str, name: str, params: list, body: list, line: int = 0):
+        self.kind = kind
+        self.name = name
+        self.params = params
+        self.body = body
+        self.line = line
+
+class VBSProgram:
+    """
+    编译后的VBScript程序
+    
+    属性:
+        body: 顶层语句列表（语法树）
+        code: 编译得到的字节码
+        source_hash: 源码的SHA-1摘要（缓存键）
+        py_code: 转译得到的Python代码（首次以转译模式运行时生成）
+        optimizations: 语法树优化记录[(行号, 说明)]，未优化时为None
+        builtins: 优化时按内置定义折叠或外提的纯函数名（大写），
+            这些函数被解释器覆盖时程序不能在该解释器上执行
+    """
+    __slots__ = ('body', 'code', 'source_hash', 'py_code', 'optimizations', 'builtins')
+    
+    def __init__(self, body: list, code: 'VBSCode', source_hash: str = "",
+                 optimizations: Optional[list] = None, builtins: frozenset = frozenset()):
+        self.body = body
+        self.code = code
+        self.source_hash = source_hash
+        self.py_code = None
+        self.optimizations = optimizations
+        self.builtins = builtins
+    
+    def __getstate__(self):
+        # 转译结果包含代码对象，不写入磁盘缓存
+        return self.body, self.code, self.source_hash, self.optimizations, self.builtins
+    
+    def __setstate__(self, state):
+        self.body, self.code, self.source_hash, self.optimizations, self.builtins = state
+        self.py_code = None
+
+# 作为字面量的关键字
+_LITERAL_KEYWORDS = {'TRUE': True, 'FALSE': False, 'EMPTY': "", 'NULL': None, 'NOTHING': None}
+
+def _literal_text(value: Any) -> str:
+    """字面量在字符串连接中的文本"""
+    return "" if value is None else str(value)
+
+def _fold_literals(node: VBSNode, func: Callable, *operands: VBSNode) -> VBSNode:
+    """操作数都是字面量时在编译时求值"""
+    for operand in operands:
+        if not isinstance(operand, LiteralExpr):
+            return node
+    try:
+        return LiteralExpr(func(*[operand.value for operand in operands]), node.line)
+    except Exception:
+        # 例如除以零，保留到运行时报错
+        return node
+
+def _fold_concat(parts: list, line: int) -> VBSNode:
+    """合并相邻的字面量，全部为字面量时直接得到结果"""
+    folded = []
+    for part in parts:
+        if isinstance(part, LiteralExpr) and folded and isinstance(folded[-1], LiteralExpr):
+            prev = folded[-1]
+            folded[-1] = LiteralExpr(_literal_text(prev.value) + _literal_text(part.value),
+                                     prev.line)
+        else:
+            folded.append(part)
+    if len(folded) == 1 and isinstance(folded[0], LiteralExpr):
+        return LiteralExpr(_literal_text(folded[0].value), line)
+    return ConcatExpr(folded, line)
+
+def _constant_value(node: VBSNode) -> Any:
+    """
+    只由字面量和运算符组成的表达式的值，不是这样的表达式或求值出错时返回_NO_VALUE
+    
+    Const语句和Case标签（散列分派表）按语义需要常量值，不依赖语法树优化，也不改变语法树。
+    """
+    if isinstance(node, LiteralExpr):
+        return node.value
+    if isinstance(node, UnaryExpr):
+        operands = [node.operand]
+        func = _UNARY_OPERATORS[node.op]
+    elif isinstance(node, BinaryExpr):
+        operands = [node.left, node.right]
+        func = _BINARY_OPERATORS[node.op][1]
+    elif isinstance(node, ConcatExpr):
+        operands = node.parts
+        func = lambda *values: ''.join(map(_literal_text, values))
+    else:
+        return _NO_VALUE
+    values = [_constant_value(operand) for operand in operands]
+    if _NO_VALUE in values:
+        return _NO_VALUE
+    try:
+        return func(*values)
+    except Exception:
+        return _NO_VALUE
+
+def _is_target(tokens: List[VBSToken]) -> bool:
+    """tokens是否为赋值目标形式: name、name(args)、a.b.c(args)"""
+    if not tokens or tokens[0].type is not TK_IDENT:
+        return False
+    i = 1
+    n = len(tokens)
+    while i < n:
+        if tokens[i].key == '.' and i + 1 < n and tokens[i + 1].type is TK_IDENT:
+            i += 2
+        elif tokens[i].key == '(':
+            close = _find_close_paren(tokens, i)
+            if close < 0:
+                return False
+            i = close + 1
+        else:
+            return False
+    return True
+
+def _statement_head(tokens: List[VBSToken]) -> str:
+    """语句的引导关键字，End/Exit等两词关键字合并为一个"""
+    key = tokens[0].key
+    if key in ('END', 'EXIT') and len(tokens) > 1:
+        return key + ' ' + tokens[1].key
+    if key == 'ELSE' and len(tokens) > 1 and tokens[1].key == 'IF':
+        return 'ELSEIF'
+    return key
+
+# 块语句: 类型 -> (结束语句, 中间分支语句)
+_BLOCK_SYNTAX = {
+    'IF': ('END IF', ('ELSEIF', 'ELSE')),
+    'SELECT': ('END SELECT', ('CASE',)),
+    'FOR': ('NEXT', ()),
+    'DO': ('LOOP', ()),
+    'WHILE': ('WEND', ()),
+    'WITH': ('END WITH', ()),
+    'SUB': ('END SUB', ()),
+    'FUNCTION': ('END FUNCTION', ()),
+    'PROPERTY': ('END PROPERTY', ()),
+    'CLASS': ('END CLASS', ()),
+}
+# 结束语句和中间分支语句 -> 所属的块类型
+_BLOCK_PARTS = {}
+for _kind, (_end, _middles) in _BLOCK_SYNTAX.items():
+    _BLOCK_PARTS[_end] = _kind
+    for _middle in _middles:
+        _BLOCK_PARTS[_middle] = _kind
+
+def _block_head(tokens: List[VBSToken]) -> Optional[str]:
+    """块结构语句的引导关键字，普通语句（包括单行If）返回None"""
+    head = _statement_head(tokens)
+    if head in ('PUBLIC', 'PRIVATE') and len(tokens) > 1:
+        head = tokens[1].key
+    if head == 'IF' and tokens[-1].key != 'THEN':
+        return None
+    if head in _BLOCK_SYNTAX or head in _BLOCK_PARTS:
+        return head
+    return None
+
+def _block_title(head: str) -> str:
+    """块语句关键字的显示形式，用于错误信息"""
+    return 'ElseIf' if head == 'ELSEIF' else head.title()
+
+def match_vbs_blocks(statements: List[List[VBSToken]]) -> List[int]:
+    """
+    一次扫描匹配所有块语句的开始、中间分支和结束语句
+    
+    参数:
+        statements: split_vbs_statements()得到的语句列表
+    
+    返回:
+        与statements等长的跳转表：块开始语句和中间分支语句（ElseIf/Else/Case）
+        处为同一块中下一个分支或结束语句的位置，其余语句为-1
+    """
+    table = [-1] * len(statements)
+    stack = []  # [[块类型, 当前分支位置]]
+    for i, tokens in enumerate(statements):
+        head = _block_head(tokens)
+        if head is None:
+            continue
+        if head in _BLOCK_SYNTAX:
+            stack.append([head, i])
+            continue
+        kind = _BLOCK_PARTS[head]
+        line = tokens[0].line
+        if not stack or stack[-1][0] != kind:
+            if stack:
+                open_kind, start = stack[-1]
+                raise VBSSyntaxError(
+                    f"{_block_title(head)} 与第{statements[start][0].line}行的 "
+                    f"{_block_title(open_kind)} 不匹配", line)
+            raise VBSSyntaxError(f"{_block_title(head)} 没有对应的 {_block_title(kind)}", line)
+        block = stack[-1]
+        table[block[1]] = i
+        if head == _BLOCK_SYNTAX[kind][0]:
+            stack.pop()
+        elif _statement_head(statements[block[1]]) == 'ELSE':
+            raise VBSSyntaxError(f"Else 之后不能再有 {_block_title(head)}", line)
+        else:
+            block[1] = i
+    if stack:
+        kind, start = stack[-1]
+        raise VBSSyntaxError(f"{_block_title(kind)} 缺少 {_block_title(_BLOCK_SYNTAX[kind][0])}",
+                             statements[start][0].line)
+    return table
+
+class VBSParser:
+    """把语句词法单元解析为语法树"""
+    
+    def __init__(self, statements: List[List[VBSToken]]):
+        self.statements = statements
+        self.pos = 0
+        # 块语句跳转表，见match_vbs_blocks()
+        self.blocks = match_vbs_blocks(statements)
+        # 脚本中Const定义的常量（大写名称 -> 值）
+        self.constants = {}
+        # 正在解析的Sub/Function中Const定义的常量，以及遮住同名常量的参数和Dim局部变量
+        self.local_constants = None
+        self.local_names = frozenset()
+        # 外层到内层With对象的临时变量名
+        self.with_names = []
+        self.with_count = 0
+        self.select_count = 0
+        self._handlers = {
+            'DIM': self._parse_dim,
+            'REDIM': self._parse_redim,
+            'CONST': self._parse_const,
+            'SET': self._parse_set,
+            'IF': self._parse_if,
+            'FOR': self._parse_for,
+            'WHILE': self._parse_while,
+            'DO': self._parse_do,
+            'EXIT': self._parse_exit,
+            'ON': self._parse_on_error,
+            'OPTION': self._parse_option,
+            'CALL': self._parse_call,
+            'SUB': self._parse_procedure,
+            'FUNCTION': self._parse_procedure,
+            'PUBLIC': self._parse_scoped,
+            'PRIVATE': self._parse_scoped,
+            'WITH': self._parse_with,
+            'SELECT': self._parse_select,
+            'CLASS': self._parse_unsupported,
+            'PROPERTY': self._parse_unsupported,
+        }
+    
+    def parse_program(self) -> list:
+        """解析全部语句"""
+        return self._parse_until(len(self.statements))
+    
+    def _parse_until(self, end: int) -> list:
+        """解析从当前位置到end（不含）之间的语句"""
+        body = []
+        statements = self.statements
+        while self.pos < end:
+            tokens = statements[self.pos]
+            self.pos += 1
+            node = self._parse_statement(tokens)
+            if node is not None:
+                body.append(node)
+        return body
+    
+    def _parse_branch(self) -> Tuple[list, List[VBSToken]]:
+        """
+        解析刚读入的块开始语句（或中间分支）所辖的语句
+        
+        返回:
+            (语句列表, 同一块中下一个分支或结束语句的词法单元)，解析位置移到该语句之后
+        """
+        start = self.pos - 1
+        end = self.blocks[start] if 0 <= start < len(self.blocks) else -1
+        if end < 0:
+            tokens = self.statements[start]
+            raise VBSSyntaxError(f"{_statement_head(tokens).title()} 必须单独成行", tokens[0].line)
+        body = self._parse_until(end)
+        self.pos = end + 1
+        return body, self.statements[end]
+    
+    def _parse_statement(self, tokens: List[VBSToken]) -> Optional[VBSNode]:
+        """解析单条语句"""
+        if self.with_names:
+            tokens = self._expand_with(tokens)
+        first = tokens[0]
+        handler = self._handlers.get(first.key) if first.type is TK_IDENT else None
+        if handler is not None:
+            return handler(tokens)
         
-        if not expr:
-            return ""
+        eq = _find_keyword(tokens, '=')
+        if eq > 0 and _is_target(tokens[:eq]):
+            return AssignStmt(self._parse_target(tokens[:eq]),
+                              self.parse_expression(tokens[eq + 1:]), False, first.line)
+        call = self._parse_call_statement(tokens)
+        if call is not None:
+            return CallStmt(call, first.line)
+        return ExprStmt(self.parse_expression(tokens), first.line)
+    
+    def _parse_option(self, tokens: List[VBSToken]) -> None:
+        """Option Explicit（仅接受语法）"""
+        return None
+    
+    def _parse_unsupported(self, tokens: List[VBSToken]) -> None:
+        """尚不支持的块语句"""
+        raise VBSSyntaxError(f"不支持的语句: {_statement_head(tokens).title()}", tokens[0].line)
+    
+    def _parse_scoped(self, tokens: List[VBSToken]) -> Optional[VBSNode]:
+        """Public/Private Sub|Function ... 或 Public/Private 变量声明"""
+        if len(tokens) < 2:
+            raise VBSSyntaxError(f"{tokens[0].value}语句格式错误", tokens[0].line)
+        handler = self._handlers.get(tokens[1].key)
+        if tokens[1].key in ('SUB', 'FUNCTION', 'PROPERTY', 'CLASS'):
+            return handler(tokens[1:])
+        return self._parse_dim(tokens)
+    
+    def _parse_with(self, tokens: List[VBSToken]) -> VBSNode:
+        """With obj ... End With，块内的 .name 指向obj"""
+        line = tokens[0].line
+        obj = self.parse_expression(tokens[1:])
+        self.with_count += 1
+        name = f"_WITH{self.with_count}"
+        self.with_names.append(name)
+        try:
+            body, _ = self._parse_branch()
+        finally:
+            self.with_names.pop()
+        return WithStmt(name, obj, body, line)
+    
+    def _parse_select(self, tokens: List[VBSToken]) -> VBSNode:
+        """Select Case expr ... End Select"""
+        line = tokens[0].line
+        if len(tokens) < 3 or tokens[1].key != 'CASE':
+            raise VBSSyntaxError("Select语句格式错误", line)
+        expr = self.parse_expression(tokens[2:])
+        self.select_count += 1
+        var = f"_SELECT{self.select_count}"
+        body, head_tokens = self._parse_branch()
+        if body:
+            raise VBSSyntaxError("Select Case 与第一个 Case 之间不能有语句", body[0].line)
+        cases = []
+        else_body = None
+        while _statement_head(head_tokens) == 'CASE':
+            if else_body is not None:
+                raise VBSSyntaxError("Case Else 之后不能再有 Case", head_tokens[0].line)
+            if len(head_tokens) == 2 and head_tokens[1].key == 'ELSE':
+                else_body, head_tokens = self._parse_branch()
+                continue
+            labels, cond = self._parse_case_labels(head_tokens, var)
+            body, head_tokens = self._parse_branch()
+            cases.append((labels, cond, body))
+        return SelectStmt(var, expr, cases, else_body, line)
+    
+    def _parse_case_labels(self, tokens: List[VBSToken], var: str) -> Tuple[Optional[list], VBSNode]:
+        """
+        解析Case标签：值、下界 To 上界 或 Is 比较运算符 值
         
-        # 处理字符串连接符 &
-        if '&' in expr:
-            parts = []
-            current = ""
-            in_quotes = False
-            quote_char = None
-            
-            for char in expr:
-                if char in ['"', "'"]:
-                    if not in_quotes:
-                        in_quotes = True
-                        quote_char = char
-                    elif char == quote_char:
-                        in_quotes = False
-                        quote_char = None
-                    current += char
-                elif char == '&' and not in_quotes:
-                    if current:
-                        parts.append(current.strip())
-                        current = ""
+        返回:
+            (常量标签列表，有非常量标签时为None, 等价的条件表达式)
+        """
+        line = tokens[0].line
+        selector = NameExpr(var, line)
+        labels = []
+        cond = None
+        for part in _split_tokens(tokens[1:], ','):
+            if not part:
+                raise VBSSyntaxError("Case语句缺少值", line)
+            if part[0].key == 'IS':
+                op = part[1].key if len(part) > 2 else ''
+                if op not in _CASE_IS_OPERATORS:
+                    raise VBSSyntaxError("Case Is 之后应为比较运算符和值", line)
+                test = BinaryExpr(op, selector, self.parse_expression(part[2:]), line)
+                labels = None
+            else:
+                to_pos = _find_keyword(part, 'TO')
+                if to_pos < 0:
+                    label = (self.parse_expression(part),)
+                    test = BinaryExpr('=', selector, label[0], line)
                 else:
-                    current += char
-            
-            if current:
-                parts.append(current.strip())
-            
-            result_parts = []
-            for part in parts:
-                if part:
-                    evaluated = self._evaluate_simple_expression(part)
-                    result_parts.append(str(evaluated) if evaluated is not None else "")
-            
-            return ''.join(result_parts)
+                    label = (self.parse_expression(part[:to_pos]),
+                             self.parse_expression(part[to_pos + 1:]))
+                    test = BinaryExpr('AND', BinaryExpr('>=', selector, label[0], line),
+                                      BinaryExpr('<=', selector, label[1], line), line)
+                if labels is not None:
+                    values = tuple(_constant_value(node) for node in label)
+                    if _NO_VALUE in values:
+                        labels = None
+                    else:
+                        labels.append(values)
+            cond = test if cond is None else BinaryExpr('OR', cond, test, line)
+        return labels, cond
+    
+    def _expand_with(self, tokens: List[VBSToken]) -> List[VBSToken]:
+        """在With块内把开头的 .name 展开为 With对象.name"""
+        name = self.with_names[-1]
+        expanded = []
+        for tok in tokens:
+            if tok.value == ' .':
+                expanded.append(VBSToken(TK_IDENT, name, name, tok.line))
+            expanded.append(tok)
+        return expanded
+    
+    def _parse_const(self, tokens: List[VBSToken]) -> None:
+        """Const name = value[, ...]，在编译时求值，不生成语句"""
+        line = tokens[0].line
+        for part in _split_tokens(tokens[1:], ','):
+            if len(part) < 3 or part[0].type is not TK_IDENT or part[1].key != '=':
+                raise VBSSyntaxError("Const语句格式错误", line)
+            value = _constant_value(self.parse_expression(part[2:]))
+            if value is _NO_VALUE:
+                raise VBSSyntaxError(f"Const {part[0].value} 需要常量表达式", line)
+            if self.local_constants is not None:
+                self.local_constants[part[0].key] = value
+            else:
+                self.constants[part[0].key] = value
+        return None
+    
+    def _constant(self, key: str) -> Any:
+        """返回常量的值，不是常量时返回_NO_VALUE"""
+        if self.local_constants is not None:
+            value = self.local_constants.get(key, _NO_VALUE)
+            if value is not _NO_VALUE or key in self.local_names:
+                return value
+        value = self.constants.get(key, _NO_VALUE)
+        if value is _NO_VALUE:
+            value = VBS_CONSTANTS.get(key, _NO_VALUE)
+        return value
+    
+    def _parse_on_error(self, tokens: List[VBSToken]) -> Optional[VBSNode]:
+        """On Error Resume Next / On Error GoTo 0"""
+        keys = [tok.key for tok in tokens[1:]]
+        if keys == ['ERROR', 'RESUME', 'NEXT']:
+            return OnErrorStmt(True, tokens[0].line)
+        if keys == ['ERROR', 'GOTO', ''] and tokens[-1].value == 0:
+            return OnErrorStmt(False, tokens[0].line)
+        raise VBSSyntaxError("不支持的On Error语句", tokens[0].line)
+    
+    def _parse_dim(self, tokens: List[VBSToken]) -> VBSNode:
+        """Dim a, b(10)"""
+        names = []
+        for part in _split_tokens(tokens[1:], ','):
+            if not part or part[0].type is not TK_IDENT:
+                raise VBSSyntaxError("Dim语句缺少变量名", tokens[0].line)
+            if len(part) > 1 and part[1].key == '(':
+                bounds = [self.parse_expression(b) for b in _split_tokens(part[2:-1], ',') if b]
+                names.append((part[0].value, bounds))
+            else:
+                names.append((part[0].value, None))
+        return DimStmt(names, tokens[0].line)
+    
+    def _parse_redim(self, tokens: List[VBSToken]) -> VBSNode:
+        """ReDim [Preserve] a(10), b(n, m)"""
+        preserve = len(tokens) > 1 and tokens[1].key == 'PRESERVE'
+        names = []
+        for part in _split_tokens(tokens[2 if preserve else 1:], ','):
+            if (len(part) < 3 or part[0].type is not TK_IDENT or part[1].key != '('
+                    or part[-1].key != ')'):
+                raise VBSSyntaxError("ReDim语句格式错误", tokens[0].line)
+            bounds = [self.parse_expression(b) for b in _split_tokens(part[2:-1], ',') if b]
+            if not bounds:
+                raise VBSSyntaxError("ReDim语句缺少数组上界", tokens[0].line)
+            names.append((part[0].value, bounds))
+        if not names:
+            raise VBSSyntaxError("ReDim语句缺少变量名", tokens[0].line)
+        return ReDimStmt(names, preserve, tokens[0].line)
+    
+    def _parse_set(self, tokens: List[VBSToken]) -> VBSNode:
+        """Set target = expr"""
+        eq = _find_keyword(tokens, '=')
+        if eq < 2:
+            raise VBSSyntaxError("Set语句缺少 =", tokens[0].line)
+        return AssignStmt(self._parse_target(tokens[1:eq]),
+                          self.parse_expression(tokens[eq + 1:]), True, tokens[0].line)
+    
+    def _parse_target(self, tokens: List[VBSToken]) -> VBSNode:
+        """赋值目标：变量、数组元素或对象属性"""
+        target = self.parse_expression(tokens)
+        if not isinstance(target, (NameExpr, CallExpr, MemberExpr)):
+            raise VBSSyntaxError("无效的赋值目标", tokens[0].line)
+        return target
+    
+    def _parse_call(self, tokens: List[VBSToken]) -> VBSNode:
+        """Call name(args)"""
+        call = self._parse_call_statement(tokens[1:], True)
+        if call is None:
+            raise VBSSyntaxError("Call语句缺少过程名", tokens[0].line)
+        return CallStmt(call, tokens[0].line)
+    
+    def _parse_call_statement(self, tokens: List[VBSToken],
+                              call_keyword: bool = False) -> Optional[VBSNode]:
+        """
+        解析 name args / obj.method args / name(args) 形式的调用
+        
+        不带Call关键字时，name (x)中的括号属于实参本身，x按值传递。
+        """
+        if not tokens or tokens[0].type is not TK_IDENT:
+            return None
+        line = tokens[0].line
+        # 名称链 a.b.c
+        i = 1
+        while i + 1 < len(tokens) and tokens[i].key == '.' and tokens[i + 1].type is TK_IDENT:
+            i += 2
+        rest = tokens[i:]
+        parenthesized = False
+        if rest and rest[0].key == '(' and _find_close_paren(rest, 0) == len(rest) - 1:
+            rest = rest[1:-1]
+            parenthesized = not call_keyword
+        elif rest and rest[0].key != '-' and rest[0].key in _BINARY_OPERATORS:
+            # a + b、a Mod b 等是表达式语句
+            return None
+        elif rest and rest[0].type is TK_OP and rest[0].key != '(':
+            return None
+        args = [self.parse_expression(arg) for arg in _split_tokens(rest, ',')] if rest else []
+        if parenthesized and len(args) == 1 and args[0].__class__ in (NameExpr, CallExpr):
+            args[0].parenthesized = True
         
-        return self._evaluate_simple_expression(expr)
+        if i == 1:
+            return CallExpr(tokens[0].value, args, line)
+        obj = NameExpr(tokens[0].value, line)
+        for j in range(2, i - 2, 2):
+            obj = MemberExpr(obj, tokens[j].value, None, line)
+        return MemberExpr(obj, tokens[i - 1].value, args, line)
+    
+    def _parse_if(self, tokens: List[VBSToken]) -> VBSNode:
+        """If语句（单行或多行）"""
+        line = tokens[0].line
+        then_pos = _find_keyword(tokens, 'THEN')
+        if then_pos < 0:
+            raise VBSSyntaxError("If语句缺少 Then", line)
+        cond = self.parse_expression(tokens[1:then_pos])
+        
+        if then_pos == len(tokens) - 1:
+            # 多行If，各分支的范围由跳转表给出
+            body, head_tokens = self._parse_branch()
+            branches = [(cond, body)]
+            else_body = None
+            while True:
+                head = _statement_head(head_tokens)
+                if head == 'ELSEIF':
+                    start = 2 if head_tokens[0].key == 'ELSE' else 1
+                    then_pos = _find_keyword(head_tokens, 'THEN')
+                    if then_pos < 0:
+                        raise VBSSyntaxError("ElseIf语句缺少 Then", head_tokens[0].line)
+                    branch_cond = self.parse_expression(head_tokens[start:then_pos])
+                    body, head_tokens = self._parse_branch()
+                    branches.append((branch_cond, body))
+                elif head == 'ELSE':
+                    else_body, head_tokens = self._parse_branch()
+                else:
+                    return IfStmt(branches, else_body, line)
+        
+        # 单行If: If cond Then stmt [Else stmt]
+        else_pos = _find_keyword(tokens, 'ELSE', then_pos + 1)
+        if else_pos < 0:
+            true_body = [self._parse_statement(tokens[then_pos + 1:])]
+            else_body = None
+            tail = true_body
+        else:
+            true_body = [self._parse_statement(tokens[then_pos + 1:else_pos])]
+            else_body = [self._parse_statement(tokens[else_pos + 1:])]
+            tail = else_body
+        # 同一行中用冒号分隔的后续语句属于最后一个分支（块结构语句除外）
+        statements = self.statements
+        while (self.pos < len(statements) and statements[self.pos][0].line == line
+               and _block_head(statements[self.pos]) is None):
+            tail.append(self._parse_statement(statements[self.pos]))
+            self.pos += 1
+        return IfStmt([(cond, [s for s in true_body if s is not None])],
+                      [s for s in else_body if s is not None] if else_body else None, line)
+    
+    def _parse_for(self, tokens: List[VBSToken]) -> VBSNode:
+        """For ... Next 与 For Each ... Next"""
+        line = tokens[0].line
+        if len(tokens) > 1 and tokens[1].key == 'EACH':
+            in_pos = _find_keyword(tokens, 'IN')
+            if in_pos != 3 or tokens[2].type is not TK_IDENT:
+                raise VBSSyntaxError("For Each语句格式错误", line)
+            group = self.parse_expression(tokens[in_pos + 1:])
+            body, _ = self._parse_branch()
+            return ForEachStmt(tokens[2].value, group, body, line)
+        
+        to_pos = _find_keyword(tokens, 'TO')
+        if len(tokens) < 4 or tokens[1].type is not TK_IDENT or tokens[2].key != '=' or to_pos < 0:
+            raise VBSSyntaxError("For语句格式错误", line)
+        step_pos = _find_keyword(tokens, 'STEP', to_pos + 1)
+        start = self.parse_expression(tokens[3:to_pos])
+        if step_pos < 0:
+            end = self.parse_expression(tokens[to_pos + 1:])
+            step = None
+        else:
+            end = self.parse_expression(tokens[to_pos + 1:step_pos])
+            step = self.parse_expression(tokens[step_pos + 1:])
+        body, _ = self._parse_branch()
+        return ForStmt(tokens[1].value, start, end, step, body, line)
+    
+    def _parse_while(self, tokens: List[VBSToken]) -> VBSNode:
+        """While ... Wend"""
+        cond = self.parse_expression(tokens[1:])
+        body, _ = self._parse_branch()
+        return WhileStmt(cond, body, tokens[0].line)
+    
+    def _parse_do(self, tokens: List[VBSToken]) -> VBSNode:
+        """Do [While|Until] ... Loop [While|Until]"""
+        line = tokens[0].line
+        cond = None
+        until = False
+        test_first = True
+        if len(tokens) > 1:
+            if tokens[1].key not in ('WHILE', 'UNTIL'):
+                raise VBSSyntaxError("Do语句格式错误", line)
+            until = tokens[1].key == 'UNTIL'
+            cond = self.parse_expression(tokens[2:])
+        body, loop_tokens = self._parse_branch()
+        if len(loop_tokens) > 1:
+            if cond is not None or loop_tokens[1].key not in ('WHILE', 'UNTIL'):
+                raise VBSSyntaxError("Loop语句格式错误", loop_tokens[0].line)
+            until = loop_tokens[1].key == 'UNTIL'
+            cond = self.parse_expression(loop_tokens[2:])
+            test_first = False
+        return DoStmt(cond, until, test_first, body, line)
+    
+    def _parse_exit(self, tokens: List[VBSToken]) -> VBSNode:
+        """Exit For/Do/Sub/Function"""
+        if len(tokens) != 2 or tokens[1].key not in ('FOR', 'DO', 'SUB', 'FUNCTION'):
+            raise VBSSyntaxError("Exit语句格式错误", tokens[0].line)
+        return ExitStmt(tokens[1].key, tokens[0].line)
+    
+    def _parse_procedure(self, tokens: List[VBSToken]) -> VBSNode:
+        """Sub/Function定义"""
+        kind = tokens[0].key
+        if len(tokens) < 2 or tokens[1].type is not TK_IDENT:
+            raise VBSSyntaxError(f"{kind.title()}缺少名称", tokens[0].line)
+        params = []
+        if len(tokens) > 2 and tokens[2].key == '(':
+            for part in _split_tokens(tokens[3:-1], ','):
+                if not part:
+                    continue
+                # 未注明时按引用传递
+                byref = part[0].key != 'BYVAL'
+                if part[0].key in ('BYVAL', 'BYREF'):
+                    part = part[1:]
+                if not part or part[0].type is not TK_IDENT:
+                    raise VBSSyntaxError(f"{kind.title()}参数格式错误", tokens[0].line)
+                params.append((part[0].value, byref))
+        # 过程有自己的常量作用域：过程内的Const只在过程内有效，
+        # 参数和Dim声明的局部变量遮住同名的全局常量
+        outer = self.local_constants, self.local_names
+        self.local_constants = {}
+        self.local_names = frozenset(
+            [name.upper() for name, _ in params] + self._procedure_dims(self.pos - 1))
+        try:
+            body, _ = self._parse_branch()
+        finally:
+            self.local_constants, self.local_names = outer
+        return ProcedureStmt(kind, tokens[1].value, params, body, tokens[0].line)
+    
+    def _procedure_dims(self, start: int) -> List[str]:
+        """start处的过程定义中Dim/ReDim声明的变量名（大写），声明对整个过程有效"""
+        end = self.blocks[start] if 0 <= start < len(self.blocks) else -1
+        names = []
+        for tokens in self.statements[start + 1:end]:
+            if tokens[0].key in ('DIM', 'REDIM'):
+                parts = tokens[1:]
+                if parts and parts[0].key == 'PRESERVE':
+                    parts = parts[1:]
+                names.extend(part[0].key for part in _split_tokens(parts, ',') if part)
+        return names
+    
+    def parse_expression(self, tokens: List[VBSToken]) -> VBSNode:
+        """解析表达式（按VBScript运算符优先级爬升）"""
+        if not tokens:
+            return LiteralExpr("")
+        node, pos = self._parse_binary(tokens, 0, 0)
+        if pos < len(tokens):
+            raise VBSSyntaxError(f"表达式语法错误: {_tokens_text(tokens)}", tokens[pos].line)
+        return node
+    
+    def _parse_binary(self, tokens: List[VBSToken], pos: int, min_prec: int) -> Tuple[VBSNode, int]:
+        """解析优先级不低于min_prec的二元运算，返回(节点, 下一个位置)"""
+        left, pos = self._parse_unary(tokens, pos)
+        n = len(tokens)
+        while pos < n:
+            tok = tokens[pos]
+            entry = _BINARY_OPERATORS.get(tok.key)
+            if entry is None or entry[0] < min_prec:
+                break
+            prec, func = entry
+            # 同级运算符左结合
+            right, pos = self._parse_binary(tokens, pos + 1, prec + 1)
+            if func is None:
+                # 连续的&合并为一个节点，字面量在语法树优化时合并
+                parts = left.parts if isinstance(left, ConcatExpr) else [left]
+                parts = parts + (right.parts if isinstance(right, ConcatExpr) else [right])
+                left = ConcatExpr(parts, tok.line)
+            else:
+                left = BinaryExpr(tok.key, left, right, tok.line)
+        return left, pos
+    
+    def _parse_unary(self, tokens: List[VBSToken], pos: int) -> Tuple[VBSNode, int]:
+        """解析一元运算 -a / +a / Not a"""
+        if pos >= len(tokens):
+            raise VBSSyntaxError(f"表达式不完整: {_tokens_text(tokens)}", tokens[-1].line)
+        tok = tokens[pos]
+        key = tok.key
+        if key == '-' or key == 'NOT':
+            prec = _NEG_PRECEDENCE if key == '-' else _NOT_PRECEDENCE
+            operand, pos = self._parse_binary(tokens, pos + 1, prec + 1)
+            if key == '-' and isinstance(operand, LiteralExpr) and type(operand.value) in (int, float):
+                # 负数字面量
+                return LiteralExpr(-operand.value, tok.line), pos
+            return UnaryExpr(key, operand, tok.line), pos
+        if key == '+':
+            return self._parse_binary(tokens, pos + 1, _NEG_PRECEDENCE + 1)
+        return self._parse_primary(tokens, pos)
+    
+    def _parse_primary(self, tokens: List[VBSToken], pos: int) -> Tuple[VBSNode, int]:
+        """解析字面量、括号表达式，以及名称、调用和成员访问链"""
+        tok = tokens[pos]
+        line = tok.line
+        kind = tok.type
+        if kind is TK_NUMBER or kind is TK_STRING or kind is TK_DATE:
+            return LiteralExpr(tok.value, line), pos + 1
+        if tok.key == '(':
+            node, pos = self._parse_binary(tokens, pos + 1, 0)
+            if pos >= len(tokens) or tokens[pos].key != ')':
+                raise VBSSyntaxError(f"缺少 ): {_tokens_text(tokens)}", line)
+            if node.__class__ is NameExpr or node.__class__ is CallExpr:
+                # (x)、(a(1))是表达式而不是变量，作为实参时按值传递
+                node.parenthesized = True
+            return node, pos + 1
+        if kind is not TK_IDENT or tok.key in _BINARY_OPERATORS:
+            raise VBSSyntaxError(f"表达式语法错误: {_tokens_text(tokens)}", line)
+        
+        key = tok.key
+        if key in _LITERAL_KEYWORDS:
+            return LiteralExpr(_LITERAL_KEYWORDS[key], line), pos + 1
+        value = self._constant(key)
+        if value is not _NO_VALUE:
+            return LiteralExpr(value, line), pos + 1
+        
+        # 名称链与调用: a(args).b.c(args)
+        node = NameExpr(tok.value, line)
+        pos += 1
+        n = len(tokens)
+        while pos < n:
+            key = tokens[pos].key
+            if key == '(':
+                args, pos = self._parse_arguments(tokens, pos + 1)
+                if isinstance(node, NameExpr):
+                    node = CallExpr(node.name, args, line)
+                elif isinstance(node, MemberExpr) and node.args is None:
+                    node.args = args
+                else:
+                    raise VBSSyntaxError(f"不支持的调用形式: {_tokens_text(tokens)}", line)
+            elif key == '.' and pos + 1 < n and tokens[pos + 1].type is TK_IDENT:
+                node = MemberExpr(node, tokens[pos + 1].value, None, line)
+                pos += 2
+            else:
+                break
+        return node, pos
+    
+    def _parse_arguments(self, tokens: List[VBSToken], pos: int) -> Tuple[list, int]:
+        """解析左括号之后的参数列表，返回(参数, 右括号之后的位置)"""
+        args = []
+        if pos < len(tokens) and tokens[pos].key == ')':
+            return args, pos + 1
+        while True:
+            arg, pos = self._parse_binary(tokens, pos, 0)
+            args.append(arg)
+            if pos >= len(tokens):
+                raise VBSSyntaxError(f"缺少 ): {_tokens_text(tokens)}", tokens[-1].line)
+            key = tokens[pos].key
+            pos += 1
+            if key == ')':
+                return args, pos
+            if key != ',':
+                raise VBSSyntaxError(f"表达式语法错误: {_tokens_text(tokens)}", tokens[pos - 1].line)
+
+# ------------------------------------------------
+# 6.3 语法树优化
+# ------------------------------------------------
+
+# 纯函数：结果只取决于参数且没有副作用。参数都是常量时在编译时求值，
+# 参数在循环中不变时移到循环之前只计算一次
+_PURE_FUNCTIONS = frozenset((
+    'ABS', 'ASC', 'CBOOL', 'CDBL', 'CHR', 'CINT', 'CLNG', 'CSNG', 'CSTR', 'FIX',
+    'HEX', 'INSTR', 'INSTRREV', 'INT', 'ISNUMERIC', 'LCASE', 'LEFT', 'LEN', 'LTRIM', 'MID', 'OCT',
+    'REPLACE', 'RIGHT', 'ROUND', 'RTRIM', 'SGN', 'SPACE', 'SQR', 'STR', 'STRING',
+    'STRREVERSE', 'TRIM', 'UCASE', 'VAL',
+))
+
+def _is_hidden_name(key: str) -> bool:
+    """编译器和优化器生成的隐藏变量（名称含@，如@PURE1）只在程序内部使用，不写回解释器"""
+    return '@' in key
+
+def _map_expressions(stmt: VBSNode, func: Callable[[VBSNode], VBSNode]):
+    """用func的返回值替换语句中的每个表达式（不包括子语句块）"""
+    if isinstance(stmt, (AssignStmt, CallStmt, ExprStmt)):
+        if isinstance(stmt, AssignStmt):
+            # 赋值目标本身不是表达式，只替换下标、参数和对象
+            target = stmt.target
+            if isinstance(target, MemberExpr):
+                target.obj = func(target.obj)
+            if isinstance(target, (CallExpr, MemberExpr)) and target.args:
+                target.args = [func(arg) for arg in target.args]
+        stmt.expr = func(stmt.expr)
+    elif isinstance(stmt, (DimStmt, ReDimStmt)):
+        stmt.names = [(name, bounds and [func(bound) for bound in bounds])
+                      for name, bounds in stmt.names]
+    elif isinstance(stmt, IfStmt):
+        stmt.branches = [(func(cond), body) for cond, body in stmt.branches]
+    elif isinstance(stmt, ForStmt):
+        stmt.start = func(stmt.start)
+        stmt.end = func(stmt.end)
+        if stmt.step is not None:
+            stmt.step = func(stmt.step)
+    elif isinstance(stmt, ForEachStmt):
+        stmt.group = func(stmt.group)
+    elif isinstance(stmt, (WhileStmt, DoStmt)):
+        if stmt.cond is not None:
+            stmt.cond = func(stmt.cond)
+    elif isinstance(stmt, WithStmt):
+        stmt.obj = func(stmt.obj)
+    elif isinstance(stmt, SelectStmt):
+        stmt.expr = func(stmt.expr)
+        stmt.cases = [(labels, func(cond), body) for labels, cond, body in stmt.cases]
+
+def _map_entry_expressions(stmt: VBSNode, func: Callable[[VBSNode], VBSNode]):
+    """
+    用func替换语句执行时一定会计算的表达式（不包括子语句块）
+    
+    If只有第一个条件、Select Case只有测试表达式、Do只有前置的条件一定会计算。
+    """
+    if isinstance(stmt, IfStmt):
+        cond, body = stmt.branches[0]
+        stmt.branches[0] = (func(cond), body)
+    elif isinstance(stmt, SelectStmt):
+        stmt.expr = func(stmt.expr)
+    elif isinstance(stmt, DoStmt):
+        if stmt.cond is not None and stmt.test_first:
+            stmt.cond = func(stmt.cond)
+    else:
+        _map_expressions(stmt, func)
+
+def _sub_expressions(node: VBSNode) -> list:
+    """表达式直接包含的子表达式"""
+    if isinstance(node, CallExpr):
+        return node.args
+    if isinstance(node, MemberExpr):
+        return [node.obj] + (node.args or [])
+    if isinstance(node, ConcatExpr):
+        return node.parts
+    if isinstance(node, UnaryExpr):
+        return [node.operand]
+    if isinstance(node, BinaryExpr):
+        return [node.left, node.right]
+    return []
+
+class VBSOptimizer:
+    """
+    语法树优化：常量折叠、删除条件为常量的分支、外提循环中不变的纯函数调用
+    
+    常量折叠包括字面量之间的运算和字符串连接（如 1 + 2、"a" & "b"），以及参数为
+    常量的纯函数调用（如 Chr(13)）和由此变为常量的外层表达式。
+    
+    参数:
+        overridden: 被解释器的define_function()覆盖的内置函数名（大写），不折叠也不外提
+    
+    属性:
+        changes: 优化记录[(行号, 说明)]
+        builtins: 按内置定义折叠或外提过的纯函数名（大写）
+    """
+    
+    def __init__(self, overridden: frozenset = frozenset()):
+        self.changes = []
+        self.overridden = overridden
+        self.builtins = set()
+        self.variables = set()      # 程序中声明或赋值的名称（与内置函数同名时不是函数）
+        self.procedures = set()     # 脚本定义的过程名
+        self.procedure = None       # 正在优化的过程名（在Function中是返回值变量）
+        self.hoist_count = 0
+        self._loop_optimizers = {
+            ForStmt: self._optimize_for,
+            ForEachStmt: self._optimize_for,
+            WhileStmt: self._optimize_while,
+            DoStmt: self._optimize_do,
+        }
     
-    def _evaluate_simple_expression(self, expr: str) -> Any:
-        """计算简单表达式值（不包含连接符）"""
-        expr = expr.strip()
+    def optimize(self, body: list) -> list:
+        """优化整个程序，返回新的顶层语句列表"""
+        for stmt in body:
+            if isinstance(stmt, ProcedureStmt):
+                self.procedures.add(stmt.name.upper())
+                self.variables.update(name.upper() for name, _ in stmt.params)
+                self._collect_variables(stmt.body)
+        self._collect_variables(body)
+        return self.block(body)
+    
+    def _collect_variables(self, body: list):
+        for stmt in _walk_statements(body):
+            self.variables.update(name.upper() for name in _assigned_names(stmt))
+            if isinstance(stmt, AssignStmt) and isinstance(stmt.target, CallExpr):
+                self.variables.add(stmt.target.key)
+    
+    def block(self, body: list) -> list:
+        """优化语句列表，条件恒为真的If展开到所在的语句列表中"""
+        result = []
+        for stmt in body:
+            if isinstance(stmt, ProcedureStmt):
+                self.procedure = stmt.name.upper()
+                stmt.body = self.block(stmt.body)
+                self.procedure = None
+                result.append(stmt)
+                continue
+            _map_expressions(stmt, self.expr)
+            if isinstance(stmt, IfStmt):
+                result.extend(self._optimize_if(stmt))
+                continue
+            if isinstance(stmt, CallStmt) and isinstance(stmt.expr, LiteralExpr):
+                self.changes.append((stmt.line, "删除结果未使用的纯函数调用"))
+                continue
+            for child in _child_blocks(stmt):
+                child[:] = self.block(child)
+            optimizer = self._loop_optimizers.get(type(stmt))
+            result.extend(optimizer(stmt) if optimizer else [stmt])
+        return result
+    
+    def _is_pure_call(self, node: VBSNode) -> bool:
+        """node是否为内置纯函数的调用（同名变量或过程不算）"""
+        return (isinstance(node, CallExpr) and node.key in _PURE_FUNCTIONS
+                and node.key not in self.variables and node.key not in self.procedures
+                and node.key not in self.overridden)
+    
+    def expr(self, node: VBSNode) -> VBSNode:
+        """折叠表达式中的常量部分"""
+        if isinstance(node, CallExpr):
+            node.args = [self.expr(arg) for arg in node.args]
+            if self._is_pure_call(node) and all(isinstance(arg, LiteralExpr) for arg in node.args):
+                return self._fold_call(node)
+        elif isinstance(node, MemberExpr):
+            node.obj = self.expr(node.obj)
+            if node.args:
+                node.args = [self.expr(arg) for arg in node.args]
+        elif isinstance(node, ConcatExpr):
+            parts = [piece for part in map(self.expr, node.parts)
+                     for piece in (part.parts if isinstance(part, ConcatExpr) else [part])]
+            folded = _fold_concat(parts, node.line)
+            if isinstance(folded, LiteralExpr):
+                self._record_fold(folded)
+            elif len(folded.parts) < len(parts):
+                self.changes.append((node.line, "合并相邻的字符串字面量"))
+            return folded
+        elif isinstance(node, UnaryExpr):
+            node.operand = self.expr(node.operand)
+            return self._record_fold(_fold_literals(node, _UNARY_OPERATORS[node.op], node.operand))
+        elif isinstance(node, BinaryExpr):
+            node.left = self.expr(node.left)
+            node.right = self.expr(node.right)
+            return self._record_fold(_fold_literals(node, _BINARY_OPERATORS[node.op][1],
+                                                    node.left, node.right))
+        return node
+    
+    def _record_fold(self, node: VBSNode) -> VBSNode:
+        if isinstance(node, LiteralExpr):
+            self.changes.append((node.line, f"常量表达式折叠为 {node.value!r}"))
+        return node
+    
+    def _fold_call(self, node: CallExpr) -> VBSNode:
+        """在编译时调用纯函数，出错或结果不是简单值时保留到运行时"""
+        try:
+            value = BUILTIN_FUNCTIONS[node.key](*[arg.value for arg in node.args])
+        except Exception:
+            return node
+        if value is None:
+            value = ""
+        if not isinstance(value, (bool, int, float, str)):
+            return node
+        self.builtins.add(node.key)
+        self.changes.append((node.line, f"{node.name}(...) 折叠为常量 {value!r}"))
+        return LiteralExpr(value, node.line)
+    
+    def _optimize_if(self, stmt: IfStmt) -> list:
+        """删除条件恒为假的分支；条件恒为真的分支成为最后一个分支"""
+        branches = []
+        for cond, body in stmt.branches:
+            if not isinstance(cond, LiteralExpr):
+                branches.append((cond, self.block(body)))
+                continue
+            if not cond.value:
+                self.changes.append((cond.line, "删除条件恒为假的分支"))
+                continue
+            self.changes.append((cond.line, "条件恒为真，删除之后的分支"))
+            stmt.else_body = body
+            break
+        else_body = self.block(stmt.else_body) if stmt.else_body else None
+        if not branches:
+            return else_body or []
+        stmt.branches = branches
+        stmt.else_body = else_body
+        return [stmt]
+    
+    def _optimize_for(self, stmt: VBSNode) -> list:
+        return self._hoist(stmt, stmt.body, [])
+    
+    def _optimize_while(self, stmt: WhileStmt) -> list:
+        if isinstance(stmt.cond, LiteralExpr) and not stmt.cond.value:
+            self.changes.append((stmt.line, "删除不会执行的循环"))
+            return []
+        return self._hoist(stmt, stmt.body, [stmt])
+    
+    def _optimize_do(self, stmt: DoStmt) -> list:
+        cond = stmt.cond
+        if (stmt.test_first and isinstance(cond, LiteralExpr)
+                and bool(cond.value) == stmt.until):
+            self.changes.append((stmt.line, "删除不会执行的循环"))
+            return []
+        return self._hoist(stmt, stmt.body, [stmt] if cond is not None else [])
+    
+    def _hoist(self, loop: VBSNode, body: list, heads: list) -> list:
+        """
+        把循环中参数不变的纯函数调用移到循环之前，结果保存在隐藏变量中
         
-        if not expr:
-            return ""
+        只外提一定会计算的调用：循环条件，以及循环体开头到第一个含有Exit或
+        On Error的语句为止，各语句执行时一定会计算的表达式。循环体可能一次
+        也不执行时，外提的调用放在循环体开头，只在第一次循环时计算。
         
-        # 字符串常量
-        if (expr.startswith('"') and expr.endswith('"')) or \
-           (expr.startswith("'") and expr.endswith("'")):
-            return expr[1:-1]
+        参数:
+            loop: 循环语句
+            body: 循环体
+            heads: 进入循环时就计算条件的语句（While/前置条件的Do本身）
         
-        # 数字
-        if expr.replace('.', '', 1).replace('-', '', 1).isdigit():
-            if '.' in expr:
-                return float(expr)
+        返回:
+            替换循环语句的语句列表
+        """
+        statements = list(_walk_statements(body))
+        assigned = {name.upper() for stmt in statements for name in _assigned_names(stmt)}
+        for stmt in statements:
+            if isinstance(stmt, AssignStmt) and isinstance(stmt.target, CallExpr):
+                assigned.add(stmt.target.key)
+        if isinstance(loop, (ForStmt, ForEachStmt)):
+            assigned.add(loop.var.upper())
+        
+        calls = []
+        def scan(node):
+            calls.append(node)
+            for child in _sub_expressions(node):
+                scan(child)
+            return node
+        for stmt in heads + statements:
+            _map_expressions(stmt, scan)
+        for node in calls:
+            if not isinstance(node, (CallExpr, NameExpr)):
+                continue
+            key = node.key
+            if isinstance(node, NameExpr):
+                # 没有声明或赋值过的名称可能是外部定义的无参函数
+                is_call = ((key in self.procedures and key != self.procedure)
+                           or key in self.overridden
+                           or (key not in self.variables and key not in BUILTIN_FUNCTIONS))
             else:
-                return int(expr)
+                is_call = key in self.procedures or key in self.overridden or (
+                    key not in self.variables and key not in BUILTIN_FUNCTIONS)
+            if is_call:
+                # 调用脚本过程或外部定义的函数，可能修改任何全局变量
+                return [loop]
         
-        # 布尔值
-        if expr.upper() in ['TRUE', 'FALSE']:
-            return expr.upper() == 'TRUE'
+        def invariant(node):
+            if isinstance(node, LiteralExpr):
+                return True
+            if isinstance(node, NameExpr):
+                # 只有程序中声明或赋值过的名称才是变量，其他名称可能是无参函数（如Now、Rnd）
+                key = node.key
+                return (key not in assigned and key in self.variables
+                        and key not in self.procedures and key not in self.overridden)
+            if isinstance(node, (CallExpr, MemberExpr)) and not self._is_pure_call(node):
+                return False
+            return all(invariant(child) for child in _sub_expressions(node))
         
-        # 常量
-        if expr.upper() in self.constants:
-            return self.constants[expr.upper()]
+        hoisted = []
+        def replace(node):
+            if self._is_pure_call(node) and invariant(node):
+                self.hoist_count += 1
+                self.builtins.add(node.key)
+                name = f"@PURE{self.hoist_count}"
+                self.variables.add(name)
+                hoisted.append(AssignStmt(NameExpr(name, loop.line), node, False, loop.line))
+                return NameExpr(name, node.line)
+            if isinstance(node, CallExpr):
+                node.args = [replace(arg) for arg in node.args]
+            elif isinstance(node, MemberExpr):
+                node.obj = replace(node.obj)
+                if node.args:
+                    node.args = [replace(arg) for arg in node.args]
+            elif isinstance(node, ConcatExpr):
+                node.parts = [replace(part) for part in node.parts]
+            elif isinstance(node, UnaryExpr):
+                node.operand = replace(node.operand)
+            elif isinstance(node, BinaryExpr):
+                node.left = replace(node.left)
+                node.right = replace(node.right)
+            return node
+        for stmt in heads:
+            _map_entry_expressions(stmt, replace)
+        count = len(hoisted)
+        for stmt in body:
+            if isinstance(stmt, OnErrorStmt):
+                break
+            _map_entry_expressions(stmt, replace)
+            if any(isinstance(inner, (ExitStmt, OnErrorStmt)) for inner in _walk_statements([stmt])):
+                break
+        
+        line = loop.line
+        before, lazy = hoisted[:count], hoisted[count:]
+        if isinstance(loop, DoStmt) and not (loop.test_first and loop.cond is not None):
+            # 条件在循环末尾或没有条件：循环体至少执行一次
+            before, lazy = hoisted, []
+        for assign in before:
+            self.changes.append((assign.expr.line, f"{assign.expr.name}(...) 移到第{line}行的循环之前"))
+        if not lazy:
+            return before + [loop]
+        for assign in lazy:
+            self.changes.append((assign.expr.line,
+                                 f"{assign.expr.name}(...) 在第{line}行的循环中只计算一次"))
+        flag = f"@ONCE{self.hoist_count}"
+        self.variables.add(flag)
+        lazy.append(AssignStmt(NameExpr(flag, line), LiteralExpr(False, line), False, line))
+        body.insert(0, IfStmt([(NameExpr(flag, line), lazy)], None, line))
+        return before + [AssignStmt(NameExpr(flag, line), LiteralExpr(True, line), False, line), loop]
+
+# ------------------------------------------------
+# 6.4 字节码编译
+# ------------------------------------------------
+
+# 字节码格式版本，修改语法树或操作码时递增（使.vbsc缓存失效）
+_BYTECODE_VERSION = 16
+
+# 操作码
+OP_HALT = 0
+OP_PUSH_CONST = 1       # arg: 常量值
+OP_LOAD_VAR = 2         # arg: 变量槽位
+OP_STORE_VAR = 3        # arg: 变量槽位
+OP_POP = 4              # arg: 弹出个数
+OP_JUMP = 5             # arg: 目标地址
+OP_JUMP_IF_FALSE = 6    # arg: 目标地址
+OP_CALL = 7             # arg: (名称槽位, 参数个数, 按引用传递的实参槽位或None)
+OP_GET_MEMBER = 8       # arg: 成员名
+OP_CALL_MEMBER = 9      # arg: (成员名, 参数个数)
+OP_CONCAT = 10          # arg: 操作数个数
+OP_BINARY = 11          # arg: 二元运算函数
+OP_STORE_INDEX = 12     # arg: (变量槽位, 下标个数)
+OP_STORE_MEMBER = 13    # arg: (成员名, 下标个数)
+OP_DIM = 14             # arg: (变量槽位, 维数)
+OP_PRINT_EXPR = 15      # arg: None
+OP_FOR_PREP = 16        # arg: (变量槽位, 循环结束地址)
+OP_FOR_NEXT = 17        # arg: (变量槽位, 循环体地址)
+OP_FOREACH_PREP = 18    # arg: None
+OP_FOREACH_NEXT = 19    # arg: (变量槽位, 循环结束地址)
+OP_ON_ERROR = 20        # arg: 是否Resume Next
+OP_UNARY = 21           # arg: 一元运算函数
+OP_SELECT = 22          # arg: _CaseTable，匹配时跳到对应分支
+# 过程体中访问全局变量（槽位属于主程序）
+OP_LOAD_GLOBAL = 23     # arg: 全局变量槽位
+OP_STORE_GLOBAL = 24    # arg: 全局变量槽位
+OP_CALL_GLOBAL = 25     # arg: 同OP_CALL，名称为全局槽位
+OP_STORE_INDEX_GLOBAL = 26  # arg: (全局变量槽位, 下标个数)
+# s = s & ... 追加字符串的变量，值可能是_TextBuilder
+OP_APPEND = 27          # arg: (变量槽位, 追加的操作数个数)
+OP_LOAD_TEXT = 28       # arg: 变量槽位，读取时合并_TextBuilder
+OP_REDIM = 29           # arg: (变量槽位, 维数, 是否Preserve)
+OP_REDIM_GLOBAL = 30    # arg: (全局变量槽位, 维数, 是否Preserve)
+
+_OP_NAMES = {value: name[3:] for name, value in list(globals().items())
+             if name.startswith('OP_') and isinstance(value, int)}
+# 操作数（或其第一项）为变量槽位的操作码
+_SLOT_OPS = frozenset((OP_LOAD_VAR, OP_STORE_VAR, OP_CALL, OP_STORE_INDEX, OP_DIM,
+                       OP_FOR_PREP, OP_FOR_NEXT, OP_FOREACH_NEXT, OP_APPEND, OP_LOAD_TEXT,
+                       OP_REDIM))
+_GLOBAL_OPS = frozenset((OP_LOAD_GLOBAL, OP_STORE_GLOBAL, OP_CALL_GLOBAL, OP_STORE_INDEX_GLOBAL,
+                         OP_REDIM_GLOBAL))
+
+class VBSCode:
+    """
+    扁平数组形式的字节码
+    
+    属性:
+        ops: 操作码列表
+        args: 与ops等长的操作数列表
+        lines: 每条指令对应的源码行号
+        units: On Error Resume Next的恢复表
+            [(起始地址, 结束地址, 恢复地址, 栈深度, 压入值)]
+        names: 变量槽位对应的大写名称
+        procedures: 程序中定义的Sub/Function（VBSProcedure列表）
+    """
+    __slots__ = ('ops', 'args', 'lines', 'units', 'names', 'procedures')
+    
+    def __init__(self):
+        self.ops = []
+        self.args = []
+        self.lines = []
+        self.units = []
+        self.names = []
+        self.procedures = []
+    
+    def resume_point(self, pc: int) -> Tuple[int, int, Any]:
+        """返回出错指令所在语句的恢复地址、栈深度和需要压入的值"""
+        best = None
+        for unit in self.units:
+            if unit[0] <= pc < unit[1] and (best is None or unit[0] >= best[0]):
+                best = unit
+        if best is None:
+            return len(self.ops) - 1, 0, _NO_VALUE
+        return best[2], best[3], best[4]
+    
+    def disassemble(self, global_names: Optional[list] = None) -> str:
+        """返回可读的字节码清单（调试用），包括其中定义的过程"""
+        lines = []
+        for pc, (op, arg) in enumerate(zip(self.ops, self.args)):
+            text = arg.__name__ if op == OP_BINARY or op == OP_UNARY else repr(arg)
+            names = global_names if op in _GLOBAL_OPS else self.names
+            if op in _SLOT_OPS or (names and op in _GLOBAL_OPS):
+                slot = arg[0] if isinstance(arg, tuple) else arg
+                text += f"  ({names[slot]})"
+            lines.append(f"{pc:5d} {self.lines[pc]:5d}  {_OP_NAMES[op]:<14} {text}")
+        for proc in self.procedures:
+            lines.append(f"\n{proc.kind.title()} {proc.name}({', '.join(proc.params)}):")
+            lines.append(proc.code.disassemble(self.names))
+        return '\n'.join(lines)
+
+class _NoValue:
+    """恢复表中表示"不压入值"的标记"""
+    __slots__ = ()
+    
+    def __reduce__(self):
+        # 反序列化后仍是同一个对象
+        return '_NO_VALUE'
+    
+    def __repr__(self):
+        return '<no value>'
+
+_NO_VALUE = _NoValue()
+
+def _child_blocks(stmt: VBSNode) -> list:
+    """复合语句直接包含的语句列表（不包括过程定义）"""
+    if isinstance(stmt, IfStmt):
+        blocks = [body for _, body in stmt.branches]
+        if stmt.else_body:
+            blocks.append(stmt.else_body)
+        return blocks
+    if isinstance(stmt, (ForStmt, ForEachStmt, WhileStmt, DoStmt, WithStmt)):
+        return [stmt.body]
+    if isinstance(stmt, SelectStmt):
+        blocks = [body for _, _, body in stmt.cases]
+        if stmt.else_body:
+            blocks.append(stmt.else_body)
+        return blocks
+    return []
+
+def _walk_statements(body: list):
+    """依次产生body及其中复合语句内的全部语句"""
+    for stmt in body:
+        yield stmt
+        for child in _child_blocks(stmt):
+            yield from _walk_statements(child)
+
+def _assigned_names(stmt: VBSNode) -> list:
+    """语句声明或赋值的变量名"""
+    if isinstance(stmt, (DimStmt, ReDimStmt)):
+        return [name for name, _ in stmt.names]
+    if isinstance(stmt, AssignStmt):
+        return [stmt.target.name] if isinstance(stmt.target, NameExpr) else []
+    if isinstance(stmt, (ForStmt, ForEachStmt, WithStmt, SelectStmt)):
+        return [stmt.var]
+    return []
+
+def _is_text_append(stmt: VBSNode) -> bool:
+    """stmt是否为 s = s & ... 形式的赋值"""
+    if not isinstance(stmt, AssignStmt) or stmt.is_set or not isinstance(stmt.target, NameExpr):
+        return False
+    expr = stmt.expr
+    return (isinstance(expr, ConcatExpr) and isinstance(expr.parts[0], NameExpr)
+            and expr.parts[0].key == stmt.target.key)
+
+def _is_variable_copy(stmt: VBSNode) -> bool:
+    """stmt是否为 b = a 形式的赋值（a是数组时按值复制）"""
+    return (isinstance(stmt, AssignStmt) and not stmt.is_set
+            and isinstance(stmt.target, NameExpr) and isinstance(stmt.expr, NameExpr))
+
+def _text_appends(body: list) -> set:
+    """用 s = s & ... 反复追加字符串的变量名（大写），For循环变量除外"""
+    appends = set()
+    loop_vars = set()
+    for stmt in _walk_statements(body):
+        if isinstance(stmt, (ForStmt, ForEachStmt)):
+            loop_vars.add(stmt.var.upper())
+        elif _is_text_append(stmt):
+            appends.add(stmt.target.key)
+    return appends - loop_vars
+
+class _TextBuilder:
+    """
+    用 s = s & ... 反复追加的字符串
+    
+    追加的片段先放在列表中，读取变量时才合并为一个字符串，
+    避免每次追加都复制整个字符串。只出现在变量帧中，读取和写回时都会合并。
+    """
+    __slots__ = ('chunks',)
+    
+    def __init__(self, text: str, piece: str):
+        self.chunks = [text, piece]
+    
+    def text(self) -> str:
+        chunks = self.chunks
+        if len(chunks) > 1:
+            chunks[:] = [''.join(chunks)]
+        return chunks[0]
+
+def _frame_value(val: Any) -> Any:
+    """变量帧中的值，_TextBuilder合并为字符串"""
+    return val.text() if val.__class__ is _TextBuilder else val
+
+def _list_offset(array: list, indexes: Sequence) -> int:
+    """Python列表作为一维数组时的下标，越界（包括负数下标）时报错"""
+    if len(indexes) != 1:
+        raise IndexError("下标越界")
+    index = int(indexes[0])
+    if not 0 <= index < len(array):
+        raise IndexError("下标越界")
+    return index
+
+def _store_element(array: Any, indexes: list, val: Any):
+    """把按引用传递的数组元素实参写回数组，array已不是数组时不写回"""
+    if isinstance(array, list):
+        array[_list_offset(array, indexes)] = val
+    elif array.__class__ is VBSArray or array.__class__ is VBSSplitArray:
+        array.set(indexes, val)
+
+class VBSProcedure:
+    """
+    编译后的Sub/Function
+    
+    属性:
+        kind: 'SUB' 或 'FUNCTION'
+        name: 过程名
+        params: 参数的大写名称，依次占用局部变量槽位0..n-1
+        byref: 各参数是否按引用传递
+        byval_arrays: 按值传递的参数位置（数组实参需要复制）
+        code: 过程体字节码，全局变量用*_GLOBAL指令按主程序的槽位访问
+        result: Function返回值的局部变量槽位，Sub为None
+        main: 定义过程的主程序字节码
+        blank: 全部为未赋值的局部变量数组，用于清空调用帧
+        free: 可重复使用的调用帧
+    """
+    __slots__ = ('kind', 'name', 'params', 'byref', 'byval_arrays', 'code', 'result',
+                 'main', 'blank', 'free')
+    
+    def __init__(self, kind: str, name: str, params: list, byref: list, code: VBSCode,
+                 result: Optional[int], main: VBSCode):
+        self.kind = kind
+        self.name = name
+        self.params = params
+        self.byref = byref
+        self.byval_arrays = tuple(i for i, ref in enumerate(byref) if not ref)
+        self.code = code
+        self.result = result
+        self.main = main
+        self.blank = self._blank()
+        self.free = []
+    
+    def _blank(self) -> list:
+        blank = [_NO_VALUE] * len(self.code.names)
+        if self.result is not None:
+            # 返回值变量初始为Empty，而不是按函数名递归调用
+            blank[self.result] = ""
+        return blank
+    
+    def __getstate__(self):
+        # 调用帧只在运行时使用
+        return {name: getattr(self, name) for name in self.__slots__
+                if name not in ('blank', 'free')}
+    
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+        self.blank = self._blank()
+        self.free = []
+    
+    def __repr__(self) -> str:
+        return f"<{self.kind.title()} {self.name}>"
+
+class VBSCompiler:
+    """
+    把语法树编译为字节码
+    
+    编译过程体时parent为主程序的编译器：参数、Dim声明的变量、Function的返回值
+    以及只在过程中赋值（主程序未使用）的变量是局部变量，其余名称按全局变量访问。
+    """
+    
+    def __init__(self, parent: Optional['VBSCompiler'] = None,
+                 procedure: Optional[ProcedureStmt] = None):
+        self.code = VBSCode()
+        self.slots = {}         # 大写名称 -> 变量槽位
+        self.depth = 0          # 语句边界处的静态栈深度（循环状态）
+        self.loops = []         # [(循环类型, 待回填的Exit跳转列表)]
+        self.parent = parent
+        self.procedure = procedure
+        self.returns = []       # 待回填的Exit Sub/Function跳转
+        self.text_keys = set()  # 用OP_APPEND追加字符串的变量（大写）
+        self.procedures = []    # 主程序中的过程定义
+        self.module_keys = frozenset()  # 主程序中出现的名称（大写），过程中赋值时按全局变量处理
+        # 过程名（大写），作为实参时不按引用写回
+        self.procedure_names = parent.procedure_names if parent is not None else set()
+        self._statement_compilers = {
+            DimStmt: self._compile_dim,
+            ReDimStmt: self._compile_redim,
+            AssignStmt: self._compile_assignment,
+            CallStmt: self._compile_call_statement,
+            ExprStmt: self._compile_expression_statement,
+            IfStmt: self._compile_if,
+            ForStmt: self._compile_for,
+            ForEachStmt: self._compile_for_each,
+            WhileStmt: self._compile_while,
+            DoStmt: self._compile_do,
+            ExitStmt: self._compile_exit,
+            OnErrorStmt: self._compile_on_error,
+            ProcedureStmt: self._compile_procedure,
+            WithStmt: self._compile_with,
+            SelectStmt: self._compile_select,
+        }
+        self._expression_compilers = {
+            LiteralExpr: self._compile_literal,
+            NameExpr: self._compile_name,
+            CallExpr: self._compile_call,
+            MemberExpr: self._compile_member,
+            ConcatExpr: self._compile_concat,
+            UnaryExpr: self._compile_unary,
+            BinaryExpr: self._compile_binary,
+        }
+    
+    def emit(self, op: int, arg: Any, line: int) -> int:
+        """追加一条指令，返回其地址"""
+        code = self.code
+        code.ops.append(op)
+        code.args.append(arg)
+        code.lines.append(line)
+        return len(code.ops) - 1
+    
+    def slot(self, key: str) -> int:
+        """返回大写名称对应的变量槽位，首次出现时分配"""
+        slot = self.slots.get(key)
+        if slot is None:
+            slot = self.slots[key] = len(self.code.names)
+            self.code.names.append(key)
+        return slot
+    
+    def resolve(self, key: str) -> Tuple[int, bool]:
+        """返回名称的(槽位, 是否为全局变量)"""
+        if self.parent is None or key in self.slots:
+            return self.slot(key), False
+        return self.parent.slot(key), True
+    
+    def here(self) -> int:
+        return len(self.code.ops)
+    
+    def patch(self, pc: int, target: int):
+        """回填跳转指令的目标地址"""
+        arg = self.code.args[pc]
+        if isinstance(arg, tuple):
+            self.code.args[pc] = arg[:-1] + (target,)
+        else:
+            self.code.args[pc] = target
+    
+    def compile_program(self, body: list) -> VBSCode:
+        self.procedures = [stmt for stmt in body if isinstance(stmt, ProcedureStmt)]
+        self.procedure_names.update(stmt.name.upper() for stmt in self.procedures)
+        self.text_keys = _text_appends(body)
+        self.compile_block(body)
+        self.emit(OP_HALT, None, body[-1].line if body else 0)
+        # 过程在主程序之后编译，这时已知哪些名称是全局变量；
+        # 先记下主程序的名称，过程中作为全局变量读取的名称不影响其他过程的局部变量
+        self.module_keys = frozenset(self.slots)
+        defined = set()
+        for stmt in self.procedures:
+            key = stmt.name.upper()
+            if key in defined:
+                raise VBSSyntaxError(f"名称重复定义: '{stmt.name}'", stmt.line)
+            defined.add(key)
+            self.code.procedures.append(VBSCompiler(self, stmt).compile_procedure())
+        return self.code
+    
+    def compile_procedure(self) -> VBSProcedure:
+        """编译self.procedure的过程体"""
+        stmt = self.procedure
+        params = [name.upper() for name, _ in stmt.params]
+        for key in params:
+            self.slot(key)
+        result = self.slot(stmt.name.upper()) if stmt.kind == 'FUNCTION' else None
+        module_keys = self.parent.module_keys
+        for inner in _walk_statements(stmt.body):
+            for name in _assigned_names(inner):
+                key = name.upper()
+                if isinstance(inner, DimStmt) or key not in module_keys:
+                    self.slot(key)
+        # 只有局部变量按OP_APPEND追加，全局变量仍按普通赋值处理
+        self.text_keys = {key for key in _text_appends(stmt.body) if key in self.slots}
+        self.compile_block(stmt.body)
+        end = self.emit(OP_HALT, None, stmt.line)
+        for jump in self.returns:
+            self.patch(jump, end)
+        return VBSProcedure(stmt.kind, stmt.name, params, [ref for _, ref in stmt.params],
+                            self.code, result, self.parent.code)
+    
+    def compile_expression(self, node: VBSNode) -> VBSCode:
+        self.compile_expr(node)
+        self.emit(OP_HALT, None, node.line)
+        return self.code
+    
+    def compile_block(self, body: list):
+        for stmt in body:
+            self._statement_compilers[type(stmt)](stmt)
+    
+    def _simple_statement(self, stmt: VBSNode, compile_func: Callable):
+        """编译普通语句并登记出错时的恢复点"""
+        start = self.here()
+        compile_func(stmt)
+        end = self.here()
+        self.code.units.append((start, end, end, self.depth, _NO_VALUE))
+    
+    def _condition(self, node: VBSNode, line: int) -> int:
+        """编译条件并返回待回填的JUMP_IF_FALSE地址"""
+        start = self.here()
+        self.compile_expr(node)
+        jump = self.emit(OP_JUMP_IF_FALSE, None, line)
+        # VBScript在条件出错且Resume Next时继续执行条件成立分支
+        self.code.units.append((start, jump, jump, self.depth, True))
+        return jump
+    
+    def compile_expr(self, node: VBSNode):
+        self._expression_compilers[type(node)](node)
+    
+    # 语句
+    
+    def _compile_dim(self, stmt: DimStmt):
+        def compile_func(stmt):
+            for name, bounds in stmt.names:
+                for bound in bounds or ():
+                    self.compile_expr(bound)
+                self.emit(OP_DIM, (self.slot(name.upper()), len(bounds or ())), stmt.line)
+        self._simple_statement(stmt, compile_func)
+    
+    def _compile_redim(self, stmt: ReDimStmt):
+        def compile_func(stmt):
+            for name, bounds in stmt.names:
+                for bound in bounds:
+                    self.compile_expr(bound)
+                slot, is_global = self.resolve(name.upper())
+                self.emit(OP_REDIM_GLOBAL if is_global else OP_REDIM,
+                          (slot, len(bounds), stmt.preserve), stmt.line)
+        self._simple_statement(stmt, compile_func)
+    
+    def _compile_assignment(self, stmt: AssignStmt):
+        self._simple_statement(stmt, self._compile_store)
+    
+    def _compile_store(self, stmt: AssignStmt):
+        target = stmt.target
+        if isinstance(target, NameExpr):
+            if target.key in self.text_keys and _is_text_append(stmt):
+                parts = stmt.expr.parts[1:]
+                for part in parts:
+                    self.compile_expr(part)
+                self.emit(OP_APPEND, (self.slot(target.key), len(parts)), stmt.line)
+                return
+            self.compile_expr(stmt.expr)
+            if _is_variable_copy(stmt):
+                self.emit(OP_UNARY, _copy_array, stmt.line)
+            slot, is_global = self.resolve(target.key)
+            self.emit(OP_STORE_GLOBAL if is_global else OP_STORE_VAR, slot, stmt.line)
+        elif isinstance(target, CallExpr):
+            for arg in target.args:
+                self.compile_expr(arg)
+            self.compile_expr(stmt.expr)
+            slot, is_global = self.resolve(target.key)
+            self.emit(OP_STORE_INDEX_GLOBAL if is_global else OP_STORE_INDEX,
+                      (slot, len(target.args)), stmt.line)
+        else:
+            self.compile_expr(target.obj)
+            for arg in target.args or ():
+                self.compile_expr(arg)
+            self.compile_expr(stmt.expr)
+            self.emit(OP_STORE_MEMBER, (target.name, len(target.args or ())), stmt.line)
+    
+    def _compile_call_statement(self, stmt: CallStmt):
+        def compile_func(stmt):
+            self.compile_expr(stmt.expr)
+            self.emit(OP_POP, 1, stmt.line)
+        self._simple_statement(stmt, compile_func)
+    
+    def _compile_expression_statement(self, stmt: ExprStmt):
+        def compile_func(stmt):
+            self.compile_expr(stmt.expr)
+            self.emit(OP_PRINT_EXPR, None, stmt.line)
+        self._simple_statement(stmt, compile_func)
+    
+    def _compile_on_error(self, stmt: OnErrorStmt):
+        self.emit(OP_ON_ERROR, stmt.resume_next, stmt.line)
+    
+    def _compile_procedure(self, stmt: ProcedureStmt):
+        """Sub/Function定义在主程序之后统一编译，不生成代码"""
+        if stmt not in self.procedures:
+            raise VBSSyntaxError(f"{stmt.kind.title()} 只能定义在脚本顶层", stmt.line)
+    
+    def _compile_with(self, stmt: WithStmt):
+        self._compile_assignment(stmt.bind())
+        self.compile_block(stmt.body)
+        self._compile_assignment(stmt.release())
+    
+    def _compile_select(self, stmt: SelectStmt):
+        """
+        连续的常量分支编译为一条SELECT指令（查找表），
+        含Is或非常量标签的分支按顺序比较
+        """
+        line = stmt.line
+        slot = self.slot(stmt.var)
+        start = self.here()
+        self.compile_expr(stmt.expr)
+        self.emit(OP_STORE_VAR, slot, line)
+        cases = stmt.cases
+        tables = []
+        arm_jumps = [[] for _ in cases]
+        i = 0
+        while i < len(cases):
+            if cases[i][0] is None:
+                jump = self._condition(cases[i][1], line)
+                arm_jumps[i].append(self.emit(OP_JUMP, None, line))
+                self.patch(jump, self.here())
+                i += 1
+                continue
+            first = i
+            while i < len(cases) and cases[i][0] is not None:
+                i += 1
+            table = _CaseTable([labels for labels, _, _ in cases[first:i]])
+            self.emit(OP_LOAD_VAR, slot, line)
+            self.emit(OP_SELECT, table, line)
+            tables.append((first, table))
+        else_jump = self.emit(OP_JUMP, None, line)
         
-        # 变量
-        if expr.upper() in self.variables:
-            val = self.variables[expr.upper()]
-            return "" if val is None else val
-        elif expr in self.variables:
-            val = self.variables[expr]
-            return "" if val is None else val
+        starts = []
+        end_jumps = []
+        for (_, _, body), jumps in zip(cases, arm_jumps):
+            starts.append(self.here())
+            for jump in jumps:
+                self.patch(jump, self.here())
+            self.compile_block(body)
+            end_jumps.append(self.emit(OP_JUMP, None, line))
+        self.patch(else_jump, self.here())
+        if stmt.else_body:
+            self.compile_block(stmt.else_body)
+        end = self.here()
+        for jump in end_jumps:
+            self.patch(jump, end)
+        for first, table in tables:
+            table.targets = starts[first:first + len(table)]
+        # 选择值出错时跳过整个Select语句
+        self.code.units.append((start, else_jump, end, self.depth, _NO_VALUE))
+    
+    def _compile_if(self, stmt: IfStmt):
+        end_jumps = []
+        for cond, body in stmt.branches:
+            jump = self._condition(cond, stmt.line)
+            self.compile_block(body)
+            end_jumps.append(self.emit(OP_JUMP, None, stmt.line))
+            self.patch(jump, self.here())
+        if stmt.else_body:
+            self.compile_block(stmt.else_body)
+        for jump in end_jumps:
+            self.patch(jump, self.here())
+    
+    def _compile_for(self, stmt: ForStmt):
+        start = self.here()
+        self.compile_expr(stmt.start)
+        self.compile_expr(stmt.end)
+        if stmt.step is not None:
+            self.compile_expr(stmt.step)
+        else:
+            self.emit(OP_PUSH_CONST, 1, stmt.line)
+        slot, shared = self._loop_variable(stmt.var)
+        prep = self.emit(OP_FOR_PREP, (slot, None), stmt.line)
+        body_start = self.here()
+        if shared is not None:
+            self._sync_loop_variable(slot, shared, True, stmt.line)
+        exits = self._loop_body('FOR', stmt.body, 2)
+        if shared is not None:
+            self._sync_loop_variable(slot, shared, False, stmt.line)
+        self.emit(OP_FOR_NEXT, (slot, body_start), stmt.line)
+        finish = self.here()
+        if shared is not None:
+            self._sync_loop_variable(slot, shared, True, stmt.line)
+        exit_pc = self.emit(OP_POP, 2, stmt.line)
+        self.patch(prep, finish)
+        for jump in exits:
+            self.patch(jump, exit_pc)
+        # For语句头出错时跳过整个循环
+        self.code.units.append((start, body_start, exit_pc + 1, self.depth, _NO_VALUE))
+    
+    def _compile_for_each(self, stmt: ForEachStmt):
+        start = self.here()
+        self.compile_expr(stmt.group)
+        self.emit(OP_FOREACH_PREP, None, stmt.line)
+        slot, shared = self._loop_variable(stmt.var)
+        loop_start = self.emit(OP_FOREACH_NEXT, (slot, None), stmt.line)
+        if shared is not None:
+            self._sync_loop_variable(slot, shared, True, stmt.line)
+        exits = self._loop_body('FOR', stmt.body, 1)
+        self.emit(OP_JUMP, loop_start, stmt.line)
+        exit_pc = self.emit(OP_POP, 1, stmt.line)
+        self.patch(loop_start, exit_pc)
+        for jump in exits:
+            self.patch(jump, exit_pc)
+        self.code.units.append((start, loop_start, exit_pc + 1, self.depth, _NO_VALUE))
+    
+    def _loop_variable(self, var: str) -> Tuple[int, Optional[int]]:
+        """
+        返回循环变量的局部槽位和对应的全局槽位
         
-        # 函数调用
-        if '(' in expr and expr.endswith(')'):
-            result = self._execute_function_call(expr)
-            return "" if result is None else result
+        过程内以全局变量为循环变量时，循环指令使用一个隐藏的局部槽位，
+        在循环体前后与全局变量同步。
+        """
+        slot, is_global = self.resolve(var.upper())
+        if not is_global:
+            return slot, None
+        return self.slot(f"{var.upper()}@LOOP{self.here()}"), slot
+    
+    def _sync_loop_variable(self, slot: int, shared: int, to_global: bool, line: int):
+        if to_global:
+            self.emit(OP_LOAD_VAR, slot, line)
+            self.emit(OP_STORE_GLOBAL, shared, line)
+        else:
+            self.emit(OP_LOAD_GLOBAL, shared, line)
+            self.emit(OP_STORE_VAR, slot, line)
+    
+    def _compile_while(self, stmt: WhileStmt):
+        loop_start = self.here()
+        jump = self._condition(stmt.cond, stmt.line)
+        self._loop_body('WHILE', stmt.body, 0)
+        self.emit(OP_JUMP, loop_start, stmt.line)
+        self.patch(jump, self.here())
+    
+    def _compile_do(self, stmt: DoStmt):
+        loop_start = self.here()
+        cond_jump = None
+        if stmt.cond is not None and stmt.test_first:
+            cond_jump = self._loop_condition(stmt)
+        exits = self._loop_body('DO', stmt.body, 0)
+        if stmt.cond is not None and not stmt.test_first:
+            exit_jump = self._loop_condition(stmt)
+            self.emit(OP_JUMP, loop_start, stmt.line)
+            self.patch(exit_jump, self.here())
+        else:
+            self.emit(OP_JUMP, loop_start, stmt.line)
+        if cond_jump is not None:
+            self.patch(cond_jump, self.here())
+        for jump in exits:
+            self.patch(jump, self.here())
+    
+    def _loop_condition(self, stmt: DoStmt) -> int:
+        """编译Do循环条件，返回退出循环的跳转地址"""
+        if not stmt.until:
+            return self._condition(stmt.cond, stmt.line)
+        # Until: 条件成立时退出
+        jump = self._condition(stmt.cond, stmt.line)
+        exit_jump = self.emit(OP_JUMP, None, stmt.line)
+        self.patch(jump, self.here())
+        return exit_jump
+    
+    def _loop_body(self, kind: str, body: list, stack_items: int) -> list:
+        """编译循环体，返回其中Exit语句的跳转地址"""
+        self.loops.append((kind, []))
+        self.depth += stack_items
+        self.compile_block(body)
+        self.depth -= stack_items
+        return self.loops.pop()[1]
+    
+    def _compile_exit(self, stmt: ExitStmt):
+        if stmt.kind not in ('FOR', 'DO'):
+            if self.procedure is None or self.procedure.kind != stmt.kind:
+                raise VBSSyntaxError(f"Exit {stmt.kind.title()} 不在{stmt.kind.title()}内", stmt.line)
+            self.returns.append(self.emit(OP_JUMP, None, stmt.line))
+            return
+        for kind, exits in reversed(self.loops):
+            if kind == stmt.kind:
+                exits.append(self.emit(OP_JUMP, None, stmt.line))
+                return
+        raise VBSSyntaxError(f"Exit {stmt.kind.title()} 不在循环内", stmt.line)
+    
+    # 表达式
+    
+    def _compile_literal(self, node: LiteralExpr):
+        self.emit(OP_PUSH_CONST, node.value, node.line)
+    
+    def _compile_name(self, node: NameExpr):
+        slot, is_global = self.resolve(node.key)
+        if is_global:
+            self.emit(OP_LOAD_GLOBAL, slot, node.line)
+        else:
+            self.emit(OP_LOAD_TEXT if node.key in self.text_keys else OP_LOAD_VAR, slot, node.line)
+    
+    def _compile_call(self, node: CallExpr):
+        # 变量和数组元素实参可能按引用传递给用户定义的过程
+        refs = tuple(map(self._compile_argument, node.args))
+        if not any(refs):
+            refs = None
+        slot, is_global = self.resolve(node.key)
+        self.emit(OP_CALL_GLOBAL if is_global else OP_CALL, (slot, len(node.args), refs), node.line)
+    
+    def _compile_argument(self, arg: VBSNode) -> Optional[tuple]:
+        """
+        编译一个实参，返回按引用传递时写回的位置
         
-        # 尝试算术表达式
+        变量返回(槽位, 是否全局)；a(i)形式的实参下标先存入隐藏的局部变量，
+        返回(槽位, 是否全局, 下标槽位)，过程返回后a仍为数组时写回该元素。
+        """
+        if (arg.__class__ is not NameExpr and arg.__class__ is not CallExpr or arg.parenthesized
+                or arg.key in BUILTIN_FUNCTIONS or arg.key in self.procedure_names):
+            self.compile_expr(arg)
+            return None
+        if arg.__class__ is NameExpr or not arg.args:
+            self.compile_expr(arg)
+            return self.resolve(arg.key) if arg.__class__ is NameExpr else None
+        index_slots = []
+        for index in arg.args:
+            self.compile_expr(index)
+            slot = self.slot(f"@REF{len(self.code.names)}")
+            self.emit(OP_STORE_VAR, slot, arg.line)
+            index_slots.append(slot)
+        for slot in index_slots:
+            self.emit(OP_LOAD_VAR, slot, arg.line)
+        slot, is_global = self.resolve(arg.key)
+        self.emit(OP_CALL_GLOBAL if is_global else OP_CALL, (slot, len(arg.args), None), arg.line)
+        return slot, is_global, tuple(index_slots)
+    
+    def _compile_member(self, node: MemberExpr):
+        self.compile_expr(node.obj)
+        if node.args is None:
+            self.emit(OP_GET_MEMBER, node.name, node.line)
+        else:
+            for arg in node.args:
+                self.compile_expr(arg)
+            self.emit(OP_CALL_MEMBER, (node.name, len(node.args)), node.line)
+    
+    def _compile_concat(self, node: ConcatExpr):
+        for part in node.parts:
+            self.compile_expr(part)
+        self.emit(OP_CONCAT, len(node.parts), node.line)
+    
+    def _compile_unary(self, node: UnaryExpr):
+        self.compile_expr(node.operand)
+        self.emit(OP_UNARY, _UNARY_OPERATORS[node.op], node.line)
+    
+    def _compile_binary(self, node: BinaryExpr):
+        self.compile_expr(node.left)
+        self.compile_expr(node.right)
+        self.emit(OP_BINARY, _BINARY_OPERATORS[node.op][1], node.line)
+
+# 是否在编译前优化语法树
+_optimize_enabled = True
+
+def set_optimize(enabled: bool):
+    """打开或关闭语法树优化，并清空按原设置编译的程序缓存"""
+    global _optimize_enabled
+    _optimize_enabled = bool(enabled)
+    _program_cache.clear()
+
+def compile_vbs(code: str, optimize: Optional[bool] = None,
+                overridden: frozenset = frozenset()) -> VBSProgram:
+    """
+    把VBScript源码编译为程序对象（不使用缓存）
+    
+    参数:
+        code: VBScript源码
+        optimize: 是否优化语法树，为None时使用set_optimize()的设置
+        overridden: 执行时会被define_function()覆盖的内置函数名（大写），优化时不当作纯函数
+    
+    返回:
+        VBSProgram: 可反复执行的程序，optimizations中记录了所做的优化
+    """
+    statements = split_vbs_statements(tokenize_vbs(code))
+    body = VBSParser(statements).parse_program()
+    optimizations = None
+    builtins = frozenset()
+    if _optimize_enabled if optimize is None else optimize:
+        optimizer = VBSOptimizer(frozenset(overridden))
+        body = optimizer.optimize(body)
+        optimizations = optimizer.changes
+        builtins = frozenset(optimizer.builtins)
+    return VBSProgram(body, VBSCompiler().compile_program(body),
+                      hashlib.sha1(code.encode('utf-8')).hexdigest(), optimizations, builtins)
+
+def compile_vbs_expression(expression: str, overridden: frozenset = frozenset()) -> VBSCode:
+    """把单个VBScript表达式编译为字节码，overridden中的内置函数（大写）不在编译时求值"""
+    tokens = [tok for tok in tokenize_vbs(expression)
+              if tok.type is not TK_NEWLINE and tok.type is not TK_EOF]
+    node = VBSParser([]).parse_expression(tokens)
+    if _optimize_enabled:
+        node = VBSOptimizer(frozenset(overridden)).expr(node)
+    return VBSCompiler().compile_expression(node)
+
+# 已编译程序的内存缓存，键为源码的SHA-1摘要
+_PROGRAM_CACHE_SIZE = 128
+_program_cache = {}
+_run_stats = {'runs': 0, 'cache_hits': 0, 'cache_misses': 0,
+              'disk_hits': 0, 'disk_misses': 0}
+
+def get_program(code: str, overridden: frozenset = frozenset()) -> VBSProgram:
+    """
+    返回源码对应的已编译程序，优先使用内存缓存
+    
+    参数:
+        code: VBScript源码
+        overridden: 被解释器覆盖的纯函数名（大写），与源码摘要一起作为缓存键
+    """
+    key = hashlib.sha1(code.encode('utf-8')).hexdigest()
+    if overridden:
+        key = f"{key}/{','.join(sorted(overridden))}"
+    program = _program_cache.get(key)
+    if program is not None:
+        _run_stats['cache_hits'] += 1
+        return program
+    _run_stats['cache_misses'] += 1
+    program = compile_vbs(code, overridden=overridden)
+    if len(_program_cache) >= _PROGRAM_CACHE_SIZE:
+        # 淘汰最早加入的程序
+        del _program_cache[next(iter(_program_cache))]
+    _program_cache[key] = program
+    return program
+
+def get_run_stats() -> Dict[str, int]:
+    """返回运行统计（执行次数、内存/磁盘缓存命中与未命中次数）"""
+    stats = dict(_run_stats)
+    stats['cached_programs'] = len(_program_cache)
+    return stats
+
+def clear_program_cache():
+    """清空已编译程序缓存并重置统计"""
+    _program_cache.clear()
+    for key in _run_stats:
+        _run_stats[key] = 0
+
+# 磁盘缓存（.vbsc）
+# 文件格式: 魔数 + 头部(pickle) + 程序(pickle)，先校验头部再读取程序
+_VBSC_MAGIC = b'VBSC\r\n'
+_VBSC_STAMP = f"{__version__}/{_BYTECODE_VERSION}"
+_disk_cache_dir = None
+
+def set_cache_dir(path: Optional[str]):
+    """
+    设置.vbsc缓存目录
+    
+    参数:
+        path: 缓存目录；为None时缓存文件写在脚本旁边
+    """
+    global _disk_cache_dir
+    _disk_cache_dir = path
+
+def get_cache_path(filename: str) -> str:
+    """返回脚本对应的.vbsc缓存文件路径"""
+    filename = os.path.abspath(filename)
+    if _disk_cache_dir is None:
+        return os.path.splitext(filename)[0] + '.vbsc'
+    # 集中存放时用完整路径的摘要区分同名脚本
+    digest = hashlib.sha1(filename.encode('utf-8')).hexdigest()[:16]
+    name = os.path.splitext(os.path.basename(filename))[0]
+    return os.path.join(_disk_cache_dir, f"{name}.{digest}.vbsc")
+
+def _read_vbsc(cache_path: str, header: dict) -> Optional[VBSProgram]:
+    """读取缓存文件，头部与header不一致或文件损坏时返回None"""
+    try:
+        with open(cache_path, 'rb') as f:
+            if f.read(len(_VBSC_MAGIC)) != _VBSC_MAGIC:
+                return None
+            if pickle.load(f) != header:
+                return None
+            program = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError,
+            ImportError, IndexError, TypeError, ValueError):
+        return None
+    return program if isinstance(program, VBSProgram) else None
+
+def _write_vbsc(cache_path: str, header: dict, program: VBSProgram,
+                source_mode: int = 0o666) -> bool:
+    """
+    写入缓存文件：先写临时文件再原子改名，并发写入者互不干扰
+    
+    mkstemp()创建的文件权限为0600，改为源文件的读写权限（与CPython的.pyc相同，
+    所有者总是可写，以便以后更新缓存），共用源文件目录的其他用户也能读取缓存。
+    """
+    directory = os.path.dirname(cache_path)
+    try:
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.vbsc-', suffix='.tmp')
+    except OSError:
+        return False
+    try:
+        os.chmod(tmp_path, (source_mode | 0o200) & 0o666)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(_VBSC_MAGIC)
+            pickle.dump(header, f, pickle.HIGHEST_PROTOCOL)
+            pickle.dump(program, f, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+        return True
+    except Exception:
         try:
-            safe_dict = {"__builtins__": {}}
-            for k, v in self.variables.items():
-                if not callable(v):
-                    safe_dict[k] = v
-            safe_dict.update({
-                'abs': abs, 'round': round, 'int': int, 'float': float, 'str': str,
-                'len': len, 'min': min, 'max': max, 'sum': sum, 'math': math,
-            })
-            for k, v in self.constants.items():
-                safe_dict[k] = v
-            result = eval(expr, safe_dict)
-            return result
-        except Exception:
-            return expr
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        return False
+
+def load_vbs_file(filename: str, use_cache: bool = True) -> Tuple[str, VBSProgram]:
+    """
+    读取并编译.vbs文件，优先使用.vbsc磁盘缓存
     
-    def _split_args_improved(self, args_str: str) -> List[str]:
-        """改进的参数分割"""
-        args = []
-        current = ""
-        depth = 0
-        in_quotes = False
-        quote_char = None
+    缓存在库版本、源文件修改时间、大小和内容摘要全部一致时才有效，
+    否则重新编译并覆盖缓存。
+    
+    参数:
+        filename: 脚本路径
+        use_cache: 是否读写磁盘缓存
+    
+    返回:
+        (源码, 已编译程序)
+    """
+    with open(filename, 'rb') as f:
+        st = os.fstat(f.fileno())
+        data = f.read()
+    code = data.decode('gbk', errors='ignore')
+    source_hash = hashlib.sha1(code.encode('utf-8')).hexdigest()
+    
+    program = _program_cache.get(source_hash)
+    if program is not None:
+        _run_stats['cache_hits'] += 1
+        return code, program
+    if not use_cache:
+        return code, get_program(code)
+    
+    header = {
+        'stamp': _VBSC_STAMP,
+        'mtime': st.st_mtime_ns,
+        'size': st.st_size,
+        'hash': source_hash,
+        'optimize': _optimize_enabled,
+    }
+    cache_path = get_cache_path(filename)
+    program = _read_vbsc(cache_path, header)
+    if program is not None:
+        _run_stats['disk_hits'] += 1
+    else:
+        _run_stats['disk_misses'] += 1
+        program = compile_vbs(code)
+        _write_vbsc(cache_path, header, program, st.st_mode)
+    if len(_program_cache) >= _PROGRAM_CACHE_SIZE:
+        del _program_cache[next(iter(_program_cache))]
+    _program_cache[source_hash] = program
+    return code, program
+
+# ------------------------------------------------
+# 6.5 解释器（字节码虚拟机）
+# ------------------------------------------------
+
+_member_cache = {}
+
+def _get_member(obj: Any, name: str) -> Any:
+    """不区分大小写地读取对象成员"""
+    try:
+        return getattr(obj, name)
+    except AttributeError:
+        pass
+    cls = type(obj)
+    names = _member_cache.get(cls)
+    if names is None:
+        names = {attr.upper(): attr for attr in dir(cls)}
+        _member_cache[cls] = names
+    real = names.get(name.upper())
+    if real is None:
+        raise AttributeError(f"对象不支持此属性或方法: '{name}'")
+    return getattr(obj, real)
+
+def _set_member(obj: Any, name: str, value: Any):
+    """不区分大小写地设置对象属性"""
+    cls = type(obj)
+    names = _member_cache.get(cls)
+    if names is None:
+        names = {attr.upper(): attr for attr in dir(cls)}
+        _member_cache[cls] = names
+    setattr(obj, names.get(name.upper(), name), value)
+
+def _collect_builtin_functions() -> Dict[str, Callable]:
+    """收集本模块中可在脚本里调用的函数和类（名称以大写字母开头）"""
+    functions = {}
+    for name, obj in list(globals().items()):
+        if not name[0].isupper() or name.startswith('VBS') or not callable(obj):
+            continue
+        if getattr(obj, '__module__', None) != __name__:
+            continue    # typing等导入的名称
+        if isinstance(obj, type) and issubclass(obj, (VBSNode, SimpleVBSInterpreter)):
+            continue    # 解释器自身的类
+        functions[name.upper()] = obj
+    return functions
+
+# 每个解释器最多缓存调用点的字节码数量
+_CALL_SITE_CACHE_SIZE = 256
+
+class _CallFrame:
+    """过程调用帧：局部变量数组和调用方的On Error状态"""
+    __slots__ = ('locals', 'resume_next')
+    
+    def __init__(self, blank: list):
+        self.locals = list(blank)
+        self.resume_next = False
+
+# 脚本过程的最大递归深度，两种执行方式都按解释器的call_depth计数，超出时报"堆栈溢出"。
+# 每层VBS调用在字节码模式下占2个Python栈帧（_invoke和_run_frame），转译模式下占1个；
+# 执行期间临时调高Python的递归上限以容纳这一深度。
+# 注意递归上限是进程级设置，多线程同时执行脚本时以最先进入的线程为准恢复。
+MAX_CALL_DEPTH = 3000
+_PY_FRAMES_PER_CALL = 3
+
+class _CallDepth:
+    """with块内把Python递归上限调高到足以执行MAX_CALL_DEPTH层过程调用，退出时恢复"""
+    __slots__ = ('saved',)
+    
+    def __enter__(self):
+        limit = sys.getrecursionlimit()
+        needed = 1000 + MAX_CALL_DEPTH * _PY_FRAMES_PER_CALL
+        if limit < needed:
+            sys.setrecursionlimit(needed)
+            self.saved = limit
+        else:
+            self.saved = None
+        return self
+    
+    def __exit__(self, *exc_info):
+        if self.saved is not None:
+            sys.setrecursionlimit(self.saved)
+        return False
+
+class SimpleVBSInterpreter:
+    """完整的VBScript解释器"""
+    
+    def __init__(self):
+        self.variables = {}
+        # 内置函数表和常量表为模块级共享的只读表，本解释器定义的函数放在user_functions中
+        self.user_functions = {}
+        self.functions = ChainMap(self.user_functions, BUILTIN_FUNCTIONS)
+        self.constants = VBS_CONSTANTS
+        self.line_number = 0
+        self.error_handler = None
+        self.on_error_resume_next = False
+        # 正在执行的过程调用层数，两种执行方式都不超过MAX_CALL_DEPTH
+        self.call_depth = 0
+        # 正在执行的主程序字节码及其变量帧（过程通过它访问全局变量）
+        self.global_code = None
+        self.global_frame = None
+        # 调用点内联缓存：字节码 -> 按指令位置记录已解析的函数，函数表变化时清空
+        self._call_sites = {}
+        # 本次执行中已给出警告的未定义函数名（大写）
+        self._unresolved = set()
         
-        i = 0
-        while i < len(args_str):
-            char = args_str[i]
-            
-            if char in ['"', "'"]:
-                if not in_quotes:
-                    in_quotes = True
-                    quote_char = char
-                elif char == quote_char:
-                    in_quotes = False
-                    quote_char = None
-                current += char
-            elif char == '(' and not in_quotes:
-                depth += 1
-                current += char
-            elif char == ')' and not in_quotes:
-                depth -= 1
-                current += char
-            elif char == ',' and depth == 0 and not in_quotes:
-                args.append(current.strip())
-                current = ""
+        # 添加WScript对象
+        self.variables['WSCRIPT'] = WScript
+    
+    def define_function(self, name: str, func: Callable):
+        """定义函数（只对本解释器有效，可覆盖同名内置函数）"""
+        self.user_functions[name.upper()] = func
+        self._call_sites.clear()
+        self._unresolved.discard(name.upper())
+    
+    def define_procedures(self, procedures: List[VBSProcedure]):
+        """登记脚本中定义的Sub/Function（与VBScript一样在程序开始执行前生效）"""
+        user_functions = self.user_functions
+        for proc in procedures:
+            key = proc.name.upper()
+            if user_functions.get(key) is not proc:
+                user_functions[key] = proc
+                self._call_sites.clear()
+    
+    def execute(self, code: Union[str, VBSProgram], transpile: bool = False):
+        """
+        执行VBScript代码或已编译的程序
+        
+        参数:
+            code: VBScript源码或VBSProgram
+            transpile: 为True时转译为Python代码对象执行（快速模式）
+        """
+        # 被覆盖的纯函数不能按内置定义折叠或外提
+        overridden = _PURE_FUNCTIONS.intersection(self.user_functions)
+        if isinstance(code, VBSProgram):
+            program = code
+            if overridden & program.builtins:
+                names = ', '.join(sorted(overridden & program.builtins))
+                print(f"错误: 程序编译时按内置定义优化了被覆盖的函数 {names}，"
+                      f"请用compile_vbs(code, overridden=...)重新编译")
+                return
+        else:
+            try:
+                program = get_program(code, overridden)
+            except VBSSyntaxError as e:
+                print(f"{e}")
+                return
+        _run_stats['runs'] += 1
+        self.line_number = 0
+        self.on_error_resume_next = False
+        self._unresolved.clear()
+        
+        try:
+            if transpile:
+                self.define_procedures(program.code.procedures)
+                self.run_python(transpile_vbs(program, self))
             else:
-                current += char
-            
-            i += 1
+                self.run(program.code)
+        except VBSSyntaxError as e:
+            print(f"{e}")
+        except RecursionError:
+            print(f"第{self.line_number}行错误: 堆栈溢出")
+        except Exception as e:
+            print(f"第{self.line_number}行错误: {e}")
+    
+    def run_python(self, py_code: 'VBSPythonCode'):
+        """执行转译得到的Python代码，出错时self.line_number指向出错的源码行"""
+        namespace = dict(_PY_RUNTIME_NAMES)
+        exec(py_code.code, namespace)
+        try:
+            with _CallDepth():
+                namespace['__vbs_main'](_PyRuntime(self, py_code.consts), self.variables)
+        except Exception as e:
+            tb = e.__traceback__
+            while tb is not None:
+                if tb.tb_frame.f_code.co_filename == _PY_FILENAME:
+                    self.line_number = py_code.line_map[tb.tb_lineno]
+                tb = tb.tb_next
+            raise
+    
+    def run(self, code: VBSCode) -> Any:
+        """
+        执行字节码，返回执行结束时栈顶的值（表达式代码的结果）
+        
+        变量按槽位载入定长的帧列表，执行结束后写回self.variables。
+        出错时self.line_number指向出错的源码行。
+        """
+        self.define_procedures(code.procedures)
+        variables = self.variables
+        names = code.names
+        # 未赋值的槽位为_NO_VALUE，读取时按函数名或Empty处理
+        frame = [variables.get(name, _NO_VALUE) for name in names]
+        outer = self.global_code, self.global_frame
+        self.global_code, self.global_frame = code, frame
+        try:
+            with _CallDepth():
+                return self._run_frame(code, frame)
+        finally:
+            self.global_code, self.global_frame = outer
+            for name, val in zip(names, frame):
+                if val is not _NO_VALUE and not _is_hidden_name(name):
+                    variables[name] = _frame_value(val)
+    
+    def evaluate(self, code: VBSCode, bindings: Optional[Dict[str, Any]] = None) -> Any:
+        """
+        计算表达式字节码，不写回变量
+        
+        参数:
+            code: compile_vbs_expression()得到的字节码
+            bindings: 只在本次计算中可见的变量值（变量名不区分大小写）
+        """
+        variables = self.variables
+        if bindings:
+            bound = {key.upper(): value for key, value in bindings.items()}
+            frame = [bound[name] if name in bound else variables.get(name, _NO_VALUE)
+                     for name in code.names]
+        else:
+            frame = [variables.get(name, _NO_VALUE) for name in code.names]
+        with _CallDepth():
+            return self._run_frame(code, frame)
+    
+    def _run_frame(self, code: VBSCode, frame: list) -> Any:
+        """在给定的变量帧上执行字节码"""
+        ops = code.ops
+        args = code.args
+        names = code.names
+        stack = []
+        push = stack.append
+        pop = stack.pop
+        functions = self.functions
+        sites = self._call_sites.get(code)
+        if sites is None:
+            sites = self._new_call_sites(code)
+        # 过程体通过*_GLOBAL指令访问主程序的变量帧
+        global_frame = self.global_frame
+        global_names = self.global_code.names if self.global_code is not None else ()
+        pc = 0
         
-        if current:
-            args.append(current.strip())
+        while True:
+            try:
+                while True:
+                    op = ops[pc]
+                    arg = args[pc]
+                    pc += 1
+                    
+                    if op == OP_LOAD_VAR:
+                        val = frame[arg]
+                        if val is _NO_VALUE:
+                            name = names[arg]
+                            # 无参函数调用，如 Now
+                            val = self._call_function(name, []) if name in functions else ""
+                        push("" if val is None else val)
+                    elif op == OP_STORE_VAR:
+                        frame[arg] = pop()
+                    elif op == OP_PUSH_CONST:
+                        push(arg)
+                    elif op == OP_LOAD_TEXT:
+                        val = frame[arg]
+                        if val.__class__ is _TextBuilder:
+                            val = val.text()
+                        elif val is _NO_VALUE:
+                            name = names[arg]
+                            val = self._call_function(name, []) if name in functions else ""
+                        push("" if val is None else val)
+                    elif op == OP_APPEND:
+                        slot, argc = arg
+                        piece = ''.join(["" if p is None else str(p) for p in stack[-argc:]])
+                        del stack[-argc:]
+                        val = frame[slot]
+                        if val.__class__ is _TextBuilder:
+                            val.chunks.append(piece)
+                        else:
+                            if val is _NO_VALUE:
+                                name = names[slot]
+                                val = self._call_function(name, []) if name in functions else ""
+                            frame[slot] = _TextBuilder("" if val is None else str(val), piece)
+                    elif op == OP_LOAD_GLOBAL:
+                        val = global_frame[arg]
+                        if val.__class__ is _TextBuilder:
+                            # 主程序中追加的字符串
+                            val = val.text()
+                        elif val is _NO_VALUE:
+                            name = global_names[arg]
+                            val = self._call_function(name, []) if name in functions else ""
+                        push("" if val is None else val)
+                    elif op == OP_STORE_GLOBAL:
+                        global_frame[arg] = pop()
+                    elif op == OP_BINARY:
+                        right = pop()
+                        stack[-1] = arg(stack[-1], right)
+                    elif op == OP_JUMP_IF_FALSE:
+                        if not pop():
+                            pc = arg
+                    elif op == OP_JUMP:
+                        pc = arg
+                    elif op == OP_FOR_NEXT:
+                        slot, body = arg
+                        step = stack[-1]
+                        val = frame[slot] + step
+                        frame[slot] = val
+                        if (val <= stack[-2]) if step >= 0 else (val >= stack[-2]):
+                            pc = body
+                    elif op == OP_CONCAT:
+                        parts = stack[-arg:]
+                        del stack[-arg:]
+                        push(''.join(["" if p is None else str(p) for p in parts]))
+                    elif op == OP_CALL or op == OP_CALL_GLOBAL:
+                        slot, argc, refs = arg
+                        if argc:
+                            call_args = stack[-argc:]
+                            del stack[-argc:]
+                        else:
+                            call_args = []
+                        if op == OP_CALL:
+                            array = frame[slot]
+                            name = names[slot]
+                        else:
+                            array = global_frame[slot]
+                            name = global_names[slot]
+                        if isinstance(array, list):
+                            val = array[_list_offset(array, call_args)]
+                        elif array.__class__ is VBSArray or array.__class__ is VBSSplitArray:
+                            val = array.get(call_args)
+                        else:
+                            # 调用点第一次执行时解析函数，之后直接使用缓存（未定义时为_NO_VALUE）
+                            func = sites[pc]
+                            if func is None:
+                                func = sites[pc] = functions.get(name, _NO_VALUE)
+                            if func.__class__ is VBSProcedure:
+                                val = self._invoke(func, call_args, refs, frame)
+                            elif func is _NO_VALUE:
+                                val = self._missing_function(name)
+                            else:
+                                val = func(*call_args)
+                        push("" if val is None else val)
+                    elif op == OP_POP:
+                        del stack[-arg:]
+                    elif op == OP_GET_MEMBER:
+                        member = _get_member(pop(), arg)
+                        if callable(member) and hasattr(member, '__self__'):
+                            member = member()
+                        push(member)
+                    elif op == OP_CALL_MEMBER:
+                        name, argc = arg
+                        call_args = stack[-argc:] if argc else []
+                        del stack[len(stack) - argc:]
+                        member = _get_member(pop(), name)
+                        if callable(member):
+                            push(member(*call_args))
+                        else:
+                            push(member[call_args[0]] if call_args else member)
+                    elif op == OP_STORE_INDEX or op == OP_STORE_INDEX_GLOBAL:
+                        slot, argc = arg
+                        val = pop()
+                        indexes = stack[-argc:]
+                        del stack[-argc:]
+                        array = frame[slot] if op == OP_STORE_INDEX else global_frame[slot]
+                        if isinstance(array, list):
+                            array[_list_offset(array, indexes)] = val
+                        elif array.__class__ is VBSArray or array.__class__ is VBSSplitArray:
+                            array.set(indexes, val)
+                    elif op == OP_STORE_MEMBER:
+                        name, argc = arg
+                        val = pop()
+                        if argc:
+                            indexes = stack[-argc:]
+                            del stack[-argc:]
+                            _get_member(pop(), name)[indexes[0]] = val
+                        else:
+                            _set_member(pop(), name, val)
+                    elif op == OP_FOR_PREP:
+                        slot, exit_pc = arg
+                        # 起止值和步长按VBScript的规则转换为数值（如数字字符串）
+                        step = _to_number(pop())
+                        end = _to_number(pop())
+                        val = _to_number(pop())
+                        push(end)
+                        push(step)
+                        frame[slot] = val
+                        if not ((val <= end) if step >= 0 else (val >= end)):
+                            pc = exit_pc
+                    elif op == OP_FOREACH_PREP:
+                        group = pop()
+                        if isinstance(group, Dictionary):
+                            group = group.Keys()
+                        push(iter(group))
+                    elif op == OP_FOREACH_NEXT:
+                        slot, exit_pc = arg
+                        try:
+                            frame[slot] = next(stack[-1])
+                        except StopIteration:
+                            pc = exit_pc
+                    elif op == OP_DIM:
+                        slot, ndims = arg
+                        if ndims:
+                            frame[slot] = VBSArray(stack[-ndims:])
+                            del stack[-ndims:]
+                        else:
+                            frame[slot] = None
+                    elif op == OP_REDIM or op == OP_REDIM_GLOBAL:
+                        slot, ndims, preserve = arg
+                        bounds = stack[-ndims:]
+                        del stack[-ndims:]
+                        if op == OP_REDIM:
+                            frame[slot] = _redim(frame[slot], bounds, preserve)
+                        else:
+                            global_frame[slot] = _redim(global_frame[slot], bounds, preserve)
+                    elif op == OP_PRINT_EXPR:
+                        result = pop()
+                        if result is not None and result != "":
+                            print(f"{result}")
+                    elif op == OP_SELECT:
+                        arm = arg.lookup(pop())
+                        if arm is not None:
+                            pc = arg.targets[arm]
+                    elif op == OP_UNARY:
+                        stack[-1] = arg(stack[-1])
+                    elif op == OP_ON_ERROR:
+                        self.on_error_resume_next = arg
+                    elif op == OP_HALT:
+                        return stack[-1] if stack else None
+                    else:
+                        raise RuntimeError(f"未知操作码: {op}")
+            except Exception as exc:
+                self.line_number = code.lines[pc - 1]
+                if not self.on_error_resume_next:
+                    # 过程内出错时报告过程内的行号
+                    self.line_number = getattr(exc, 'vbs_line', self.line_number)
+                    raise
+                # On Error Resume Next: 跳到出错语句之后继续执行
+                pc, depth, value = code.resume_point(pc - 1)
+                del stack[depth:]
+                if value is not _NO_VALUE:
+                    push(value)
+    
+    def _new_call_sites(self, code: VBSCode) -> list:
+        """为字节码建立空的调用点缓存（按指令位置索引）"""
+        call_sites = self._call_sites
+        if len(call_sites) >= _CALL_SITE_CACHE_SIZE:
+            # 淘汰最早加入的字节码
+            del call_sites[next(iter(call_sites))]
+        sites = call_sites[code] = [None] * (len(code.ops) + 1)
+        return sites
+    
+    def _invoke(self, proc: VBSProcedure, args: list, refs: Optional[tuple] = None,
+                caller: Optional[list] = None) -> Any:
+        """
+        调用脚本定义的过程
         
-        return args
+        ByRef按复制进出实现：形参是实参值的副本，过程返回时才写回调用方的变量或数组元素。
+        因此过程执行期间对同一全局变量的修改在形参中不可见，同一变量作为两个ByRef实参时
+        以后一个形参的值为准；过程出错退出时不写回。
+        
+        参数:
+            proc: 过程
+            args: 实参值
+            refs: 各实参对应的写回位置，变量为(槽位, 是否全局)，数组元素为
+                (数组槽位, 是否全局, 下标所在的局部槽位)，其他实参为None
+            caller: 调用方的变量帧
+        """
+        if self.global_code is not proc.main:
+            # 从其他程序或表达式中调用：临时载入定义过程的程序的全局变量
+            return self._invoke_detached(proc, args)
+        params = proc.params
+        if len(args) != len(params):
+            raise TypeError(f"参数个数错误: '{proc.name}' 需要 {len(params)} 个参数")
+        depth = self.call_depth
+        if depth >= MAX_CALL_DEPTH:
+            raise RecursionError("堆栈溢出")
+        free = proc.free
+        frame = free.pop() if free else _CallFrame(proc.blank)
+        local = frame.locals
+        local[:len(args)] = args
+        for i in proc.byval_arrays:
+            local[i] = _copy_array(args[i])
+        # On Error Resume Next只对设置它的过程有效
+        frame.resume_next = self.on_error_resume_next
+        self.on_error_resume_next = False
+        self.call_depth = depth + 1
+        try:
+            self._run_frame(proc.code, local)
+        except Exception as exc:
+            if not hasattr(exc, 'vbs_line'):
+                try:
+                    exc.vbs_line = self.line_number
+                except AttributeError:
+                    pass
+            raise
+        finally:
+            self.on_error_resume_next = frame.resume_next
+            self.call_depth = depth
+        if refs:
+            global_frame = self.global_frame
+            byref = proc.byref
+            for i, ref in enumerate(refs):
+                if ref is not None and byref[i]:
+                    target = global_frame if ref[1] else caller
+                    if len(ref) == 2:
+                        target[ref[0]] = _frame_value(local[i])
+                    else:
+                        _store_element(target[ref[0]], [caller[slot] for slot in ref[2]],
+                                       _frame_value(local[i]))
+        result = _frame_value(local[proc.result]) if proc.result is not None else None
+        # 清空局部变量后放回帧池，供下次调用使用
+        local[:] = proc.blank
+        free.append(frame)
+        return "" if result is _NO_VALUE else result
+    
+    def _invoke_detached(self, proc: VBSProcedure, args: list) -> Any:
+        """在主程序之外调用过程，全局变量从self.variables载入并在返回后写回"""
+        variables = self.variables
+        names = proc.main.names
+        frame = [variables.get(name, _NO_VALUE) for name in names]
+        outer = self.global_code, self.global_frame
+        self.global_code, self.global_frame = proc.main, frame
+        try:
+            return self._invoke(proc, args)
+        finally:
+            self.global_code, self.global_frame = outer
+            for name, val in zip(names, frame):
+                if val is not _NO_VALUE and not _is_hidden_name(name):
+                    variables[name] = val
+    
+    def _call_function(self, func_name: str, args: list):
+        """按大写名称调用函数，用户定义的函数优先于内置函数"""
+        func = self.user_functions.get(func_name)
+        if func.__class__ is VBSProcedure:
+            return self._invoke(func, args)
+        if func is None:
+            func = BUILTIN_FUNCTIONS.get(func_name)
+            if func is None:
+                return self._missing_function(func_name)
+        return func(*args)
+    
+    def _missing_function(self, func_name: str):
+        """调用未定义的函数：每次执行中每个名称只警告一次，结果为Empty"""
+        if func_name not in self._unresolved:
+            self._unresolved.add(func_name)
+            print(f"警告: 未定义的函数 '{func_name}'")
+        return None
     
     def save_as_ansi_vbs(self, filename: str, code: str) -> bool:
         """将代码保存为ANSI编码的VBS文件"""
@@ -1913,31 +6042,861 @@ class SimpleVBSInterpreter:
         full_content = header + code
         return save_vbs_ansi(filename, full_content)
 
+# ------------------------------------------------
+# 6.6 Python转译（快速执行模式）
+# ------------------------------------------------
+
+def _rt_bind_function(name: str, func: Callable) -> Callable:
+    """包装内置函数：返回None时按空字符串处理，出错时异常交给On Error处理"""
+    def call(*args):
+        result = func(*args)
+        return "" if result is None else result
+    return call
+
+def _rt_concat(*parts) -> str:
+    """& 运算：Empty/Null按空字符串处理"""
+    return ''.join(["" if p is None else str(p) for p in parts])
+
+def _rt_append(value: Any, piece: str) -> _TextBuilder:
+    """s = s & ...：把片段追加到s的_TextBuilder"""
+    if value.__class__ is _TextBuilder:
+        value.chunks.append(piece)
+        return value
+    return _TextBuilder("" if value is None else str(value), piece)
+
+def _rt_get_member(obj: Any, name: str) -> Any:
+    """读取对象成员，无参方法直接调用"""
+    member = _get_member(obj, name)
+    if callable(member) and hasattr(member, '__self__'):
+        return member()
+    return member
+
+def _rt_call_member(obj: Any, name: str, *args) -> Any:
+    """调用对象方法或读取带下标的属性"""
+    member = _get_member(obj, name)
+    if callable(member):
+        return member(*args)
+    return member[args[0]] if args else member
+
+def _rt_store_member(obj: Any, name: str, value: Any, *indexes):
+    """设置对象属性或带下标的属性"""
+    if indexes:
+        _get_member(obj, name)[indexes[0]] = value
+    else:
+        _set_member(obj, name, value)
+
+def _rt_store_index(array: Any, *args):
+    """数组元素赋值，参数为下标...和值"""
+    if array.__class__ is VBSArray or array.__class__ is VBSSplitArray:
+        array.set(args[:-1], args[-1])
+    elif isinstance(array, list):
+        array[_list_offset(array, args[:-1])] = args[-1]
+
+def _rt_foreach(group: Any) -> Any:
+    """For Each的迭代对象"""
+    if isinstance(group, Dictionary):
+        return group.Keys()
+    return group
+
+# 转译代码的全局命名空间
+_PY_RUNTIME_NAMES = {
+    '_rt_concat': _rt_concat, '_rt_get_member': _rt_get_member,
+    '_rt_call_member': _rt_call_member, '_rt_store_member': _rt_store_member,
+    '_rt_store_index': _rt_store_index, '_rt_foreach': _rt_foreach,
+    '_rt_append': _rt_append, '_rt_text': _frame_value,
+    '_rt_array': VBSArray, '_rt_redim': _redim, '_rt_copy_array': _copy_array,
+    '_rt_number': _to_number,
+}
+_PY_RUNTIME_NAMES.update({func.__name__: func for func in _UNARY_OPERATORS.values()})
+_PY_RUNTIME_NAMES.update({func.__name__: func for _, func in _BINARY_OPERATORS.values() if func})
+
+class _PyRuntime:
+    """转译代码运行时需要访问解释器状态的辅助函数"""
+    __slots__ = ('interpreter', 'consts')
+    
+    def __init__(self, interpreter: 'SimpleVBSInterpreter', consts: list):
+        self.interpreter = interpreter
+        self.consts = consts
+    
+    def call(self, name: str, *args) -> Any:
+        result = self.interpreter._call_function(name, list(args))
+        return "" if result is None else result
+    
+    def function(self, name: str) -> Callable:
+        """解析函数名，返回可在调用点直接调用的函数"""
+        func = self.interpreter.functions.get(name)
+        if func is None or func.__class__ is VBSProcedure:
+            # 未定义的函数（每次执行中只警告一次）和其他程序定义的过程
+            return partial(self.call, name)
+        return _rt_bind_function(name, func)
+    
+    def index(self, array: Any, name: str, *args) -> Any:
+        """name(args)：变量是数组时取元素，否则调用同名函数"""
+        if isinstance(array, list):
+            val = array[_list_offset(array, args)]
+        elif array.__class__ is VBSArray or array.__class__ is VBSSplitArray:
+            val = array.get(args)
+        else:
+            return self.call(name, *args)
+        return "" if val is None else val
+    
+    def print_expr(self, result: Any):
+        if result is not None and result != "":
+            print(f"{result}")
+    
+    def on_error(self, resume_next: bool):
+        self.interpreter.on_error_resume_next = resume_next
+    
+    def resume_next(self) -> bool:
+        return self.interpreter.on_error_resume_next
+    
+    def enter(self) -> bool:
+        """
+        进入过程：检查调用层数，On Error Resume Next只对设置它的过程有效，返回调用方的状态
+        """
+        interpreter = self.interpreter
+        if interpreter.call_depth >= MAX_CALL_DEPTH:
+            raise RecursionError("堆栈溢出")
+        interpreter.call_depth += 1
+        resume_next = interpreter.on_error_resume_next
+        interpreter.on_error_resume_next = False
+        return resume_next
+    
+    def leave(self, resume_next: bool):
+        """离开过程，恢复调用层数和调用方的On Error状态"""
+        interpreter = self.interpreter
+        interpreter.call_depth -= 1
+        interpreter.on_error_resume_next = resume_next
+
+class VBSPythonCode:
+    """
+    转译得到的Python代码
+    
+    属性:
+        source: 生成的Python源码
+        code: compile()得到的代码对象
+        line_map: Python行号到VBScript行号的映射
+        variables: 写回解释器的变量名（大写）
+        consts: 无法写成字面量的常量（如日期）
+        bindings: 转译时按解释器解析的名称 -> _name_binding()的结果，
+                  换用名称解析结果不同的解释器时需要重新转译
+    """
+    __slots__ = ('source', 'code', 'line_map', 'variables', 'consts', 'bindings')
+    
+    def __init__(self, source: str, code: Any, line_map: list, variables: list, consts: list,
+                 bindings: Optional[Dict[str, tuple]] = None):
+        self.source = source
+        self.code = code
+        self.line_map = line_map
+        self.variables = variables
+        self.consts = consts
+        self.bindings = bindings or {}
+    
+    def matches(self, interpreter: 'SimpleVBSInterpreter') -> bool:
+        """interpreter对转译时用到的名称的解析结果是否与转译时相同"""
+        functions = interpreter.functions
+        constants = interpreter.constants
+        variables = interpreter.variables
+        for key, binding in self.bindings.items():
+            if _name_binding(key, functions, constants, variables) != binding:
+                return False
+        return True
+
+def _name_binding(key: str, functions: Dict[str, Callable], constants: Dict[str, Any],
+                  variables: Dict[str, Any]) -> tuple:
+    """名称在解释器中的解析结果：(常量值, 是否已有同名变量, 是否有同名函数)"""
+    return (constants.get(key, _NO_VALUE), key in variables, key in functions)
+
+_PY_FILENAME = '<vbs-transpiled>'
+
+def _py_name(prefix: str, key: str) -> str:
+    """
+    大写名称在转译代码中的Python名称
+    
+    不是ASCII标识符的名称（如[my var]、中文名）按UTF-8的十六进制编码，
+    前缀后多一个下划线，不会与普通名称重复。
+    """
+    if key.isascii() and key.isidentifier():
+        return prefix + key
+    return f"{prefix}_{key.encode('utf-8').hex()}"
+
+class VBSTranspiler:
+    """把语法树转译为Python源码"""
+    
+    def __init__(self, functions: Dict[str, Callable], constants: Dict[str, Any],
+                 predefined: Optional[Dict[str, Any]] = None):
+        self.functions = functions
+        self.constants = constants
+        self.predefined = predefined or {}
+        self.lines = []         # [(缩进, 代码, VBScript行号)]
+        self.indent = 1
+        self.consts = []
+        self.variables = {}     # 大写名称 -> 原文名称
+        self.loops = []         # [(循环类型, 退出标志名或None)]
+        self.temp_count = 0
+        self.guard = False
+        self.procedures = {}    # 大写名称 -> VBSProcedure，转译为嵌套函数p_NAME
+        self.proc_return = None # 正在输出的过程的return语句
+        self.text_keys = set()  # 用_rt_append追加字符串的变量（大写）
+        self.bound_functions = {}   # 大写名称 -> None，运行开始时绑定为f_NAME的函数
+        self.external_names = set() # 按解释器的常量、变量和函数表解析的名称（大写）
+        self.own_names = set()      # 程序自己赋值的变量和过程的局部变量（大写）
+        self._statement_emitters = {
+            DimStmt: self._emit_dim,
+            ReDimStmt: self._emit_redim,
+            AssignStmt: self._emit_assignment,
+            CallStmt: self._emit_call_statement,
+            ExprStmt: self._emit_expression_statement,
+            IfStmt: self._emit_if,
+            ForStmt: self._emit_for,
+            ForEachStmt: self._emit_for_each,
+            WhileStmt: self._emit_while,
+            DoStmt: self._emit_do,
+            ExitStmt: self._emit_exit,
+            OnErrorStmt: self._emit_on_error,
+            ProcedureStmt: self._emit_procedure,
+            WithStmt: self._emit_with,
+            SelectStmt: self._emit_select,
+        }
+        self._expression_emitters = {
+            LiteralExpr: self._expr_literal,
+            NameExpr: self._expr_name,
+            CallExpr: self._expr_call,
+            MemberExpr: self._expr_member,
+            ConcatExpr: self._expr_concat,
+            UnaryExpr: self._expr_unary,
+            BinaryExpr: self._expr_binary,
+        }
+    
+    def transpile(self, body: list, procedures: Optional[List[VBSProcedure]] = None) -> VBSPythonCode:
+        """
+        生成并编译整个程序
+        
+        参数:
+            body: 顶层语句列表
+            procedures: 字节码编译器得到的过程（用于确定局部/全局变量）
+        """
+        for key in self.predefined:
+            self.variables.setdefault(key, key)
+        self._collect_variables(body)
+        self.text_keys = _text_appends(body)
+        for stmt in body:
+            if isinstance(stmt, ProcedureStmt):
+                self.text_keys |= _text_appends(stmt.body)
+        procedures = procedures or []
+        self.procedures = {proc.name.upper(): proc for proc in procedures}
+        if procedures:
+            definitions = {stmt.name.upper(): stmt for stmt in body
+                           if isinstance(stmt, ProcedureStmt)}
+            # 过程中赋值的全局变量和按引用传递的变量实参都是主程序的变量
+            main = procedures[0].main
+            for code in [main] + [proc.code for proc in procedures]:
+                for key in self._global_stores(code, main.names):
+                    self.variables.setdefault(key, key)
+                    self.own_names.add(key)
+            for proc in procedures:
+                self._emit_procedure_def(proc, definitions[proc.name.upper()])
+        self.guard = self._uses_resume_next(body)
+        self.emit('try:', 0)
+        self.indent += 1
+        self.emit_block(body)
+        self.emit('pass', 0)
+        self.indent -= 1
+        self.emit('finally:', 0)
+        self.indent += 1
+        exported = [key for key in self.variables if not _is_hidden_name(key)]
+        for key in exported:
+            self.emit(f"_vars[{key!r}] = {self._read(key)}", 0)
+        
+        header = [
+            'def __vbs_main(_rt, _vars):',
+            '    _call = _rt.call; _index = _rt.index; _k = _rt.consts',
+        ]
+        for key in self.bound_functions:
+            header.append(f"    {_py_name('f_', key)} = _rt.function({key!r})")
+        for key in self.variables:
+            value = "''" if _is_hidden_name(key) else f"_vars.get({key!r}, '')"
+            header.append(f"    {_py_name('v_', key)} = {value}")
+        line_map = [0] * (len(header) + 1)
+        source_lines = list(header)
+        for indent, text, vbs_line in self.lines:
+            source_lines.append('    ' * indent + text)
+            line_map.append(vbs_line)
+        source = '\n'.join(source_lines) + '\n'
+        code = compile(source, _PY_FILENAME, 'exec')
+        bindings = {key: _name_binding(key, self.functions, self.constants, self.predefined)
+                    for key in self.external_names - self.own_names}
+        return VBSPythonCode(source, code, line_map, exported, self.consts, bindings)
+    
+    def emit(self, text: str, line: int):
+        self.lines.append((self.indent, text, line))
+    
+    def temp(self, prefix: str) -> str:
+        self.temp_count += 1
+        return f"_{prefix}{self.temp_count}"
+    
+    def emit_block(self, body: list):
+        for stmt in body:
+            self._statement_emitters[type(stmt)](stmt)
+    
+    def _collect_variables(self, body: list):
+        """收集被赋值或声明过的变量名"""
+        for stmt in _walk_statements(body):
+            for name in _assigned_names(stmt):
+                self.variables.setdefault(name.upper(), name)
+                self.own_names.add(name.upper())
+    
+    def _uses_resume_next(self, body: list) -> bool:
+        return any(isinstance(stmt, OnErrorStmt) and stmt.resume_next
+                   for stmt in _walk_statements(body))
+    
+    def _global_stores(self, code: VBSCode, global_names: list) -> set:
+        """字节码中赋值的全局变量（过程内的全局赋值和按引用写回的变量实参）"""
+        stores = set()
+        is_main = code.names is global_names
+        for op, arg in zip(code.ops, code.args):
+            if op == OP_STORE_GLOBAL:
+                stores.add(global_names[arg])
+            elif op == OP_REDIM_GLOBAL:
+                stores.add(global_names[arg[0]])
+            elif (op == OP_CALL or op == OP_CALL_GLOBAL) and arg[2]:
+                for ref in arg[2]:
+                    if ref is not None and (ref[1] or is_main):
+                        stores.add(global_names[ref[0]])
+        return stores
+    
+    def _emit_procedure_def(self, proc: VBSProcedure, stmt: ProcedureStmt):
+        """
+        把过程输出为嵌套函数p_NAME(参数...)
+        
+        返回(返回值, 按引用传递的参数...)，由调用处写回变量实参。
+        """
+        line = stmt.line
+        main_variables = self.variables
+        global_names = proc.main.names
+        # 循环变量的隐藏槽位（名称含@LOOP）只在字节码中使用
+        local_keys = [key for key in proc.code.names if '@LOOP' not in key]
+        self.own_names.update(local_keys)
+        used = {global_names[arg[0] if isinstance(arg, tuple) else arg]
+                for op, arg in zip(proc.code.ops, proc.code.args) if op in _GLOBAL_OPS}
+        used |= self._global_stores(proc.code, global_names)
+        shared = sorted(key for key in used if key in main_variables and key not in local_keys)
+        
+        self.variables = dict(main_variables)
+        self.variables.update((key, key) for key in local_keys)
+        params = ', '.join(_py_name('v_', key) for key in proc.params)
+        self.emit(f"def {_py_name('p_', proc.name.upper())}({params}):", line)
+        self.indent += 1
+        if shared:
+            self.emit(f"nonlocal {', '.join(_py_name('v_', key) for key in shared)}", line)
+        for key in local_keys[len(proc.params):]:
+            self.emit(f"{_py_name('v_', key)} = ''", line)
+        for i in proc.byval_arrays:
+            param = _py_name('v_', proc.params[i])
+            self.emit(f"{param} = _rt_copy_array({param})", line)
+        result = self._read(proc.name.upper()) if proc.result is not None else "''"
+        returned = [result] + [self._read(key) for key, byref in zip(proc.params, proc.byref)
+                               if byref]
+        self.proc_return = f"return ({', '.join(returned)},)"
+        self.guard = self._uses_resume_next(stmt.body)
+        self.emit('_e = _rt.enter()', line)
+        self.emit('try:', line)
+        self.indent += 1
+        self.emit_block(stmt.body)
+        self.emit('pass', line)
+        self.indent -= 1
+        self.emit('finally:', line)
+        self.emit('    _rt.leave(_e)', line)
+        self.emit(self.proc_return, line)
+        self.indent -= 1
+        self.variables = main_variables
+        self.proc_return = None
+    
+    def _guarded(self, line: int, emit_func: Callable, on_error: Optional[str] = None):
+        """在使用了On Error Resume Next的程序中用try包裹语句"""
+        if not self.guard:
+            emit_func()
+            return
+        self.emit('try:', line)
+        self.indent += 1
+        emit_func()
+        self.indent -= 1
+        self.emit('except Exception:', line)
+        self.indent += 1
+        self.emit('if not _rt.resume_next(): raise', line)
+        if on_error:
+            self.emit(on_error, line)
+        self.indent -= 1
+    
+    # 语句
+    
+    def _emit_dim(self, stmt: DimStmt):
+        def emit_func():
+            for name, bounds in stmt.names:
+                if bounds:
+                    sizes = ''.join(self.expr(bound) + ', ' for bound in bounds)
+                    self.emit(f"{_py_name('v_', name.upper())} = _rt_array(({sizes}))", stmt.line)
+                else:
+                    self.emit(f"{_py_name('v_', name.upper())} = ''", stmt.line)
+        self._guarded(stmt.line, emit_func)
+    
+    def _emit_redim(self, stmt: ReDimStmt):
+        def emit_func():
+            for name, bounds in stmt.names:
+                key = name.upper()
+                sizes = ', '.join(self.expr(bound) for bound in bounds)
+                self.emit(f"{_py_name('v_', key)} = _rt_redim({self._variable_ref(key)}, [{sizes}], "
+                          f"{stmt.preserve})", stmt.line)
+        self._guarded(stmt.line, emit_func)
+    
+    def _emit_assignment(self, stmt: AssignStmt):
+        def emit_func():
+            target = stmt.target
+            if target.key in self.text_keys and _is_text_append(stmt):
+                self._emit_text_append(target.key, stmt.expr.parts[1:], stmt.line)
+                return
+            value = self.expr(stmt.expr)
+            if _is_variable_copy(stmt):
+                value = f"_rt_copy_array({value})"
+            if isinstance(target, NameExpr):
+                self.emit(f"{_py_name('v_', target.key)} = {value}", stmt.line)
+            elif isinstance(target, CallExpr):
+                array = self._variable_ref(target.key)
+                indexes = ''.join(self.expr(arg) + ', ' for arg in target.args)
+                self.emit(f"_rt_store_index({array}, {indexes}{value})", stmt.line)
+            else:
+                indexes = ''.join(', ' + self.expr(arg) for arg in target.args or ())
+                self.emit(f"_rt_store_member({self.expr(target.obj)}, {target.name!r}, "
+                          f"{value}{indexes})", stmt.line)
+        self._guarded(stmt.line, emit_func)
+    
+    def _emit_text_append(self, key: str, parts: list, line: int):
+        """s = s & ... 输出为 v_S = _rt_append(v_S, ...)，v_S保存_TextBuilder"""
+        if len(parts) == 1 and isinstance(parts[0], LiteralExpr):
+            piece = repr(_literal_text(parts[0].value))
+        else:
+            piece = f"_rt_concat({', '.join(self.expr(part) for part in parts)})"
+        name = _py_name('v_', key)
+        self.emit(f"{name} = _rt_append({name}, {piece})", line)
+    
+    def _read(self, key: str) -> str:
+        """读取变量的Python表达式，追加字符串的变量需要先合并"""
+        name = _py_name('v_', key)
+        return f"_rt_text({name})" if key in self.text_keys else name
+    
+    def _emit_call_statement(self, stmt: CallStmt):
+        self._guarded(stmt.line, lambda: self.emit(self.expr(stmt.expr), stmt.line))
+    
+    def _emit_expression_statement(self, stmt: ExprStmt):
+        self._guarded(stmt.line,
+                      lambda: self.emit(f"_rt.print_expr({self.expr(stmt.expr)})", stmt.line))
+    
+    def _emit_on_error(self, stmt: OnErrorStmt):
+        self.emit(f"_rt.on_error({stmt.resume_next!r})", stmt.line)
+    
+    def _emit_procedure(self, stmt: ProcedureStmt):
+        """Sub/Function已在程序开头定义为嵌套函数"""
+        self.emit('pass', stmt.line)
+    
+    def _emit_with(self, stmt: WithStmt):
+        self._emit_assignment(stmt.bind())
+        self.emit_block(stmt.body)
+        self._emit_assignment(stmt.release())
+    
+    def _emit_select(self, stmt: SelectStmt):
+        """先求出分支序号，再按序号二分输出各分支"""
+        line = stmt.line
+        var = _py_name('v_', stmt.var)
+        cases = stmt.cases
+        arm = self.temp('a')
+        ok = self.temp('ok')
+        
+        def emit_header():
+            self.emit(f"{var} = {self.expr(stmt.expr)}", line)
+            if self.guard:
+                self.emit(f"{ok} = True", line)
+        
+        if self.guard:
+            # 选择值出错时跳过整个Select语句
+            self.emit(f"{ok} = False", line)
+            self._guarded(line, emit_header)
+            self.emit(f"if {ok}:", line)
+            self.indent += 1
+        else:
+            emit_header()
+        self.emit(f"{arm} = {len(cases)}", line)
+        i = 0
+        while i < len(cases):
+            first = i
+            if first:
+                # 前面的分支都不匹配时才继续比较
+                self.emit(f"if {arm} == {len(cases)}:", line)
+                self.indent += 1
+            if cases[i][0] is None:
+                self.emit(f"if {self._condition(cases[i][1], line)}: {arm} = {i}", line)
+                i += 1
+            else:
+                while i < len(cases) and cases[i][0] is not None:
+                    i += 1
+                table = self._literal(_CaseTable([labels for labels, _, _ in cases[first:i]]))
+                found = self.temp('t')
+                self.emit(f"{found} = {table}.lookup({var})", line)
+                self.emit(f"if {found} is not None: {arm} = {found} + {first}", line)
+            if first:
+                self.indent -= 1
+        self._emit_arms(arm, [body for _, _, body in cases] + [stmt.else_body or []], 0,
+                        len(cases), line)
+        if self.guard:
+            self.indent -= 1
+    
+    def _emit_arms(self, arm: str, bodies: list, low: int, high: int, line: int):
+        """按分支序号二分输出bodies[low..high]"""
+        if low == high:
+            self.emit_block(bodies[low])
+            self.emit('pass', line)
+            return
+        middle = (low + high + 1) // 2
+        self.emit(f"if {arm} < {middle}:", line)
+        self.indent += 1
+        self._emit_arms(arm, bodies, low, middle - 1, line)
+        self.indent -= 1
+        self.emit('else:', line)
+        self.indent += 1
+        self._emit_arms(arm, bodies, middle, high, line)
+        self.indent -= 1
+    
+    def _condition(self, node: VBSNode, line: int) -> str:
+        """返回条件表达式；Resume Next模式下条件出错视为成立"""
+        if not self.guard:
+            return self.expr(node)
+        cond = self.temp('c')
+        self._guarded(line, lambda: self.emit(f"{cond} = {self.expr(node)}", line),
+                      f"{cond} = True")
+        return cond
+    
+    def _emit_if(self, stmt: IfStmt):
+        if self.guard:
+            # 每个条件都需要先单独计算
+            self._emit_guarded_if(stmt.branches, stmt.else_body, stmt.line)
+            return
+        keyword = 'if'
+        for cond, body in stmt.branches:
+            self.emit(f"{keyword} {self.expr(cond)}:", stmt.line)
+            self._emit_body(body, stmt.line)
+            keyword = 'elif'
+        if stmt.else_body:
+            self.emit('else:', stmt.line)
+            self._emit_body(stmt.else_body, stmt.line)
+    
+    def _emit_guarded_if(self, branches: list, else_body: Optional[list], line: int):
+        cond, body = branches[0]
+        self.emit(f"if {self._condition(cond, line)}:", line)
+        self._emit_body(body, line)
+        if len(branches) > 1 or else_body:
+            self.emit('else:', line)
+            self.indent += 1
+            if len(branches) > 1:
+                self._emit_guarded_if(branches[1:], else_body, line)
+            else:
+                self.emit_block(else_body)
+                self.emit('pass', line)
+            self.indent -= 1
+    
+    def _emit_body(self, body: list, line: int):
+        self.indent += 1
+        self.emit_block(body)
+        self.emit('pass', line)
+        self.indent -= 1
+    
+    def _emit_loop(self, kind: str, header: str, body: list, line: int,
+                   before: Optional[Callable] = None, after: Optional[Callable] = None):
+        """输出循环，并处理跳出外层循环的Exit语句"""
+        flag = self.temp('x')
+        self.emit(f"{flag} = False", line)
+        self.emit(header, line)
+        self.loops.append((kind, flag))
+        self.indent += 1
+        if before is not None:
+            before()
+        self.emit_block(body)
+        if after is not None:
+            after()
+        self.emit('pass', line)
+        self.indent -= 1
+        self.loops.pop()
+        # 内层循环因Exit外层循环而结束时继续向外跳出
+        if self.loops:
+            self.emit(f"if {' or '.join(f for _, f in self.loops)}: break", line)
+    
+    def _emit_loop_test(self, cond: VBSNode, until: bool, line: int):
+        """在循环体内输出条件判断"""
+        test = self._condition(cond, line)
+        self.emit(f"if {test}: break" if until else f"if not {test}: break", line)
+    
+    def _emit_for(self, stmt: ForStmt):
+        line = stmt.line
+        var = _py_name('v_', stmt.var.upper())
+        end = self.temp('end')
+        step = self.temp('step')
+        ok = self.temp('ok')
+        
+        def number(node):
+            # 起止值和步长按VBScript的规则转换为数值，数值字面量不必转换
+            if isinstance(node, LiteralExpr) and type(node.value) in (int, float):
+                return self.expr(node)
+            return f"_rt_number({self.expr(node)})"
+        
+        def emit_header():
+            # 与虚拟机一致：起止值和步长都计算成功后才给循环变量赋值
+            self.emit(f"{end} = {number(stmt.start)}, {number(stmt.end)}", line)
+            self.emit(f"{step} = {number(stmt.step) if stmt.step else '1'}", line)
+            self.emit(f"{var}, {end} = {end}", line)
+            if self.guard:
+                self.emit(f"{ok} = True", line)
+        
+        if isinstance(stmt.step, LiteralExpr) and isinstance(stmt.step.value, (int, float)):
+            test = f"{var} {'<=' if stmt.step.value >= 0 else '>='} {end}"
+        elif stmt.step is None:
+            test = f"{var} <= {end}"
+        else:
+            test = f"({var} <= {end}) if {step} >= 0 else ({var} >= {end})"
+        
+        if self.guard:
+            # For语句头出错时跳过整个循环
+            self.emit(f"{ok} = False", line)
+            self._guarded(line, emit_header)
+            self.emit(f"if {ok}:", line)
+            self.indent += 1
+        else:
+            emit_header()
+        self._emit_loop('FOR', f"while {test}:", stmt.body, line,
+                        after=lambda: self.emit(f"{var} = {var} + {step}", line))
+        if self.guard:
+            self.indent -= 1
+    
+    def _emit_for_each(self, stmt: ForEachStmt):
+        line = stmt.line
+        group = self.temp('g')
+        self.emit(f"{group} = ()", line)
+        self._guarded(line, lambda: self.emit(f"{group} = _rt_foreach({self.expr(stmt.group)})", line))
+        self._emit_loop('FOR', f"for {_py_name('v_', stmt.var.upper())} in {group}:", stmt.body, line)
+    
+    def _emit_while(self, stmt: WhileStmt):
+        self._emit_loop('WHILE', 'while True:', stmt.body, stmt.line,
+                        before=lambda: self._emit_loop_test(stmt.cond, False, stmt.line))
+    
+    def _emit_do(self, stmt: DoStmt):
+        before = after = None
+        if stmt.cond is not None:
+            def test():
+                self._emit_loop_test(stmt.cond, stmt.until, stmt.line)
+            if stmt.test_first:
+                before = test
+            else:
+                after = test
+        self._emit_loop('DO', 'while True:', stmt.body, stmt.line, before, after)
+    
+    def _emit_exit(self, stmt: ExitStmt):
+        if stmt.kind not in ('FOR', 'DO'):
+            if self.proc_return is None:
+                raise VBSSyntaxError(f"Exit {stmt.kind.title()} 不在{stmt.kind.title()}内", stmt.line)
+            self.emit(self.proc_return, stmt.line)
+            return
+        for i in range(len(self.loops) - 1, -1, -1):
+            kind, flag = self.loops[i]
+            if kind == stmt.kind:
+                if i != len(self.loops) - 1:
+                    self.emit(f"{flag} = True", stmt.line)
+                self.emit('break', stmt.line)
+                return
+        raise VBSSyntaxError(f"Exit {stmt.kind.title()} 不在循环内", stmt.line)
+    
+    # 表达式
+    
+    def expr(self, node: VBSNode) -> str:
+        return self._expression_emitters[type(node)](node)
+    
+    def _literal(self, value: Any) -> str:
+        # inf和nan的repr()不是Python表达式，与其他对象一样放在常量表中
+        if value is None or isinstance(value, (bool, int, str)) or (
+                isinstance(value, float) and math.isfinite(value)):
+            return repr(value)
+        self.consts.append(value)
+        return f"_k[{len(self.consts) - 1}]"
+    
+    def _expr_literal(self, node: LiteralExpr) -> str:
+        return self._literal(node.value)
+    
+    def _variable_ref(self, key: str) -> str:
+        self.external_names.add(key)
+        return _py_name('v_', key) if key in self.variables else "''"
+    
+    def _expr_name(self, node: NameExpr) -> str:
+        key = node.key
+        self.external_names.add(key)
+        if key in self.constants:
+            return self._literal(self.constants[key])
+        if key in self.variables:
+            return self._read(key)
+        proc = self.procedures.get(key)
+        if proc is not None and not proc.params:
+            return self._call_procedure(proc, [])
+        if key in self.functions:
+            return f"{self._bind_function(key)}()"
+        return "''"
+    
+    def _expr_call(self, node: CallExpr) -> str:
+        proc = self.procedures.get(node.key)
+        if proc is not None and len(node.args) == len(proc.params):
+            return self._call_procedure(proc, node.args)
+        args = ''.join(', ' + self.expr(arg) for arg in node.args)
+        self.external_names.add(node.key)
+        if node.key in self.variables:
+            return f"_index({_py_name('v_', node.key)}, {node.key!r}{args})"
+        return f"{self._bind_function(node.key)}({args[2:]})"
+    
+    def _bind_function(self, key: str) -> str:
+        """调用点使用的局部函数名，函数在每次运行开始时解析一次"""
+        self.bound_functions[key] = None
+        return _py_name('f_', key)
+    
+    def _call_procedure(self, proc: VBSProcedure, args: list) -> str:
+        """
+        直接调用转译后的过程，按引用传递的实参在调用后写回
+        
+        变量实参重新赋值；a(i)形式的实参先把下标存入临时变量，a仍为数组时写回该元素。
+        """
+        texts = []
+        writes = []
+        result = self.temp('r')
+        position = 0
+        for arg, byref in zip(args, proc.byref):
+            position += byref
+            if (not byref or arg.__class__ is not NameExpr and arg.__class__ is not CallExpr
+                    or arg.parenthesized or arg.key not in self.variables
+                    or arg.key in BUILTIN_FUNCTIONS or arg.key in self.procedures):
+                texts.append(self.expr(arg))
+            elif arg.__class__ is NameExpr:
+                texts.append(self.expr(arg))
+                writes.append(f"({_py_name('v_', arg.key)} := {result}[{position}])")
+            elif arg.args:
+                array = _py_name('v_', arg.key)
+                indexes = [self.temp('i') for _ in arg.args]
+                texts.append(f"_index({array}, {arg.key!r}, "
+                             + ', '.join(f"({index} := {self.expr(node)})"
+                                         for index, node in zip(indexes, arg.args)) + ")")
+                writes.append(f"_rt_store_index({array}, {', '.join(indexes)}, "
+                              f"{result}[{position}])")
+            else:
+                texts.append(self.expr(arg))
+        call = f"{_py_name('p_', proc.name.upper())}({', '.join(texts)})"
+        if not writes:
+            return f"{call}[0]"
+        return f"(({result} := {call}), {', '.join(writes)})[0][0]"
+    
+    def _expr_member(self, node: MemberExpr) -> str:
+        obj = self.expr(node.obj)
+        if node.args is None:
+            return f"_rt_get_member({obj}, {node.name!r})"
+        args = ''.join(', ' + self.expr(arg) for arg in node.args)
+        return f"_rt_call_member({obj}, {node.name!r}{args})"
+    
+    def _expr_concat(self, node: ConcatExpr) -> str:
+        return f"_rt_concat({', '.join(self.expr(part) for part in node.parts)})"
+    
+    def _expr_unary(self, node: UnaryExpr) -> str:
+        return f"{_UNARY_OPERATORS[node.op].__name__}({self.expr(node.operand)})"
+    
+    def _expr_binary(self, node: BinaryExpr) -> str:
+        func = _BINARY_OPERATORS[node.op][1]
+        return f"{func.__name__}({self.expr(node.left)}, {self.expr(node.right)})"
+
+def transpile_vbs(program: VBSProgram, interpreter: Optional['SimpleVBSInterpreter'] = None) -> VBSPythonCode:
+    """
+    把已编译的程序转译为Python代码对象
+    
+    结果缓存在程序对象上。转译时按解释器的常量、变量和函数表决定名称的含义，
+    interpreter对这些名称的解析与缓存的结果不同时（如之后定义了同名的全局变量或函数）重新转译。
+    """
+    py_code = program.py_code
+    if py_code is not None and (interpreter is None or py_code.matches(interpreter)):
+        return py_code
+    interpreter = interpreter or SimpleVBSInterpreter()
+    transpiler = VBSTranspiler(interpreter.functions, interpreter.constants, interpreter.variables)
+    program.py_code = transpiler.transpile(program.body, program.code.procedures)
+    return program.py_code
+
 # ================================================
 # 第七部分：主接口函数
 # ================================================
 
-def RunVBS(code_or_file: str, save_as: Optional[str] = None) -> bool:
-    """运行VBScript代码或文件"""
+def RunVBS(code_or_file: str, save_as: Optional[str] = None, transpile: bool = False,
+           use_cache: bool = True) -> bool:
+    """
+    运行VBScript代码或文件
+    
+    参数:
+        code_or_file: VBScript源码或.vbs文件路径
+        save_as: 同时保存为ANSI编码的VBS文件
+        transpile: 转译为Python代码执行（适合计算密集的脚本）
+        use_cache: 运行文件时使用.vbsc磁盘缓存
+    """
     interpreter = SimpleVBSInterpreter()
     
     if os.path.exists(code_or_file):
-        with open(code_or_file, 'r', encoding='gbk', errors='ignore') as f:
-            code = f.read()
-        interpreter.execute(code)
+        try:
+            code, program = load_vbs_file(code_or_file, use_cache)
+        except VBSSyntaxError as e:
+            print(f"{e}")
+            return False
+        interpreter.execute(program, transpile)
         if save_as:
             return interpreter.save_as_ansi_vbs(save_as, code)
         return True
     else:
-        interpreter.execute(code_or_file)
+        interpreter.execute(code_or_file, transpile)
         if save_as:
             return interpreter.save_as_ansi_vbs(save_as, code_or_file)
         return True
 
-def EvalVBS(expression: str) -> Any:
-    """计算VBScript表达式"""
-    interpreter = SimpleVBSInterpreter()
-    return interpreter._evaluate_expression(expression)
+# EvalVBS共用的解释器（表达式不会给变量赋值）
+_eval_interpreter = None
+
+# 已编译表达式的LRU缓存，键为表达式源码
+_EVAL_CACHE_SIZE = 256
+_eval_cache = _LRUCache(_EVAL_CACHE_SIZE)
+
+def EvalVBS(expression: str, bindings: Optional[Dict[str, Any]] = None) -> Any:
+    """
+    计算VBScript表达式
+    
+    参数:
+        expression: 表达式源码，编译结果缓存后可反复使用
+        bindings: 表达式中的变量值（变量名不区分大小写）
+    
+    返回:
+        表达式的值
+    """
+    global _eval_interpreter
+    code = _eval_cache.get(expression)
+    if code is None:
+        code = compile_vbs_expression(expression)
+        _eval_cache.put(expression, code)
+    if _eval_interpreter is None:
+        _eval_interpreter = SimpleVBSInterpreter()
+    return _eval_interpreter.evaluate(code, bindings)
+
+def get_eval_cache_stats() -> Dict[str, int]:
+    """返回EvalVBS表达式缓存的命中/未命中次数、条目数和容量"""
+    return _eval_cache.info()
+
+def set_eval_cache_size(size: int):
+    """设置EvalVBS表达式缓存的容量（0表示不缓存）"""
+    _eval_cache.resize(size)
+
+def clear_eval_cache():
+    """清空EvalVBS表达式缓存并重置统计"""
+    _eval_cache.clear()
 
 def CreateVBSFile(filename: str, content: str, encoding: str = "ANSI") -> bool:
     """创建VBScript文件"""
@@ -1983,12 +6942,13 @@ def install():
     # 安装函数
     functions = [
         'MsgBox', 'InputBox', 'CreateObject', 'GetObject', 'Len', 'Left', 'Right',
-        'Mid', 'UCase', 'LCase', 'Trim', 'LTrim', 'RTrim', 'InStr', 'Replace',
+        'Mid', 'UCase', 'LCase', 'Trim', 'LTrim', 'RTrim', 'InStr', 'InStrRev', 'Replace',
         'Split', 'Join', 'Asc', 'Chr', 'Space', 'String', 'StrReverse', 'Abs',
         'Sqr', 'Sgn', 'Int', 'Fix', 'Round', 'Rnd', 'Randomize', 'CStr', 'CInt',
         'CLng', 'CSng', 'CDbl', 'CBool', 'CDate', 'Now', 'Date', 'Time', 'Year',
         'Month', 'Day', 'Hour', 'Minute', 'Second', 'Timer', 'DateAdd', 'DateDiff',
-        'Array', 'UBound', 'LBound', 'Filter', 'IsNumeric', 'IsDate', 'IsEmpty',
+        
+        'DatePart', 'Array', 'UBound', 'LBound', 'Filter', 'IsNumeric', 'IsDate', 'IsEmpty',
         'IsNull', 'IsArray', 'IsObject', 'TypeName', 'VarType', 'Hex', 'Oct',
         'Val', 'Str',
     ]
@@ -2023,17 +6983,22 @@ __all__ = [
     'vbThursday', 'vbFriday', 'vbSaturday', 'vbEmpty', 'vbNull',
     'vbInteger', 'vbLong', 'vbSingle', 'vbDouble', 'vbCurrency',
     'vbDate', 'vbString', 'vbObject', 'vbBoolean', 'vbArray',
+    'vbCr', 'vbLf', 'vbCrLf', 'vbNewLine', 'vbTab', 'vbNullChar', 'vbNullString',
+    'vbUseDefault', 'vbTrue', 'vbFalse', 'vbObjectError', 'VBS_CONSTANTS',
     
     # 函数
     'MsgBox', 'InputBox', 'CreateObject', 'GetObject', 'Len', 'Left', 'Right',
-    'Mid', 'UCase', 'LCase', 'Trim', 'LTrim', 'RTrim', 'InStr', 'Replace',
+    'Mid', 'UCase', 'LCase', 'Trim', 'LTrim', 'RTrim', 'InStr', 'InStrRev', 'Replace',
     'Split', 'Join', 'Asc', 'Chr', 'Space', 'String', 'StrReverse', 'Abs',
     'Sqr', 'Sgn', 'Int', 'Fix', 'Round', 'Rnd', 'Randomize', 'CStr', 'CInt',
     'CLng', 'CSng', 'CDbl', 'CBool', 'CDate', 'Now', 'Date', 'Time', 'Year',
     'Month', 'Day', 'Hour', 'Minute', 'Second', 'Timer', 'DateAdd', 'DateDiff',
-    'Array', 'UBound', 'LBound', 'Filter', 'IsNumeric', 'IsDate', 'IsEmpty',
+    
+    'DatePart', 'Array', 'UBound', 'LBound', 'Filter', 'IsNumeric', 'IsDate', 'IsEmpty',
     'IsNull', 'IsArray', 'IsObject', 'TypeName', 'VarType', 'Hex', 'Oct',
-    'Val', 'Str',
+    'Val', 'Str', 'batch_len', 'batch_left', 'batch_right', 'batch_mid', 'batch_ucase',
+    'batch_lcase', 'batch_trim', 'batch_ltrim', 'batch_rtrim', 'batch_replace',
+    'batch_dateadd', 'batch_datediff', 'batch_datepart',
     
     # 文件操作函数
     'save_vbs_ansi', 'read_vbs_ansi', 'detect_file_encoding',
@@ -2043,16 +7008,26 @@ __all__ = [
     
     # 对象类
     'WScript', 'WScriptShell', 'FileSystemObject', 'File', 'Folder',
-    'TextStream', 'Dictionary', 'GenericCOMObject',
+    'TextStream', 'Dictionary', 'GenericCOMObject', 'VBSArray', 'VBSSplitArray',
     
     # 解释器
-    'SimpleVBSInterpreter',
+    'SimpleVBSInterpreter', 'VBSSyntaxError', 'VBSToken', 'tokenize_vbs',
+    'split_vbs_statements', 'match_vbs_blocks', 'VBSParser', 'VBSOptimizer', 'VBSProgram',
+    'VBSCompiler', 'VBSCode', 'compile_vbs', 'compile_vbs_expression', 'get_program',
+    'get_run_stats', 'clear_program_cache', 'VBSTranspiler', 'transpile_vbs',
+    'load_vbs_file', 'set_cache_dir', 'get_cache_path', 'set_optimize', 'set_numpy_arrays',
+    'BUILTIN_FUNCTIONS',
+    'get_eval_cache_stats', 'set_eval_cache_size', 'clear_eval_cache',
+    'set_search_index_size', 'set_date_cache_size',
 ]
 
 # ================================================
 # 第九部分：模块初始化
 # ================================================
 
+# 内置函数表（大写名称 -> 函数或COM类），模块加载完成后构建一次，所有解释器共享
+BUILTIN_FUNCTIONS = MappingProxyType(_collect_builtin_functions())
+
 # 自动清理Tkinter资源
 import atexit
 _tk_root = None